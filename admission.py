@@ -0,0 +1,256 @@
+"""Admission control in front of the scrape pipeline.
+
+Three checks, cheapest first:
+
+- a token bucket per client IP, taken when an API request arrives;
+- a token bucket per student, taken only when a scrape would actually
+  start (cache hits and waiting on another worker's scrape are free) and
+  handed back unless the portal login succeeded, so wrong passwords and
+  portal outages don't lock the student out;
+- a per-worker concurrency cap sized to the host's memory and the browser
+  pool. Interactive requests go ahead of batch and prefetch work while
+  they wait for it.
+
+Anything over a limit gets Throttled, which the API turns into a 429 with
+Retry-After instead of letting the client wait out a 45 s timeout.
+"""
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from browser_pool import POOL_SIZE
+from memory import host_memory_mb
+
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "1") == "1"
+# API requests per client IP
+ADMIT_IP_PER_MIN = float(os.environ.get("ADMIT_IP_PER_MIN", "20"))
+ADMIT_IP_BURST = int(os.environ.get("ADMIT_IP_BURST", "10"))
+# Scrapes per student
+ADMIT_STUDENT_PER_MIN = float(os.environ.get("ADMIT_STUDENT_PER_MIN", "2"))
+ADMIT_STUDENT_BURST = int(os.environ.get("ADMIT_STUDENT_BURST", "3"))
+# Concurrent scrapes per worker; by default what the host's memory holds
+# (ADMIT_BASE_MB for the worker and browser, ADMIT_SCRAPE_MB per scrape),
+# split between the WEB_CONCURRENCY workers, and no more than the browser
+# pool runs at once (beyond that admitted scrapes would queue in the pool's
+# FIFO, where a batch scrape could sit ahead of an interactive one)
+ADMIT_MAX_CONCURRENT = int(os.environ.get("ADMIT_MAX_CONCURRENT", "0"))
+ADMIT_BASE_MB = int(os.environ.get("ADMIT_BASE_MB", "200"))
+ADMIT_SCRAPE_MB = int(os.environ.get("ADMIT_SCRAPE_MB", "100"))
+ADMIT_CAP_MAX = int(os.environ.get("ADMIT_CAP_MAX", "16"))
+# Scrapes allowed to wait for a slot, per priority class
+ADMIT_QUEUE_MAX = int(os.environ.get("ADMIT_QUEUE_MAX", "10"))
+# Reverse proxies in front of the app that append to X-Forwarded-For (1 on Render)
+PROXY_HOPS = int(os.environ.get("PROXY_HOPS", "0"))
+
+# Lower runs first; how long each class may wait for a slot
+PRIORITY = {"interactive": 0, "batch": 1, "prefetch": 2}
+MAX_WAIT_S = {
+    "interactive": float(os.environ.get("ADMIT_WAIT_S", "15")),
+    "batch": 300.0,
+    "prefetch": 300.0,
+}
+
+CLIENT_MSG = "Too many requests from your network. Please try again in a little while."
+STUDENT_MSG = "Attendance for this student was just refreshed. Please try again in a little while."
+BUSY_MSG = "The server is busy right now. Please try again in a little while."
+
+
+def client_ip(peer, forwarded_for=None, hops=PROXY_HOPS):
+    """The client address as werkzeug's ProxyFix(x_for=hops) sees it.
+
+    For entry points that don't go through ProxyFix (asgi.py): with `hops`
+    proxies appending to X-Forwarded-For, the client is the `hops`-th entry
+    from the right; otherwise (or with too few entries) the socket peer.
+    """
+    if hops and forwarded_for:
+        values = [v.strip() for v in forwarded_for.split(",")]
+        if len(values) >= hops:
+            return values[-hops]
+    return peer
+
+class Throttled(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = max(1, math.ceil(retry_after))
+
+    def payload(self):
+        return {"error": self.message, "retry_after": self.retry_after}
+
+
+class TokenBuckets:
+    """One token bucket per key (refilled at rate_per_min, holding up to burst), LRU-bounded."""
+
+    def __init__(self, rate_per_min, burst, max_keys=10000):
+        self.rate = rate_per_min / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Spend a token; returns 0 if allowed, else seconds until one is available."""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / self.rate
+            if not wait:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def refund(self, key):
+        """Give back a token spent by take()."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated = self._buckets[key]
+                self._buckets[key] = (min(self.burst, tokens + 1), updated)
+
+
+def memory_capacity():
+    """Concurrent scrapes one worker can afford on this host."""
+    if ADMIT_MAX_CONCURRENT > 0:
+        return ADMIT_MAX_CONCURRENT
+    host_mb = host_memory_mb() or 512
+    workers = max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+    fits = int((host_mb / workers - ADMIT_BASE_MB) // ADMIT_SCRAPE_MB)
+    return max(1, min(ADMIT_CAP_MAX, fits))
+
+
+def default_capacity():
+    """memory_capacity(), capped at what the browser pool runs at once."""
+    if ADMIT_MAX_CONCURRENT > 0:
+        return ADMIT_MAX_CONCURRENT
+    return min(memory_capacity(), max(1, POOL_SIZE))
+
+
+class PriorityGate:
+    """At most `capacity` holders; waiters are let in by (priority, arrival)."""
+
+    def __init__(self, capacity, queue_max=ADMIT_QUEUE_MAX):
+        self.capacity = capacity
+        self.queue_max = queue_max
+        self._cond = threading.Condition()
+        self._running = 0
+        self._heap = []
+        self._queued = {p: 0 for p in PRIORITY.values()}
+        self._seq = itertools.count()
+        # Smoothed seconds a slot is held, for Retry-After estimates
+        self._hold_s = 15.0
+
+    def retry_after(self, ahead=0):
+        return self._hold_s * (ahead // self.capacity + 1)
+
+    def acquire(self, priority, timeout):
+        with self._cond:
+            if self._queued[priority] >= self.queue_max:
+                raise Throttled(BUSY_MSG, self.retry_after(len(self._heap)))
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._heap, ticket)
+            self._queued[priority] += 1
+            deadline = time.monotonic() + timeout
+            try:
+                while not (self._running < self.capacity and self._heap[0] == ticket):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Throttled(BUSY_MSG, self.retry_after(self._heap.index(ticket)))
+                    self._cond.wait(remaining)
+                self._running += 1
+            finally:
+                self._heap.remove(ticket)
+                heapq.heapify(self._heap)
+                self._queued[priority] -= 1
+                # The next in line may be able to go too
+                self._cond.notify_all()
+
+    def release(self, held_s):
+        with self._cond:
+            self._running -= 1
+            self._hold_s = 0.8 * self._hold_s + 0.2 * held_s
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {"capacity": self.capacity, "running": self._running, "queued": len(self._heap),
+                    "hold_s": round(self._hold_s, 1)}
+
+
+class Admission:
+    def __init__(self, capacity=None, enabled=ADMISSION_ENABLED):
+        self.enabled = enabled
+        self.clients = TokenBuckets(ADMIT_IP_PER_MIN, ADMIT_IP_BURST)
+        self.students = TokenBuckets(ADMIT_STUDENT_PER_MIN, ADMIT_STUDENT_BURST)
+        self.gate = PriorityGate(capacity or default_capacity())
+        self._lock = threading.Lock()
+        self.counts = {"admitted": 0, "throttled_client": 0, "throttled_student": 0, "throttled_busy": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def check_client(self, ip):
+        """Raise Throttled if this client IP is over its request rate."""
+        if not self.enabled or not ip:
+            return
+        wait = self.clients.take(ip)
+        if wait:
+            self._count("throttled_client")
+            raise Throttled(CLIENT_MSG, wait)
+
+    @contextmanager
+    def slot(self, username, kind="interactive", gate=None):
+        """Hold a scrape slot for `username`; raises Throttled instead of queueing too long.
+
+        Yields `charge(status)`: call it with the scrape's status. Only a 200
+        (a real portal login) keeps the student's token spent; any other
+        outcome, or never calling it, refunds it.
+        """
+        outcome = {}
+
+        def charge(status):
+            outcome["status"] = status
+
+        if not self.enabled:
+            yield charge
+            return
+        student = username.strip().upper()
+        wait = self.students.take(student)
+        if wait:
+            self._count("throttled_student")
+            raise Throttled(STUDENT_MSG, wait)
+        gate = gate or self.gate
+        try:
+            gate.acquire(PRIORITY.get(kind, 0), MAX_WAIT_S.get(kind, MAX_WAIT_S["interactive"]))
+        except Throttled:
+            self.students.refund(student)
+            self._count("throttled_busy")
+            raise
+        self._count("admitted")
+        started = time.monotonic()
+        try:
+            yield charge
+        finally:
+            gate.release(time.monotonic() - started)
+            if outcome.get("status") != 200:
+                self.students.refund(student)
+
+    def retry_after(self):
+        return max(1, math.ceil(self.gate.retry_after()))
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        counts.update(self.gate.stats())
+        return counts
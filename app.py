@@ -1,136 +1,446 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, url_for
 from flask_cors import CORS
-from playwright.sync_api import sync_playwright
-import time
-import re
+from werkzeug.middleware.proxy_fix import ProxyFix
+import json
+
+import batch
+import engine
+from browser_pool import get_pool
+import history
+import metrics
+import planner
+import prefetch
+import versions
+from admission import Admission, Throttled, PROXY_HOPS
+from cache import ResultCache, cache_key
+from compression import compress_response
+from coordination import get_coordinator
+from health import upstream
+from jobs import JobManager, QueueFull
+from portal import no_progress
 
 app = Flask(__name__)
-CORS(app)
+app.json.compact = True
+# Response headers cross-origin clients may read (asgi.py sends the same)
+CORS_EXPOSE_HEADERS = ['Server-Timing', 'ETag', 'Retry-After']
+CORS(app, expose_headers=CORS_EXPOSE_HEADERS)
+if PROXY_HOPS:
+    # request.remote_addr is then the client, not the proxy
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_HOPS)
+
+jobs = JobManager()
+results = ResultCache()
+served = versions.VersionLog()
+admission = Admission()
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def last_known(key, username, password, error):
+    """While the circuit breaker is open: the last result we have, marked degraded."""
+    payload = results.peek(key) or history.stored_payload(username, password)
+    if not payload:
+        return None
+    return dict(payload, degraded={"reason": error, "retry_after": upstream.retry_after()})
+
+def fetch_attendance(username, password, engine_name=None, progress=no_progress, refresh=False,
+                     kind="interactive", fetch_payload=engine.fetch_payload, gate=None):
+    """Serve from the per-student cache, coalescing identical in-flight scrapes.
+
+    Scrapes go through admission control as `kind` (interactive, batch or
+    prefetch) and come back as a 429 payload when over a limit. asgi.py
+    passes its own `fetch_payload` (the async engine) and the `gate` sized
+    for it; everything else about serving a request is shared.
+    """
+    key = cache_key(username, password)
+
+    def admitted_fetch():
+        # Portal known to be down: answer without spending the student's token
+        if upstream.rejecting():
+            return upstream.unavailable()
+        with admission.slot(username, kind, gate) as charge:
+            payload, status = fetch_payload(username, password, engine_name, progress, record=True)
+            charge(status)
+            return payload, status
+
+    def scrape():
+        # A recent background prefetch (possibly from another process) beats scraping
+        if not refresh:
+            payload = prefetcher.prefetched_payload(username, password)
+            if payload:
+                return versions.stamp(payload), 200
+        # Another worker/instance may already be scraping this student
+        try:
+            payload, status = get_coordinator().run(username, password, admitted_fetch, fresh=refresh)
+        except Throttled as e:
+            return e.payload(), 429
+        if status == 503:
+            fallback = last_known(key, username, password, payload["error"])
+            if fallback:
+                return versions.stamp(fallback), 200
+        return versions.stamp(payload), status
+
+    payload, status, info = results.get_or_fetch(key, scrape, force=refresh)
+    metrics.cache_lookups.inc(info["status"])
+    if status == 200:
+        payload = dict(payload, cache=info)
+    return payload, status
+
+def cached_attendance(username, password):
+    """A fresh cached `(payload, 200)` that needs no scrape, or None."""
+    hit = results.fresh(cache_key(username, password))
+    if hit is None:
+        return None
+    payload, info = hit
+    metrics.cache_lookups.inc(info["status"])
+    return dict(payload, cache=info), 200
+
+def timing_header(payload):
+    """The scrape's phase breakdown as a Server-Timing value, or None."""
+    if metrics.SERVER_TIMING and isinstance(payload, dict) and payload.get('meta'):
+        return metrics.server_timing(payload['meta'], (payload.get('cache') or {}).get('status'))
+    return None
+
+def with_timing(response, payload):
+    """Attach the scrape's phase breakdown as a Server-Timing header."""
+    timing = timing_header(payload)
+    if timing:
+        response.headers['Server-Timing'] = timing
+    return response
+
+def attendance_response(payload, status, if_none_match=None, since=None):
+    """`(body or None, status, headers)` for an /api/attendance result.
+
+    Shared by the Flask route and asgi.py: 304/delta handling, Server-Timing,
+    and Retry-After on 429/503.
+    """
+    body, status, headers = versions.conditional(payload, status, served, if_none_match, since)
+    timing = timing_header(payload)
+    if timing:
+        headers['Server-Timing'] = timing
+    if status in (429, 503) and payload.get('retry_after'):
+        headers['Retry-After'] = str(payload['retry_after'])
+    return body, status, headers
+
+def throttled_client():
+    """A 429 response if this client is over its request rate, else None."""
+    try:
+        admission.check_client(request.remote_addr)
+    except Throttled as e:
+        return too_many(e.payload())
+    return None
+
+def too_many(payload):
+    response = jsonify(payload)
+    response.headers['Retry-After'] = str(payload['retry_after'])
+    return response, 429
+
+def credentials(data):
+    """`(username, password, engine_name, refresh)` from a request's JSON body."""
+    if not isinstance(data, dict):
+        data = {}
+    engine_name = data.get('engine') if data.get('engine') in engine.API_ENGINES else None
+    return data.get('username'), data.get('password'), engine_name, bool(data.get('refresh'))
+
+def read_credentials():
+    return credentials(request.get_json(silent=True))
+
 @app.route('/api/attendance', methods=['POST'])
 def get_attendance():
-    data = request.json
+    username, password, engine_name, refresh = read_credentials()
+
+    if not username or not password:
+        return jsonify({"error": "Username and password are required"}), 400
+    throttled = throttled_client()
+    if throttled:
+        return throttled
+
+    payload, status = fetch_attendance(username, password, engine_name, refresh=refresh)
+    # 304 when the client's copy is current, only changed subjects with `since`
+    since = (request.get_json(silent=True) or {}).get('since')
+    body, status, headers = attendance_response(payload, status, request.headers.get('If-None-Match'), since)
+    response = jsonify(body) if body is not None else Response(status=304)
+    response.headers.update(headers)
+    return response, status
+
+@app.route('/api/attendance/batch', methods=['POST'])
+def get_attendance_batch():
+    """Fetch many students; results stream back as NDJSON as each completes.
+
+    Accepts JSON `{"students": [{"username", "password"}, ...]}`, a CSV body
+    (`text/csv`) or a CSV upload in the `file` form field.
+    """
+    if 'file' in request.files:
+        students = batch.read_csv(request.files['file'].read().decode('utf-8', 'replace'))
+    elif request.mimetype == 'text/csv':
+        students = batch.read_csv(request.get_data(as_text=True))
+    else:
+        data = request.get_json(silent=True) or {}
+        students = [s for s in data.get('students') or []
+                    if isinstance(s, dict) and s.get('username') and s.get('password')]
+
+    if not students:
+        return jsonify({"error": "No students with username and password given"}), 400
+    if len(students) > batch.BATCH_MAX_STUDENTS:
+        return jsonify({"error": f"At most {batch.BATCH_MAX_STUDENTS} students per batch"}), 413
+    throttled = throttled_client()
+    if throttled:
+        return throttled
+
+    def stream():
+        # Cached students answer at once instead of waiting for a portal token
+        for row in batch.run_batch(students, lambda u, p: fetch_attendance(u, p, kind="batch"),
+                                   cached=cached_attendance):
+            yield json.dumps(row) + "\n"
+
+    return Response(stream(), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# --- History: served from the local store, no scraping ---
+
+def history_access():
+    """Returns (username, body, None) or (None, None, error_response)."""
+    data = request.get_json(silent=True) or {}
     username = data.get('username')
     password = data.get('password')
+    if not username or not password:
+        return None, None, (jsonify({"error": "Username and password are required"}), 400)
+    # verify() checks a password: rate-limited like every route that takes one
+    throttled = throttled_client()
+    if throttled:
+        return None, None, throttled
+    if not history.HISTORY_ENABLED or not history.get_store().verify(username, password):
+        return None, None, (jsonify({"error": "No stored attendance for these credentials"}), 404)
+    return username, data, None
+
+@app.route('/api/attendance/history/latest', methods=['POST'])
+def history_latest():
+    username, _, error = history_access()
+    if error:
+        return error
+    return jsonify(history.get_store().latest(username))
+
+@app.route('/api/attendance/history/trend', methods=['POST'])
+def history_trend():
+    username, data, error = history_access()
+    if error:
+        return error
+    series = history.get_store().trend(username, data.get('subject'), data.get('since'))
+    return jsonify({"subjects": series})
+
+@app.route('/api/attendance/history/changes', methods=['POST'])
+def history_changes():
+    username, data, error = history_access()
+    if error:
+        return error
+    return jsonify(history.get_store().changes(username, data.get('since')))
+
+# --- What-if planner: projections over stored (or supplied) attendance ---
+
+def plan_options(data):
+    """Parse planner parameters; raises ValueError on bad input."""
+    remaining = planner.check_remaining(data.get('remaining', 0))
+    target = float(data.get('target', planner.DEFAULT_TARGET))
+    attend_prob = float(data.get('attend_prob', 0.8))
+    if not 0 < target <= 100 or not 0 <= attend_prob <= 1:
+        raise ValueError("target must be in (0, 100] and attend_prob in [0, 1]")
+    return {"target": target, "remaining": remaining, "attend_prob": attend_prob,
+            "runs": int(data.get('runs', 2000)), "seed": planner.check_seed(data.get('seed'))}
+
+def plan_records(entry):
+    """Records for one planner entry: inline `data`, or the stored attendance for its credentials.
+
+    Raises ValueError when inline records aren't numeric.
+    """
+    if isinstance(entry.get('data'), list):
+        return planner.check_records([r for r in entry['data']
+                                      if isinstance(r, dict) and {'code', 'attended', 'total'} <= r.keys()])
+    username, password = entry.get('username'), entry.get('password')
+    if not username or not password:
+        return None
+    stored = history.stored_payload(username, password)
+    return stored['data'] if stored else None
+
+@app.route('/api/attendance/plan', methods=['POST'])
+def attendance_plan():
+    """Skippable/needed classes and projections; Monte Carlo when `remaining` is given."""
+    throttled = throttled_client()
+    if throttled:
+        return throttled
+    data = request.get_json(silent=True) or {}
+    try:
+        options = plan_options(data)
+        records = plan_records(data)
+        if records is None:
+            return jsonify({"error": "Give `data`, or credentials with stored attendance"}), 404
+        result = planner.plan(records, options['target'], options['remaining'])
+        if options['remaining']:
+            result['simulation'] = planner.simulate(records, options['remaining'], options['attend_prob'],
+                                                    options['target'], options['runs'], options['seed'])
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid planner parameters: {e}"}), 400
+    return jsonify(result)
+
+@app.route('/api/attendance/plan/batch', methods=['POST'])
+def attendance_plan_batch():
+    """Monte Carlo across many students in one vectorized run."""
+    data = request.get_json(silent=True) or {}
+    entries = [e for e in data.get('students') or [] if isinstance(e, dict)]
+    if not entries:
+        return jsonify({"error": "No students given"}), 400
+    if len(entries) > batch.BATCH_MAX_STUDENTS:
+        return jsonify({"error": f"At most {batch.BATCH_MAX_STUDENTS} students per batch"}), 413
+    throttled = throttled_client()
+    if throttled:
+        return throttled
+    try:
+        options = plan_options(data)
+        students = [plan_records(e) for e in entries]
+        result = planner.simulate_batch([s or [] for s in students], options['remaining'], options['attend_prob'],
+                                        options['target'], options['runs'], options['seed'])
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid planner parameters: {e}"}), 400
+    for entry, records, row in zip(entries, students, result['students']):
+        if entry.get('username'):
+            row['username'] = entry['username']
+        if records is None:
+            row['error'] = "No stored attendance for these credentials"
+    return jsonify(result)
+
+# --- Job API: POST returns immediately, clients poll or subscribe over SSE ---
+
+@app.route('/api/attendance/jobs', methods=['POST'])
+def create_job():
+    username, password, engine_name, refresh = read_credentials()
 
     if not username or not password:
         return jsonify({"error": "Username and password are required"}), 400
+    throttled = throttled_client()
+    if throttled:
+        return throttled
 
-    print(f"Starting attendance fetch via Playwright for: {username}")
-    
-    with sync_playwright() as p:
-        browser = None
-        try:
-            # 1. Launch Browser
-            browser = p.chromium.launch(headless=True, args=['--no-sandbox', '--disable-setuid-sandbox'])
-            page = browser.new_page()
-            
-            # 2. Navigation
-            try:
-                page.goto("http://mitsims.in/", timeout=45000)
-            except Exception:
-                return jsonify({"error": "The MITS server is taking too long to respond. Please try after some time."}), 504
-            
-            # 3. Open Login Form
-            try:
-                page.wait_for_selector("#studentLink", state="visible", timeout=15000)
-                page.click("#studentLink", force=True)
-                page.wait_for_selector("#studentForm #inputStuId", state="visible", timeout=15000)
-            except Exception:
-                return jsonify({"error": "Connection timed out. Please try after some time."}), 504
-            
-            # 4. Submit Credentials
-            page.fill("#studentForm #inputStuId", username)
-            page.fill("#studentForm #inputPassword", password)
-            page.click("#studentSubmitButton", force=True)
-            
-            # 5. Wait for Dashboard or Error
-            try:
-                page.wait_for_selector("#studentName, #studentErrorDiv", timeout=10000)
-            except:
-                try:
-                    page.evaluate("if(document.querySelector('#studentForm')) document.querySelector('#studentForm').submit();")
-                    page.wait_for_selector("#studentName, #studentErrorDiv", timeout=12000)
-                except Exception:
-                    return jsonify({"error": "Login failed or timed out. Please check your credentials and try after some time."}), 401
-
-            # 6. Check for specific error message
-            error_div = page.query_selector("#studentErrorDiv")
-            if error_div:
-                err_text = ""
-                try:
-                    err_text = error_div.inner_text().strip()
-                except:
-                    pass
-                if err_text:
-                    if any(kw in err_text.lower() for kw in ["invalid", "wrong", "mismatch", "incorrect"]):
-                        return jsonify({"error": "Invalid Registration Number or Password"}), 401
-                    return jsonify({"error": err_text}), 401
-
-            # Verify if dashboard actually loaded
-            if not page.query_selector("#studentName"):
-                 return jsonify({"error": "Invalid Registration Number or Password"}), 401
-            
-            # 7. extraction
-            time.sleep(4)
-            full_text = page.inner_text("body")
-            
-            # Name extraction
-            student_name = "Student"
-            match = re.search(r"([A-Z\s]+)\s+\|\s+Change Password", full_text)
-            if match:
-                student_name = match.group(1).strip()
-
-            attendance_data = []
-            lines = [l.strip() for l in full_text.split('\n') if l.strip()]
-            for i, line in enumerate(lines):
-                upper_line = line.upper()
-                if "TOTAL CONDUCTED" in upper_line or "ATTENDANCE %" in upper_line:
-                    continue
-
-                match_subject_code = re.match(r'^\d*[A-Z]+\d+[A-Z0-9]*$', line)
-                is_text_subject = (line.isupper() and len(line) > 3 and not re.search(r'\d', line))
-
-                if match_subject_code or is_text_subject:
-                    try:
-                        lookahead = lines[i+1:i+6]
-                        numbers_found = []
-                        for sub in lookahead:
-                            if re.match(r'^[\d\.]+%?$', sub) or sub == '-':
-                                val = sub.replace('%', '').replace('-', '0')
-                                numbers_found.append(val)
-                        
-                        if len(numbers_found) >= 3:
-                            attendance_data.append({
-                                "code": line,
-                                "attended": numbers_found[0],
-                                "total": numbers_found[1],
-                                "percentage": numbers_found[2]
-                            })
-                    except:
-                        pass
-
-            return jsonify({
-                "message": "Success", 
-                "student_name": student_name,
-                "data": attendance_data
-            })
-
-        except Exception as e:
-            err_msg = str(e)
-            if "Target page, context or browser has been closed" in err_msg or "Timeout" in err_msg:
-                return jsonify({"error": "Connection timed out. Please try after some time."}), 504
-            return jsonify({"error": "Something went wrong. Please try after some time."}), 500
-        finally:
-            if browser:
-                try:
-                    browser.close()
-                except:
-                    pass
+    try:
+        job = jobs.submit(lambda job: fetch_attendance(username, password, engine_name, job.set_phase, refresh))
+    except QueueFull:
+        return too_many({"error": "Too many requests right now. Please try after some time.",
+                         "retry_after": admission.retry_after()})
+
+    return jsonify({
+        "job_id": job.id,
+        "phase": job.phase,
+        "status_url": url_for('job_status', job_id=job.id),
+        "events_url": url_for('job_events', job_id=job.id)
+    }), 202
+
+@app.route('/api/attendance/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return with_timing(jsonify(job.to_dict()), job.result)
+
+@app.route('/api/attendance/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown or expired job"}), 404
+
+    def stream():
+        version = -1
+        while True:
+            new_version = job.wait_for_change(version, timeout=15)
+            if new_version == version:
+                yield ": keep-alive\n\n"
+                continue
+            version = new_version
+            event = "result" if job.done else "phase"
+            yield f"event: {event}\ndata: {json.dumps(job.to_dict())}\n\n"
+            if job.done:
+                return
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/attendance/jobs/metrics', methods=['GET'])
+def job_metrics():
+    return jsonify(jobs.metrics())
+
+@app.route('/api/sessions/metrics', methods=['GET'])
+def session_metrics():
+    return jsonify(engine.sessions.stats())
+
+# --- Prefetch: opted-in students are refreshed in the background ---
+
+prefetcher = prefetch.Prefetcher(lambda u, p: fetch_attendance(u, p, refresh=True, kind="prefetch"))
+if prefetch.PREFETCH_ENABLED:
+    prefetcher.start()
+
+@app.route('/api/prefetch/subscribe', methods=['POST'])
+def prefetch_subscribe():
+    data = request.get_json(silent=True) or {}
+    username, password = data.get('username'), data.get('password')
+    if not username or not password:
+        return jsonify({"error": "Username and password are required"}), 400
+    try:
+        interval = prefetch.check_interval(data.get('interval'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not prefetcher.configured:
+        return jsonify({"error": prefetch.NOT_CONFIGURED_MSG}), 503
+    throttled = throttled_client()
+    if throttled:
+        return throttled
+    # Only store credentials that logged in: the last stored fetch, else one (possibly cached) fetch now
+    if not (history.HISTORY_ENABLED and history.get_store().verify(username, password)):
+        payload, status = fetch_attendance(username, password)
+        if status == 429:
+            return too_many(payload)
+        if status != 200:
+            return jsonify({"error": payload.get("error")}), status
+    interval = prefetcher.subscribe(username, password, interval)
+    return jsonify({"subscribed": True, "interval": interval})
+
+@app.route('/api/prefetch/unsubscribe', methods=['POST'])
+def prefetch_unsubscribe():
+    data = request.get_json(silent=True) or {}
+    # Compares a password: rate-limited like subscribe
+    throttled = throttled_client()
+    if throttled:
+        return throttled
+    if not prefetcher.unsubscribe(data.get('username') or '', data.get('password') or ''):
+        return jsonify({"error": "No subscription for these credentials"}), 404
+    return jsonify({"subscribed": False})
+
+@app.route('/api/prefetch/metrics', methods=['GET'])
+def prefetch_metrics():
+    return jsonify(prefetcher.status())
+
+@app.route('/api/pool/metrics', methods=['GET'])
+def pool_metrics():
+    return jsonify(get_pool().stats())
+
+@app.route('/api/upstream/health', methods=['GET'])
+def upstream_health():
+    return jsonify(upstream.stats())
+
+@app.after_request
+def compress(response):
+    return compress_response(response, request.headers.get('Accept-Encoding'))
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint; counters are per worker process."""
+    gauges = {f"attendance_jobs_{k}": v for k, v in jobs.metrics().items()}
+    gauges.update({f"attendance_cache_{k}": v for k, v in results.stats().items()})
+    gauges.update({f"attendance_sessions_{k}": v for k, v in engine.sessions.stats().items()})
+    gauges.update({f"attendance_memory_{k}": v for k, v in get_pool().governor.stats().items()})
+    gauges.update({f"attendance_coordination_{k}": v for k, v in get_coordinator().stats().items()})
+    gauges.update({f"attendance_admission_{k}": v for k, v in admission.stats().items()})
+    health = upstream.stats()
+    gauges["attendance_upstream_breaker_open"] = int(health.pop("state") != "closed")
+    gauges.update({f"attendance_upstream_{k}": v for k, v in health.items()})
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    app.run(debug=True, port=5000, threaded=True)
@@ -0,0 +1,126 @@
+"""ASGI entry point: `uvicorn asgi:app`.
+
+POST /api/attendance is served by the asyncio Playwright engine, so one
+process drives many logins concurrently from a single event loop; caching,
+admission, prefetched answers and the response itself are the Flask
+route's (app.fetch_attendance / app.attendance_response). Requests for the
+HTTP engine are handed to it as in Flask. Every other route is handed to
+the Flask app unchanged.
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.wsgi import WsgiToAsgi
+
+import async_engine
+import engine
+from admission import ADMIT_MAX_CONCURRENT, PriorityGate, Throttled, client_ip, memory_capacity
+from app import (app as flask_app, admission, attendance_response, credentials, fetch_attendance,
+                 CORS_EXPOSE_HEADERS)
+from compression import choose_encoding, compress, should_compress
+
+flask_asgi = WsgiToAsgi(flask_app)
+scraper = async_engine.AsyncEngine()
+# Scrapes here run on the async engine's contexts rather than the browser
+# pool, so they get a gate sized to that engine
+scrape_gate = PriorityGate(ADMIT_MAX_CONCURRENT or min(memory_capacity(), async_engine.ASYNC_CONCURRENCY))
+
+# The result cache coalesces with blocking waits, so it is consulted from
+# these threads while a browser scrape itself runs on the event loop.
+_cache_threads = ThreadPoolExecutor(max_workers=async_engine.ASYNC_CONCURRENCY * 2,
+                                    thread_name_prefix="asgi-cache")
+
+
+async def _read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+def _cors_headers(request_headers):
+    """What flask_cors adds to the Flask app's responses (any origin, same exposed headers)."""
+    return {
+        "Access-Control-Allow-Origin": request_headers.get("origin") or "*",
+        "Access-Control-Expose-Headers": ", ".join(sorted(CORS_EXPOSE_HEADERS)),
+    }
+
+
+async def _send_json(send, payload, status, request_headers=None, headers=None):
+    headers = dict(_cors_headers(request_headers or {}), **(headers or {}))
+    headers = [(k.lower().encode(), str(v).encode()) for k, v in headers.items()]
+    body = b""
+    if payload is not None:
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        headers.append((b"content-type", b"application/json"))
+        headers.append((b"vary", b"Accept-Encoding"))
+        encoding = choose_encoding((request_headers or {}).get("accept-encoding"))
+        if encoding and should_compress("application/json", len(body)):
+            body = compress(body, encoding)
+            headers.append((b"content-encoding", encoding.encode()))
+    headers.append((b"content-length", str(len(body)).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def get_attendance(scope, receive, send):
+    """app.get_attendance() on the event loop; only the scrape itself differs."""
+    request_headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+    try:
+        data = json.loads(await _read_body(receive) or b"{}")
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    username, password, engine_name, refresh = credentials(data)
+
+    if not username or not password:
+        await _send_json(send, {"error": "Username and password are required"}, 400, request_headers)
+        return
+    try:
+        admission.check_client(client_ip((scope.get("client") or [None])[0],
+                                         request_headers.get("x-forwarded-for")))
+    except Throttled as e:
+        await _send_json(send, e.payload(), 429, request_headers, {"Retry-After": e.retry_after})
+        return
+
+    loop = asyncio.get_running_loop()
+    options = {}
+    if (engine_name or engine.DEFAULT_ENGINE) == "playwright":
+        # Browser scrapes run on the async engine instead of the browser pool
+        def fetch_payload(username, password, engine_name, progress, record=False):
+            return asyncio.run_coroutine_threadsafe(
+                async_engine.fetch_payload(scraper, username, password, progress, record), loop).result()
+        options = {"fetch_payload": fetch_payload, "gate": scrape_gate}
+
+    payload, status = await loop.run_in_executor(
+        _cache_threads,
+        lambda: fetch_attendance(username, password, engine_name, refresh=refresh, **options)
+    )
+    body, status, headers = attendance_response(payload, status, request_headers.get("if-none-match"),
+                                                data.get('since'))
+    await _send_json(send, body, status, request_headers, headers)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await scraper.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await scraper.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+    elif scope["type"] == "http" and scope["path"] == "/api/attendance" and scope["method"] == "POST":
+        await get_attendance(scope, receive, send)
+    else:
+        await flask_asgi(scope, receive, send)
@@ -0,0 +1,271 @@
+import asyncio
+import os
+import time
+
+from playwright.async_api import async_playwright
+
+import engine
+import metrics
+from attendance_parser import parse_text
+from blocking import install_blocking_async
+from browser_pool import CONTEXT_DEFAULTS, LAUNCH_ARGS, MAX_USES
+from memory import Governor, browser_mb
+from cache import cache_key
+from grid_extract import GRID_JS, report_from_grid
+from health import upstream
+from history import record_fetch
+from portal import (PORTAL_URL, NAV_TIMEOUT_MSG, CONN_TIMEOUT_MSG, LOGIN_TIMEOUT_MSG,
+                    INVALID_CREDS_MSG, FORCE_SUBMIT_JS, STUDENT_LINK, USERNAME_INPUT, PASSWORD_INPUT,
+                    SUBMIT_BUTTON, DASHBOARD, ERROR_DIV, DASHBOARD_OR_ERROR, DASHBOARD_OR_LOGIN,
+                    PortalError, classify_error, login_error, no_progress, require_records)
+from readiness import PhaseTimer, XhrTracker, wait_for_attendance_async
+
+# Logins driven at once from the single event loop
+ASYNC_CONCURRENCY = int(os.environ.get("ASYNC_CONCURRENCY", "10"))
+
+
+async def login_async(page, username, password, progress=no_progress, timer=None):
+    """portal.login() on the async API."""
+    progress("logging_in")
+    try:
+        await page.wait_for_selector(STUDENT_LINK, state="visible",
+                                     timeout=upstream.timeout_ms("selector", 15000, "playwright-async"))
+        await page.click(STUDENT_LINK, force=True)
+        await page.wait_for_selector(USERNAME_INPUT, state="visible",
+                                     timeout=upstream.timeout_ms("selector", 15000, "playwright-async"))
+    except Exception:
+        raise PortalError(CONN_TIMEOUT_MSG, 504)
+    if timer:
+        timer.mark("open_login")
+
+    await page.fill(USERNAME_INPUT, username)
+    await page.fill(PASSWORD_INPUT, password)
+    await page.click(SUBMIT_BUTTON, force=True)
+
+    try:
+        await page.wait_for_selector(DASHBOARD_OR_ERROR, timeout=10000)
+    except Exception:
+        if timer:
+            timer.mark("login")
+        try:
+            await page.evaluate(FORCE_SUBMIT_JS)
+            await page.wait_for_selector(DASHBOARD_OR_ERROR, timeout=12000)
+        except Exception:
+            raise PortalError(LOGIN_TIMEOUT_MSG, 401)
+        if timer:
+            timer.mark("force_submit")
+    else:
+        if timer:
+            timer.mark("login")
+
+    error_div = await page.query_selector(ERROR_DIV)
+    if error_div:
+        err_text = ""
+        try:
+            err_text = (await error_div.inner_text()).strip()
+        except Exception:
+            pass
+        if err_text:
+            raise login_error(err_text)
+
+    if not await page.query_selector(DASHBOARD):
+        raise PortalError(INVALID_CREDS_MSG, 401)
+
+
+async def session_alive_async(page):
+    try:
+        await page.wait_for_selector(DASHBOARD_OR_LOGIN, state="visible",
+                                     timeout=upstream.timeout_ms("selector", 15000, "playwright-async"))
+    except Exception:
+        return False
+    return await page.query_selector(DASHBOARD) is not None
+
+
+async def read_dashboard_async(context, username, password, progress=no_progress, resume=False):
+    """portal.read_dashboard() on the async API; same `(report, meta)` result."""
+    timer = PhaseTimer()
+    blocked = await install_blocking_async(context)
+    page = await context.new_page()
+    tracker = XhrTracker(page)
+
+    progress("navigating")
+    try:
+        await page.goto(PORTAL_URL, timeout=upstream.timeout_ms("navigate", 45000, "playwright-async"))
+    except Exception:
+        raise PortalError(NAV_TIMEOUT_MSG, 504)
+    timer.mark("navigate")
+
+    session = "new"
+    if resume:
+        session = "reused" if await session_alive_async(page) else "expired"
+        timer.mark("resume")
+
+    if session != "reused":
+        await login_async(page, username, password, progress, timer)
+
+    progress("extracting")
+    ready = await wait_for_attendance_async(page, tracker)
+    timer.mark("ready_wait")
+    report = None
+    try:
+        report = report_from_grid(await page.evaluate(GRID_JS))
+    except Exception:
+        pass
+    extraction = "grid"
+    if report is None:
+        report = parse_text(await page.inner_text("body"))
+        extraction = "text"
+    require_records(report)
+    timer.mark("extract")
+
+    return report, {
+        "ready": ready,
+        "extraction": extraction,
+        "session": session,
+        "blocking": blocked.to_dict(),
+        "timings_ms": timer.timings,
+        "total_ms": timer.total()
+    }
+
+
+class AsyncEngine:
+    """One Chromium driven from one event loop, many contexts at once.
+
+    A semaphore caps concurrent logins, and the memory governor holds new
+    ones while the worker is over its budget, like the browser pool. The
+    browser is swapped for a fresh one after MAX_USES contexts, a crash, or
+    once Chromium passes BROWSER_RECYCLE_MB; the old one is closed once the
+    contexts still running on it have finished.
+    """
+
+    def __init__(self, concurrency=ASYNC_CONCURRENCY, max_uses=MAX_USES):
+        self.concurrency = concurrency
+        self.max_uses = max_uses
+        self._sem = None
+        self._lock = None
+        self._playwright = None
+        self._browser = None
+        self._uses = 0
+        self._active = {}  # browser -> running contexts
+        self.governor = Governor()
+
+    async def start(self):
+        if self._playwright is None:
+            self._sem = asyncio.Semaphore(self.concurrency)
+            self._lock = asyncio.Lock()
+            self._playwright = await async_playwright().start()
+
+    def _running(self):
+        return sum(self._active.values())
+
+    async def _acquire_browser(self):
+        # Over the memory budget: let running logins finish first, then
+        # start on a fresh browser if that wasn't enough
+        await self.governor.admit_async(self._running)
+        async with self._lock:
+            stale = self._browser is not None and (
+                not self._browser.is_connected() or self._uses >= self.max_uses
+                or (not self._running() and self.governor.recycle_before()))
+            if stale:
+                old, self._browser = self._browser, None
+                if not self._active.get(old):
+                    await self._close(old)
+            if self._browser is None:
+                self._browser = await self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+                self._uses = 0
+            self._uses += 1
+            browser = self._browser
+            self._active[browser] = self._active.get(browser, 0) + 1
+            return browser
+
+    async def _release_browser(self, browser):
+        async with self._lock:
+            self._active[browser] -= 1
+            if browser is self._browser and self.governor.should_recycle(browser_mb()):
+                # Swapped on the next acquire, closed once its contexts finish
+                self._uses = self.max_uses
+            if browser is not self._browser and not self._active[browser]:
+                await self._close(browser)
+
+    async def _close(self, browser):
+        self._active.pop(browser, None)
+        try:
+            await browser.close()
+        except Exception:
+            pass
+
+    async def fetch(self, username, password, progress=no_progress, storage_state=None):
+        """Returns `(report, meta, new_storage_state_or_None)`."""
+        await self.start()
+        waited = time.perf_counter()
+        async with self._sem:
+            browser = await self._acquire_browser()
+            context = None
+            try:
+                if storage_state is not None:
+                    context = await browser.new_context(storage_state=storage_state, **CONTEXT_DEFAULTS)
+                else:
+                    context = await browser.new_context(**CONTEXT_DEFAULTS)
+                setup_ms = round((time.perf_counter() - waited) * 1000, 1)
+                report, meta = await read_dashboard_async(
+                    context, username, password, progress, resume=storage_state is not None)
+                # Slot wait, browser (re)launch and context creation
+                meta["timings_ms"] = {"browser": setup_ms, **meta["timings_ms"]}
+                meta["total_ms"] = round(meta["total_ms"] + setup_ms, 1)
+                meta["memory_mb"] = self.governor.measure()
+                state = None
+                if meta["session"] != "reused":
+                    state = await context.storage_state()
+                return report, meta, state
+            finally:
+                if context:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+                await self._release_browser(browser)
+
+    async def close(self):
+        if self._playwright is None:
+            return
+        for browser in list(self._active) + ([self._browser] if self._browser else []):
+            await self._close(browser)
+        self._browser = None
+        await self._playwright.stop()
+        self._playwright = None
+
+
+async def fetch_payload(scraper, username, password, progress=no_progress, record=False):
+    """engine.fetch_payload() on the async engine, sharing the session store."""
+    print(f"Starting async attendance fetch for: {username}")
+    if not upstream.allow():
+        return upstream.unavailable()
+    started = time.perf_counter()
+    key = cache_key(username, password)
+    state = engine.sessions.get(key) if engine.SESSION_REUSE else None
+    try:
+        report, meta, new_state = await scraper.fetch(username, password, progress, state)
+    except Exception as e:
+        if state is not None:
+            engine.sessions.invalidate(key)
+        err = classify_error(e)
+        metrics.record_fetch("playwright-async", err.status, time.perf_counter() - started)
+        upstream.record(err.status)
+        return {"error": err.message}, err.status
+
+    if meta["session"] == "expired":
+        engine.sessions.invalidate(key, expired=True)
+    if engine.SESSION_REUSE and new_state is not None:
+        engine.sessions.save(key, new_state)
+    meta["engine"] = "playwright-async"
+    metrics.record_fetch("playwright-async", 200, time.perf_counter() - started, meta["timings_ms"],
+                         meta.get("memory_mb"))
+    upstream.record(200, meta["timings_ms"], "playwright-async")
+    if record:
+        record_fetch(username, password, report.student_name, report.records)
+    return {
+        "message": "Success",
+        "student_name": report.student_name,
+        "data": [r.to_dict() for r in report.records],
+        "meta": meta
+    }, 200
@@ -0,0 +1,165 @@
+import re
+from dataclasses import dataclass, asdict
+
+# Compiled once; the old per-line re.match/re.search calls recompiled on every hit
+SUBJECT_CODE_RE = re.compile(r'^\d*[A-Z]+\d+[A-Z0-9]*$')
+NUMBER_RE = re.compile(r'^[\d\.]+%?$')
+DIGIT_RE = re.compile(r'\d')
+NAME_RE = re.compile(r"([A-Z\s]+)\s+\|\s+Change Password")
+
+# Numbers belonging to a subject must appear within this many lines after it
+LOOKAHEAD = 5
+HEADER_MARKERS = ("TOTAL CONDUCTED", "ATTENDANCE %")
+
+# Field names (lower-cased, letters only) seen in ExtJS store records / JSON
+SUBJECT_KEYS = ("subjectcode", "subject", "coursecode", "course", "code", "subjectname", "name")
+ATTENDED_KEYS = ("attended", "present", "classesattended", "noofattended")
+TOTAL_KEYS = ("conducted", "totalconducted", "total", "classesconducted", "noofconducted")
+PERCENT_KEYS = ("percentage", "percent", "attendancepercentage", "attpercentage")
+KEY_CLEAN_RE = re.compile(r'[^a-z]')
+
+
+@dataclass(slots=True)
+class Record:
+    code: str
+    attended: int
+    total: int
+    percentage: float
+
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class Report:
+    student_name: str
+    records: list
+
+
+def to_number(token):
+    """Numeric value of a grid cell ("12", "83.33%", "-" -> 0), or None."""
+    token = token.strip()
+    if token == '-':
+        return 0.0
+    if not NUMBER_RE.match(token):
+        return None
+    try:
+        return float(token.rstrip('%'))
+    except ValueError:
+        return None
+
+
+def is_subject(line):
+    if SUBJECT_CODE_RE.match(line):
+        return True
+    # Union of the old Flask (len > 3) and Streamlit (2 < len < 30) rules:
+    # long subject names must not drop out of the API
+    return line.isupper() and len(line) > 2 and not DIGIT_RE.search(line)
+
+
+def make_record(code, numbers):
+    return Record(code=code, attended=int(numbers[0]), total=int(numbers[1]), percentage=numbers[2])
+
+
+def parse_text(full_text):
+    """Parse the dashboard's `inner_text("body")` in one pass over its lines.
+
+    A subject line opens a window of LOOKAHEAD lines; every numeric line
+    inside the window is collected, and the first three make the record.
+    At most LOOKAHEAD windows are open at once, so the work is linear.
+    """
+    match = NAME_RE.search(full_text)
+    student_name = match.group(1).strip() if match else "Student"
+
+    records = []
+    open_windows = []  # [code, lines_left, numbers]
+
+    for raw in full_text.split('\n'):
+        line = raw.strip()
+        if not line:
+            continue
+
+        value = to_number(line)
+        for window in open_windows:
+            window[1] -= 1
+            if value is not None:
+                window[2].append(value)
+        while open_windows and open_windows[0][1] == 0:
+            code, _, numbers = open_windows.pop(0)
+            if len(numbers) >= 3:
+                records.append(make_record(code, numbers))
+
+        upper_line = line.upper()
+        if any(marker in upper_line for marker in HEADER_MARKERS):
+            continue
+        if is_subject(line):
+            open_windows.append([line, LOOKAHEAD, []])
+
+    for code, _, numbers in open_windows:
+        if len(numbers) >= 3:
+            records.append(make_record(code, numbers))
+
+    return Report(student_name, records)
+
+
+def parse_rows(rows):
+    """Build records from structured grid rows (sequences of cell strings).
+
+    The first non-numeric cell is the subject; the first three numeric cells
+    after it are attended, total and percentage (so a leading S.No. column is
+    ignored). Rows that don't fit are skipped.
+    """
+    records = []
+    for row in rows:
+        code = None
+        numbers = []
+        for cell in row:
+            cell = str(cell).strip()
+            if not cell:
+                continue
+            value = to_number(cell)
+            if code is None:
+                if value is None:
+                    code = cell
+            elif value is not None:
+                numbers.append(value)
+        if code and len(numbers) >= 3:
+            records.append(make_record(code, numbers))
+    return records
+
+
+def _pick(obj, keys):
+    lowered = {KEY_CLEAN_RE.sub('', str(k).lower()): v for k, v in obj.items()}
+    for key in keys:
+        if lowered.get(key) not in (None, ""):
+            return str(lowered[key]).strip()
+    return None
+
+
+def parse_objects(payload):
+    """Build records from store records / JSON objects, at any nesting depth.
+
+    An object counts as a record when it has a subject plus attended and
+    total fields; the percentage is computed when the portal omits it.
+    """
+    records = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            code = _pick(node, SUBJECT_KEYS)
+            attended = to_number(_pick(node, ATTENDED_KEYS) or "")
+            total = to_number(_pick(node, TOTAL_KEYS) or "")
+            if code and attended is not None and total is not None:
+                percentage = to_number(_pick(node, PERCENT_KEYS) or "")
+                if percentage is None:
+                    percentage = round(attended / total * 100, 2) if total else 0.0
+                records.append(make_record(code, (attended, total, percentage)))
+                return
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(payload)
+    return records
@@ -1,114 +1,290 @@
-import time
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-
-def calculate_attendance():
-    print("--- MITS IMS Attendance Calculator ---")
-    username = input("Enter your Register Number: ")
-    password = input("Enter your Password: ")
-
-    print("\nStarting Browser...")
-    
-    # Setup Chrome Driver
-    options = webdriver.ChromeOptions()
-    # options.add_argument("--headless") # Uncomment to run in background
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+import argparse
+import contextlib
+import getpass
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+from datetime import datetime, timezone
 
+import engine
+from portal import INVALID_CREDS_MSG, classify_error
+
+# The CLI defaults to Playwright like the web app (Selenium needs
+# `pip install selenium webdriver-manager`); any engine works
+CLI_ENGINE = os.environ.get("CLI_ENGINE", "playwright")
+# Watch mode: seconds between reads, and reads before Chrome is restarted
+# so a session running for weeks doesn't slowly grow
+WATCH_INTERVAL = float(os.environ.get("WATCH_INTERVAL", "900"))
+WATCH_RECYCLE_READS = int(os.environ.get("WATCH_RECYCLE_READS", "48"))
+WATCH_BACKOFF_MAX = float(os.environ.get("WATCH_BACKOFF_MAX", "3600"))
+HOOK_TIMEOUT = 60
+
+
+def read_password(args):
+    if args.password_stdin:
+        return sys.stdin.readline().rstrip("\n")
+    if args.password:
+        return args.password
+    if os.environ.get("MITS_PASSWORD"):
+        return os.environ["MITS_PASSWORD"]
+    if sys.stdin.isatty():
+        return getpass.getpass("Password: ")
+    return None
+
+
+def print_report(payload):
+    data = payload["data"]
+    print(f"--- {payload['student_name']} ---")
+    if not data:
+        print("Could not identify any attendance records.")
+        return
+    width = max(len(d["code"]) for d in data)
+    print(f"{'Subject'.ljust(width)} | Attended | Total |      %")
+    for d in data:
+        print(f"{d['code'].ljust(width)} | {d['attended']:>8} | {d['total']:>5} | {d['percentage']:>6.2f}")
+    attended = sum(d["attended"] for d in data)
+    total = sum(d["total"] for d in data)
+    overall = attended / total * 100 if total else 0
+    print(f"{'Overall'.ljust(width)} | {attended:>8} | {total:>5} | {overall:>6.2f}")
+
+
+def calculate_attendance(args):
+    """Non-interactive single fetch (or --watch); exit status 0 on success, 1 on failure."""
+    username = args.username or os.environ.get("MITS_USERNAME")
+    password = read_password(args)
+    if not username or not password:
+        print("Username and password are required (--username/--password, MITS_USERNAME/MITS_PASSWORD "
+              "or --password-stdin).", file=sys.stderr)
+        return 2
+    if args.watch:
+        return watch(args, username, password)
+
+    # Keep stdout to the report / JSON alone; engine logging goes to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        payload, status = engine.fetch_payload(username, password, args.engine, record=args.history,
+                                               headless=not args.headed)
+    if args.json:
+        print(json.dumps(dict(payload, status=status)))
+    elif status == 200:
+        print_report(payload)
+    else:
+        print(f"Error: {payload['error']}", file=sys.stderr)
+    return 0 if status == 200 else 1
+
+
+def log(message):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}", file=sys.stderr, flush=True)
+
+
+class SeleniumReader:
+    """One headless Chrome kept logged in between reads.
+
+    Each read reopens the portal in the same tab; if the session expired
+    the portal shows the login link again and we log back in. Chrome is
+    restarted every `recycle_after` reads and after any browser error.
+    """
+
+    def __init__(self, username, password, headless=True, recycle_after=WATCH_RECYCLE_READS):
+        self.username = username
+        self.password = password
+        self.headless = headless
+        self.recycle_after = recycle_after
+        self.driver = None
+        self.reads = 0
+        self.logins = 0
+
+    def _login(self):
+        import selenium_engine
+
+        selenium_engine.login(self.driver, self.username, self.password)
+        self.logins += 1
+
+    def read(self):
+        import selenium_engine
+
+        if self.driver is not None and self.reads >= self.recycle_after:
+            self.close()
+        if self.driver is None:
+            self.driver = selenium_engine.open_driver(self.headless)
+            self.reads = 0
+            selenium_engine.navigate(self.driver)
+            self._login()
+        else:
+            selenium_engine.navigate(self.driver)
+            if not selenium_engine.session_alive(self.driver):
+                log("Session expired, logging in again")
+                self._login()
+        report, _, _ = selenium_engine.read_attendance(self.driver)
+        self.reads += 1
+        return report.student_name, [r.to_dict() for r in report.records]
+
+    def close(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+
+
+class EngineReader:
+    """Other engines: a fresh fetch (and login) per read."""
+
+    def __init__(self, username, password, engine_name, record=False):
+        self.username = username
+        self.password = password
+        self.engine_name = engine_name
+        self.record = record
+
+    def read(self):
+        with contextlib.redirect_stdout(sys.stderr):
+            result = engine.fetch(self.username, self.password, self.engine_name, record=self.record)
+        return result["student_name"], [r.to_dict() for r in result["records"]]
+
+    def close(self):
+        pass
+
+
+def diff_records(previous, current):
+    """Subjects whose attended/total changed, appeared or disappeared between two reads."""
+    before = {row["code"]: row for row in previous}
+    after = {row["code"]: row for row in current}
+    changes = []
+    for code, row in after.items():
+        old = before.get(code)
+        if old is None or (old["attended"], old["total"]) != (row["attended"], row["total"]):
+            changes.append({"code": code, "before": old, "after": row})
+    for code in before.keys() - after.keys():
+        changes.append({"code": code, "before": before[code], "after": None})
+    return changes
+
+
+def run_hook(hook, event):
+    """Run the --hook command with the change event as JSON on stdin."""
+    body = json.dumps(event)
+    env = dict(os.environ, ATTENDANCE_EVENT=body)
+    try:
+        done = subprocess.run(hook, shell=True, input=body, text=True, env=env, timeout=HOOK_TIMEOUT)
+        if done.returncode:
+            log(f"Hook exited with status {done.returncode}")
+    except subprocess.TimeoutExpired:
+        log(f"Hook did not finish within {HOOK_TIMEOUT}s")
+
+
+def watch(args, username, password):
+    """Re-read attendance every --interval seconds; emit only when it changes."""
+    if args.engine == "selenium":
+        reader = SeleniumReader(username, password, headless=not args.headed, recycle_after=args.recycle_after)
+    else:
+        reader = EngineReader(username, password, args.engine, args.history)
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    previous = None
+    reads = 0
+    backoff = 0
+    try:
+        while not stop.is_set():
+            try:
+                student_name, data = reader.read()
+                backoff = 0
+            except Exception as e:
+                err = classify_error(e)
+                reader.close()
+                if err.message == INVALID_CREDS_MSG:
+                    # Password changed: retrying would only risk a lockout
+                    log(f"Error: {err.message}")
+                    return 1
+                backoff = min(WATCH_BACKOFF_MAX, max(args.interval, backoff * 2))
+                log(f"Read failed ({err.message}); retrying in {int(backoff)}s")
+                stop.wait(backoff)
+                continue
+
+            reads += 1
+            if previous is None:
+                log(f"Watching {len(data)} subjects for {student_name}")
+            else:
+                changes = diff_records(previous, data)
+                if changes:
+                    event = {
+                        "event": "attendance_changed",
+                        "student_name": student_name,
+                        "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                        "changes": changes,
+                        "data": data,
+                    }
+                    print(json.dumps(event), flush=True)
+                    if args.hook:
+                        run_hook(args.hook, event)
+            previous = data
+
+            if args.count and reads >= args.count:
+                break
+            stop.wait(args.interval)
+    finally:
+        reader.close()
+    return 0
+
+
+def run_batch_cli(csv_path, concurrency, output, engine_name=None, record=False):
+    """Non-interactive batch mode: CSV of `username,password` in, NDJSON out."""
+    import batch
+
+    if csv_path == "-":
+        students = batch.read_csv(sys.stdin.read())
+    else:
+        with open(csv_path, newline="") as fh:
+            students = batch.read_csv(fh.read())
+
+    out = open(output, "w") if output else sys.stdout
+    failed = 0
     try:
-        # 1. Navigate to MITS IMS
-        print("Navigating to mitsims.in...")
-        driver.get("http://mitsims.in/")
-
-        # 2. Click on Student Login
-        # Based on previous analysis: button/link is 'Student'
-        wait = WebDriverWait(driver, 10)
-        
-        # Click the "Student" link/button
-        # Finding by text usually works best for these portals
-        try:
-             student_link = wait.until(EC.element_to_be_clickable((By.ID, "studentLink")))
-             student_link.click()
-        except:
-            print("Could not find ID 'studentLink', trying by text...")
-            student_link = driver.find_element(By.XPATH, "//a[contains(text(), 'Student')]")
-            student_link.click()
-
-        # 3. Enter Credentials
-        print("Logging in...")
-        user_field = wait.until(EC.visibility_of_element_located((By.ID, "inputStuId")))
-        pass_field = driver.find_element(By.ID, "inputPassword")
-        submit_btn = driver.find_element(By.ID, "studentSubmitButton")
-
-        user_field.clear()
-        user_field.send_keys(username)
-        pass_field.clear()
-        pass_field.send_keys(password)
-        submit_btn.click()
-
-        # 4. Wait for Login to complete
-        # We wait for the URL to change or a specific element (like 'Dashboard' or 'Logout')
-        time.sleep(3) # Basic wait for transition
-
-        if "login" in driver.current_url.lower():
-            print("Login might have failed. Please check your credentials.")
-            input("Press Enter to close browser...")
-            return
-
-        print("Login Successful!")
-        print("Analyzing Attendance...")
-
-        # NOTE: Since we don't know the exact internal structure, we will look for common tables.
-        # This part tries to find a table with attendance data.
-        
-        # Heuristic: Look for tables and print their headers to help identify
-        tables = driver.find_elements(By.TAG_NAME, "table")
-        
-        found_data = False
-        
-        for table in tables:
-            headers = [th.text.lower() for th in table.find_elements(By.TAG_NAME, "th")]
-            rows = table.find_elements(By.TAG_NAME, "tr")
-            
-            # Check if this looks like an attendance table
-            if any(x in headers for x in ['subject', 'course', 'attended', 'total', '%', 'percentage']):
-                print("\n--- Attendance Data Found ---")
-                
-                total_classes_overall = 0
-                total_attended_overall = 0
-                
-                # Print Header
-                header_text = [th.text for th in table.find_elements(By.TAG_NAME, "th")]
-                print(" | ".join(header_text))
-                
-                for row in rows[1:]: # Skip header
-                    cols = row.find_elements(By.TAG_NAME, "td")
-                    col_text = [c.text for c in cols]
-                    
-                    if col_text:
-                        print(" | ".join(col_text))
-                        
-                        # Try to sum up if numbers exist
-                        # Assuming structure often implies columns for Total and Attended
-                        # This avoids complex regex for now and just prints user data
-                        
-                found_data = True
-                print("-----------------------------")
-
-        if not found_data:
-            print("\nCould not automatically identify the attendance table.")
-            print("The page is open. Please check the attendance manually.")
-            
-        print("\nProcess Complete.")
-        input("Press Enter to close the browser...")
-
-    except Exception as e:
-        print(f"An error occurred: {e}")
+        fetch = lambda u, p: engine.fetch_payload(u, p, engine_name, record=record)
+        with contextlib.redirect_stdout(sys.stderr):
+            for row in batch.run_batch(students, fetch, concurrency=concurrency):
+                failed += row["status"] != "ok"
+                out.write(json.dumps(row) + "\n")
+                out.flush()
     finally:
-        driver.quit()
+        if output:
+            out.close()
+    print(f"Processed {len(students)} students, {failed} failed.", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="MITS IMS Attendance Calculator")
+    parser.add_argument("-u", "--username", help="register number (or MITS_USERNAME)")
+    parser.add_argument("-p", "--password", help="password (or MITS_PASSWORD; prompted on a terminal)")
+    parser.add_argument("--password-stdin", action="store_true", help="read the password from stdin")
+    parser.add_argument("--engine", choices=sorted(engine.ENGINES), default=CLI_ENGINE)
+    parser.add_argument("--headed", action="store_true", help="show the browser window (Selenium)")
+    parser.add_argument("--history", action="store_true",
+                        help="also write successful fetches to the history store (HISTORY_DB)")
+    parser.add_argument("--json", action="store_true", help="print the API's JSON payload")
+    parser.add_argument("--batch", metavar="CSV", help="fetch every student in a username,password CSV ('-' for stdin)")
+    parser.add_argument("--concurrency", type=int, default=None, help="students fetched at once in batch mode")
+    parser.add_argument("--output", metavar="FILE", help="write batch NDJSON here instead of stdout")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep a session open and print a JSON line whenever attendance changes")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL, help="seconds between reads in watch mode")
+    parser.add_argument("--hook", metavar="CMD", help="run CMD on each change (event JSON on stdin)")
+    parser.add_argument("--count", type=int, default=0, help="stop watching after this many reads")
+    parser.add_argument("--recycle-after", type=int, default=WATCH_RECYCLE_READS,
+                        help="restart Chrome after this many reads")
+    return parser
+
 
 if __name__ == "__main__":
-    calculate_attendance()
+    args = build_parser().parse_args()
+
+    if args.batch:
+        import batch
+        sys.exit(run_batch_cli(args.batch, args.concurrency or batch.BATCH_CONCURRENCY, args.output, args.engine,
+                               args.history))
+    sys.exit(calculate_attendance(args))
@@ -0,0 +1,93 @@
+import csv
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Students scraped at once; the browser pool size bounds live contexts too
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "2"))
+# Logins started per minute against mitsims.in, across all running batches
+BATCH_RATE_PER_MIN = float(os.environ.get("BATCH_RATE_PER_MIN", "30"))
+BATCH_MAX_STUDENTS = int(os.environ.get("BATCH_MAX_STUDENTS", "200"))
+
+
+class RateLimiter:
+    """Spaces calls to acquire() at least 60/rate seconds apart."""
+
+    def __init__(self, rate_per_min):
+        self.interval = 60.0 / rate_per_min if rate_per_min > 0 else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+# Shared by every batch in the process so parallel batches can't add up
+portal_limiter = RateLimiter(BATCH_RATE_PER_MIN)
+
+
+def read_csv(text):
+    """Parse `username,password` rows; a header row is skipped if present."""
+    students = []
+    for row in csv.reader(io.StringIO(text)):
+        cells = [c.strip() for c in row]
+        if len(cells) < 2 or not cells[0] or not cells[1]:
+            continue
+        if not students and cells[0].lower() in ("username", "register number", "regno", "reg_no", "id"):
+            continue
+        students.append({"username": cells[0], "password": cells[1]})
+    return students
+
+
+def run_batch(students, fetch, concurrency=BATCH_CONCURRENCY, limiter=portal_limiter, cached=None):
+    """Fetch every student and yield one result row each, in completion order.
+
+    `fetch(username, password)` must return `(payload, status_code)`. With
+    `cached(username, password)` (same result, or None), students it can
+    answer skip the portal rate limiter; only real fetches wait for it.
+    Rows carry the register number, status, error (if any) and elapsed
+    time; the password is never echoed back.
+    """
+    def one(index, student):
+        hit = cached(student["username"], student["password"]) if cached else None
+        if hit is None:
+            limiter.acquire()
+        start = time.perf_counter()
+        try:
+            if hit is not None:
+                payload, status_code = hit
+            else:
+                payload, status_code = fetch(student["username"], student["password"])
+        except Exception as e:
+            print(f"Batch fetch crashed for {student['username']}: {e}")
+            payload, status_code = {"error": "Something went wrong. Please try after some time."}, 500
+        row = {
+            "index": index,
+            "username": student["username"],
+            "status": "ok" if status_code == 200 else "error",
+            "status_code": status_code,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+        if status_code == 200:
+            row["student_name"] = payload.get("student_name")
+            row["data"] = payload.get("data")
+        else:
+            row["error"] = payload.get("error")
+        return row
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch") as pool:
+        futures = [pool.submit(one, i, s) for i, s in enumerate(students)]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Client went away: don't start logins nobody will read
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,86 @@
+"""Throughput of the sync pool vs the asyncio engine against the mock portal.
+
+    python benchmarks/async_throughput.py --levels 1 10 50 --latency-ms 300
+
+Prints one JSON object per (engine, concurrency) with requests/s and
+p50/p95 latency. The sync pool runs BROWSER_POOL_SIZE browsers, like one
+gunicorn worker would. Needs Chromium installed for Playwright.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PORT = 8791
+os.environ["PORTAL_URL"] = f"http://127.0.0.1:{PORT}/"
+os.environ["SESSION_REUSE"] = "0"  # measure full logins
+
+import mock_portal  # noqa: E402
+
+
+def summarize(engine, concurrency, latencies, wall):
+    latencies = sorted(latencies)
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000, 1)
+    return {
+        "engine": engine,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+    }
+
+
+def bench_sync(concurrency, requests):
+    import engine
+
+    def one(i):
+        start = time.perf_counter()
+        engine.fetch_payload(f"S{i:04d}", "x")
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(requests)))
+    return summarize("sync-pool", concurrency, latencies, time.perf_counter() - start)
+
+
+async def bench_async(concurrency, requests):
+    import async_engine
+
+    scraper = async_engine.AsyncEngine(concurrency=concurrency)
+    await scraper.start()
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            start = time.perf_counter()
+            await async_engine.fetch_payload(scraper, f"S{i:04d}", "x")
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - start
+    await scraper.close()
+    return summarize("async", concurrency, latencies, wall)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--per-client", type=int, default=3, help="requests per concurrent client")
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--skip-sync", action="store_true")
+    args = parser.parse_args()
+
+    mock_portal.serve(PORT, latency_ms=args.latency_ms)
+    for level in args.levels:
+        n = level * args.per_client
+        print(json.dumps(asyncio.run(bench_async(level, n))), flush=True)
+        if not args.skip_sync:
+            print(json.dumps(bench_sync(level, n)), flush=True)
@@ -0,0 +1,265 @@
+"""End-to-end load benchmark against the mock (or replayed) portal.
+
+    python benchmarks/load.py --levels 1 4 8 16 --latency-ms 300
+    python benchmarks/load.py --replay recordings/portal --baseline-out baseline.json
+    python benchmarks/load.py --compare baseline.json          # exit 1 on regression
+    python benchmarks/load.py --target streamlit --levels 1 2 4
+
+Starts mock_portal.py in its own process and, for `--target api`, the web
+app (gunicorn with gunicorn.conf.py when installed, else Flask's threaded
+server) pointed at it. Each concurrency level runs that many clients, each
+sending --per-client POST /api/attendance requests for distinct students
+(--same-student to measure coalescing instead). `--target streamlit`
+drives the login form of streamlit_app.py through Streamlit's AppTest
+harness, one app session per request, inside this process.
+
+Prints one JSON object per (target, level): requests, errors, throughput,
+p50/p95/p99 latency and the peak memory of each worker (its whole process
+tree including Chromium, PSS where /proc has it, like memory.py). The same
+rows plus the environment go to --baseline-out for later --compare runs.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import memory  # noqa: E402
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    # Nearest rank
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return round(sorted_values[index] * 1000, 1)
+
+
+def wait_for(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=2).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+class MemorySampler:
+    """Peak memory per worker process tree, sampled in the background."""
+
+    def __init__(self, workers, interval=0.1):
+        self.workers = workers  # () -> list of pids
+        self.interval = interval
+        self.peaks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for pid in self.workers():
+                mb = memory.tree_mb(pid)
+                if mb is not None:
+                    self.peaks[pid] = max(self.peaks.get(pid, 0), mb)
+
+    def reset(self):
+        self.peaks = {}
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def start_portal(args, port):
+    cmd = [sys.executable, os.path.join(ROOT, "mock_portal.py"), "--port", str(port),
+           "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+           "--failure-rate", str(args.failure_rate), "--seed", "1"]
+    if args.replay:
+        cmd += ["--replay", os.path.abspath(args.replay)]
+    proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL)
+    wait_for(f"http://127.0.0.1:{port}/")
+    return proc
+
+
+def start_api(args, port, env):
+    """The web app as a separate process; returns (process, workers())."""
+    gunicorn = shutil.which("gunicorn")
+    if gunicorn:
+        cmd = [gunicorn, "app:app", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{port}"]
+        env = dict(env, WEB_CONCURRENCY=str(args.workers))
+    else:
+        cmd = [sys.executable, "-c", f"from app import app; app.run(port={port}, threaded=True)"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for(f"http://127.0.0.1:{port}/api/upstream/health")
+    # gunicorn's master only forks; the workers do the scraping
+    workers = (lambda: memory.children(proc.pid)) if gunicorn else (lambda: [proc.pid])
+    return proc, workers
+
+
+def api_client(port):
+    session = requests.Session()
+    url = f"http://127.0.0.1:{port}/api/attendance"
+
+    def call(username):
+        response = session.post(url, json={"username": username, "password": "x"}, timeout=180)
+        return response.status_code == 200
+    return call
+
+
+def streamlit_client():
+    from streamlit.testing.v1 import AppTest
+
+    app_path = os.path.join(ROOT, "streamlit_app.py")
+
+    def call(username):
+        at = AppTest.from_file(app_path, default_timeout=180)
+        at.run()
+        at.text_input[0].input(username)
+        at.text_input[1].input("x")
+        at.button[0].click().run()
+        return bool(at.session_state["logged_in"]) and not at.exception
+    return call
+
+
+def run_level(target, make_client, level, per_client, same_student, sampler):
+    def client(c):
+        call = make_client()
+        latencies, errors = [], 0
+        for r in range(per_client):
+            username = "LOADTEST" if same_student else f"L{level:03d}C{c:03d}R{r:03d}"
+            start = time.perf_counter()
+            try:
+                ok = call(username)
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+        return latencies, errors
+
+    sampler.reset()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=level) as pool:
+        outcomes = list(pool.map(client, range(level)))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(x for lat, _ in outcomes for x in lat)
+    errors = sum(e for _, e in outcomes)
+    peaks = sorted(sampler.peaks.values(), reverse=True)
+    return {
+        "target": target,
+        "concurrency": level,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "workers": len(peaks),
+        "peak_mb_per_worker": peaks,
+        "peak_mb": peaks[0] if peaks else None,
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    """Rows that got slower, lost throughput or grew in memory beyond `tolerance`."""
+    with open(baseline_path) as f:
+        baseline = {(row["target"], row["concurrency"]): row for row in json.load(f)["results"]}
+    regressions = []
+    for row in results:
+        old = baseline.get((row["target"], row["concurrency"]))
+        if not old:
+            continue
+        for key, worse in (("p95_ms", 1), ("p99_ms", 1), ("peak_mb", 1), ("throughput_rps", -1)):
+            before, after = old.get(key), row.get(key)
+            if not before or after is None:
+                continue
+            if (worse > 0 and after > before * (1 + tolerance)) or (worse < 0 and after < before * (1 - tolerance)):
+                regressions.append(f"{row['target']}@{row['concurrency']} {key}: {before} -> {after}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load benchmark")
+    parser.add_argument("--target", nargs="+", choices=["api", "streamlit"], default=["api"])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--per-client", type=int, default=3, help="sequential requests per client")
+    parser.add_argument("--same-student", action="store_true", help="every request for one student")
+    parser.add_argument("--engine", default="playwright", help="SCRAPE_ENGINE for the app under test")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn workers (WEB_CONCURRENCY)")
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--failure-rate", type=float, default=0)
+    parser.add_argument("--replay", metavar="DIR", help="replay a recorded portal (see mock_portal.py)")
+    parser.add_argument("--portal-port", type=int, default=8792)
+    parser.add_argument("--app-port", type=int, default=8793)
+    parser.add_argument("--baseline-out", metavar="FILE", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="baseline to check against; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed change, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="mits-load-")
+    env = dict(os.environ, PORTAL_URL=f"http://127.0.0.1:{args.portal_port}/", SCRAPE_ENGINE=args.engine,
+               HISTORY_DB=os.path.join(workdir, "history.db"), PREFETCH_ENABLED="0")
+    portal_proc = start_portal(args, args.portal_port)
+    results = []
+    try:
+        for target in args.target:
+            if target == "api":
+                proc, workers = start_api(args, args.app_port, env)
+                make_client = lambda: api_client(args.app_port)
+            else:
+                # In-process: the "worker" is this process (load generator included)
+                os.environ.update(env)
+                proc, workers = None, lambda: [os.getpid()]
+                make_client = streamlit_client
+            sampler = MemorySampler(workers)
+            try:
+                for level in args.levels:
+                    row = run_level(target, make_client, level, args.per_client, args.same_student, sampler)
+                    row["engine"] = args.engine
+                    results.append(row)
+                    print(json.dumps(row), flush=True)
+            finally:
+                sampler.stop()
+                if proc:
+                    proc.terminate()
+                    proc.wait(timeout=30)
+    finally:
+        portal_proc.terminate()
+        portal_proc.wait(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.baseline_out:
+        environment = {"python": platform.python_version(), "machine": platform.machine(),
+                       "cpus": os.cpu_count(), "recorded_at": int(time.time())}
+        settings = {k: v for k, v in vars(args).items() if k not in ("baseline_out", "compare")}
+        with open(args.baseline_out, "w") as f:
+            json.dump({"environment": environment, "settings": settings, "results": results}, f, indent=1)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for line in regressions:
+            print(f"Regression: {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
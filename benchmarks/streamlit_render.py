@@ -0,0 +1,85 @@
+"""Dashboard rerun cost of the Streamlit app: time and bytes sent per rerun.
+
+    python benchmarks/streamlit_render.py --subjects 8 40 --reruns 20
+    git show HEAD~1:streamlit_app.py > /tmp/old_app.py
+    python benchmarks/streamlit_render.py --app /tmp/old_app.py   # before
+
+Drives the logged-in dashboard through Streamlit's AppTest harness with
+synthetic attendance data and prints one JSON object per subject count:
+median rerun time, the number of markdown/html elements the rerun emits
+(each is one delta message on the websocket) and their total body bytes,
+which is what the browser receives on every rerun.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("STREAMLIT_PREWARM", "0")
+
+
+def sample_data(subjects):
+    data = []
+    for i in range(subjects):
+        total = 40 + i % 7
+        attended = total - (i * 3) % 15
+        data.append({"code": f"20CS{501 + i}", "attended": attended, "total": total,
+                     "percentage": round(attended / total * 100, 2)})
+    return data
+
+
+def payload(app_test):
+    """(elements, bytes) of markdown and components.html bodies in the last run."""
+    elements, size = 0, 0
+    for md in app_test.markdown:
+        elements += 1
+        size += len(md.value.encode())
+    for node in app_test.get("iframe"):
+        # components.html (the one-off asset injection)
+        elements += 1
+        size += len(getattr(node.proto, "srcdoc", "").encode())
+    return elements, size
+
+
+def bench(app_path, subjects, reruns):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(app_path, default_timeout=60)
+    at.session_state["logged_in"] = True
+    at.session_state["user_name"] = "BENCHMARK STUDENT"
+    at.session_state["data"] = sample_data(subjects)
+    at.run()  # first run: assets, cache fill
+
+    times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        times.append((time.perf_counter() - start) * 1000)
+    elements, size = payload(at)
+    return {
+        "app": os.path.relpath(app_path, ROOT),
+        "subjects": subjects,
+        "reruns": reruns,
+        "rerun_ms_median": round(statistics.median(times), 2),
+        "elements_per_rerun": elements,
+        "html_bytes_per_rerun": size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamlit dashboard rerun benchmark")
+    parser.add_argument("--app", default=os.path.join(ROOT, "streamlit_app.py"))
+    parser.add_argument("--subjects", type=int, nargs="+", default=[8, 20, 40])
+    parser.add_argument("--reruns", type=int, default=20)
+    args = parser.parse_args()
+
+    for subjects in args.subjects:
+        print(json.dumps(bench(os.path.abspath(args.app), subjects, args.reruns)))
+
+
+if __name__ == "__main__":
+    main()
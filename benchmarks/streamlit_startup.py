@@ -0,0 +1,102 @@
+"""Cold-start cost of the Streamlit app.
+
+    python benchmarks/streamlit_startup.py --runs 5
+
+Each measurement runs in a fresh interpreter so module caches don't hide
+import costs. Prints one JSON object per measurement with the median and
+max over the runs:
+
+- import_<module>: importing the modules the app used to load at startup
+- chromium_probe: the on-disk check that replaced `playwright install`
+- playwright_install_check: the old `python -m playwright install chromium`
+  (a no-op when already installed, but still a subprocess and a download
+  manifest check on every boot)
+- first_run: first script run of streamlit_app.py through Streamlit's
+  AppTest harness, i.e. what a visitor waits for before the login form
+
+Pass --baseline FILE to compare against an earlier run's output; medians
+that got more than --tolerance slower are reported and exit with status 1.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPETS = {
+    "import_streamlit": "import streamlit",
+    "import_engine": "import engine",
+    "import_playwright": "from playwright.sync_api import sync_playwright",
+    "chromium_probe": "from browser_pool import chromium_installed; chromium_installed()",
+    "first_run": (
+        "from streamlit.testing.v1 import AppTest; "
+        "AppTest.from_file('streamlit_app.py', default_timeout=120).run()"
+    ),
+}
+
+
+def time_snippet(code):
+    """Seconds spent running `code` in a fresh interpreter (interpreter start excluded)."""
+    wrapper = (
+        "import time, sys; sys.path.insert(0, '.'); t = time.perf_counter(); "
+        + code + "; print(time.perf_counter() - t)"
+    )
+    out = subprocess.run([sys.executable, "-c", wrapper], cwd=ROOT, capture_output=True, text=True,
+                         env=dict(os.environ, STREAMLIT_PREWARM="0"))
+    if out.returncode != 0:
+        return None
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def time_install_check():
+    import time
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-m", "playwright", "install", "chromium"],
+                         capture_output=True, text=True)
+    return time.perf_counter() - start if out.returncode == 0 else None
+
+
+def measure(name, runs):
+    samples = []
+    for _ in range(runs):
+        value = time_install_check() if name == "playwright_install_check" else time_snippet(SNIPPETS[name])
+        if value is None:
+            return {"measurement": name, "error": "failed (missing dependency?)"}
+        samples.append(value * 1000)
+    return {"measurement": name, "runs": runs, "median_ms": round(statistics.median(samples), 1),
+            "max_ms": round(max(samples), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamlit cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="measurements to run (default: all)")
+    parser.add_argument("--baseline", help="JSON lines from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    names = args.only or list(SNIPPETS) + ["playwright_install_check"]
+    results = [measure(name, args.runs) for name in names]
+    for row in results:
+        print(json.dumps(row))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {row["measurement"]: row for row in map(json.loads, f) if "median_ms" in row}
+        regressions = [
+            row for row in results
+            if row.get("median_ms") and row["measurement"] in baseline
+            and row["median_ms"] > baseline[row["measurement"]]["median_ms"] * (1 + args.tolerance)
+        ]
+        for row in regressions:
+            print(f"Regression: {row['measurement']} {baseline[row['measurement']]['median_ms']}ms "
+                  f"-> {row['median_ms']}ms", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import os
+import re
+
+# Resource types aborted during scraping; we only ever read the rendered text
+BLOCK_RESOURCE_TYPES = {t.strip() for t in os.environ.get(
+    "BLOCK_RESOURCE_TYPES", "image,font,media,stylesheet").split(",") if t.strip()}
+# URL patterns that are always aborted (analytics/trackers), whatever their type
+BLOCK_URL_PATTERNS = os.environ.get(
+    "BLOCK_URL_PATTERNS",
+    r"google-analytics\.com|googletagmanager\.com|doubleclick\.net|facebook\.net|hotjar\.com|clarity\.ms")
+# URL patterns that are never aborted (ExtJS framework files the grid needs)
+ALLOW_URL_PATTERNS = os.environ.get("ALLOW_URL_PATTERNS", r"ext-all|/ext[-/]|extjs")
+BLOCKING_ENABLED = os.environ.get("BLOCK_RESOURCES", "1") == "1"
+
+# Typical transfer size per blocked resource type, in bytes. Blocked
+# requests are never downloaded, so the savings we report are these
+# estimates times the counts rather than measured bytes.
+ESTIMATED_BYTES = {"image": 25_000, "font": 40_000, "media": 250_000, "stylesheet": 20_000}
+DEFAULT_ESTIMATED_BYTES = 15_000  # trackers and anything else on the deny list
+
+
+class BlockPolicy:
+    def __init__(self, resource_types=None, deny=None, allow=None):
+        self.resource_types = BLOCK_RESOURCE_TYPES if resource_types is None else set(resource_types)
+        deny = BLOCK_URL_PATTERNS if deny is None else deny
+        allow = ALLOW_URL_PATTERNS if allow is None else allow
+        self.deny = re.compile(deny, re.IGNORECASE) if deny else None
+        self.allow = re.compile(allow, re.IGNORECASE) if allow else None
+
+    def should_block(self, url, resource_type):
+        if self.allow and self.allow.search(url):
+            return False
+        if self.deny and self.deny.search(url):
+            return True
+        return resource_type in self.resource_types
+
+
+class BlockStats:
+    def __init__(self):
+        self.blocked = 0
+        self.allowed = 0
+        self.bytes_loaded = 0
+        self.by_type = {}
+
+    def bytes_saved_estimate(self):
+        return sum(ESTIMATED_BYTES.get(t, DEFAULT_ESTIMATED_BYTES) * n for t, n in self.by_type.items())
+
+    def to_dict(self):
+        return {
+            "requests_blocked": self.blocked,
+            "requests_allowed": self.allowed,
+            "bytes_saved_estimate": self.bytes_saved_estimate(),
+            "bytes_loaded": self.bytes_loaded,
+            "blocked_by_type": self.by_type,
+        }
+
+
+def _content_length(response):
+    # .headers works on both the sync and async API (header_value() is awaitable in async)
+    try:
+        return int(response.headers.get("content-length") or 0)
+    except Exception:
+        return 0
+
+
+class _Blocker:
+    """Route decisions and byte accounting for one BrowserContext."""
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.stats = BlockStats()
+
+    def should_abort(self, request):
+        if not self.policy.should_block(request.url, request.resource_type):
+            self.stats.allowed += 1
+            return False
+        self.stats.blocked += 1
+        self.stats.by_type[request.resource_type] = self.stats.by_type.get(request.resource_type, 0) + 1
+        return True
+
+    def on_response(self, response):
+        # Only allowed requests get a response; content-length is missing on
+        # chunked/compressed ones, so this is a lower bound
+        self.stats.bytes_loaded += _content_length(response)
+
+
+def install_blocking(context, policy=None):
+    """Abort non-essential requests on `context`; returns the BlockStats it fills."""
+    if not BLOCKING_ENABLED:
+        return BlockStats()
+    blocker = _Blocker(policy or BlockPolicy())
+
+    def handle(route):
+        if blocker.should_abort(route.request):
+            route.abort()
+        else:
+            route.continue_()
+
+    context.route("**/*", handle)
+    context.on("response", blocker.on_response)
+    return blocker.stats
+
+
+async def install_blocking_async(context, policy=None):
+    """install_blocking() for a playwright.async_api BrowserContext."""
+    if not BLOCKING_ENABLED:
+        return BlockStats()
+    blocker = _Blocker(policy or BlockPolicy())
+
+    async def handle(route):
+        if blocker.should_abort(route.request):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await context.route("**/*", handle)
+    context.on("response", blocker.on_response)
+    return blocker.stats
@@ -0,0 +1,291 @@
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import metrics
+from memory import Governor, browser_mb
+
+# Pool settings (override through the environment on Render / Streamlit Cloud)
+POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "1"))
+MAX_USES = int(os.environ.get("BROWSER_MAX_USES", "100"))
+# Low-memory Chromium profile: no GPU/extensions/background services, tiny
+# caches, one renderer process. BROWSER_SINGLE_PROCESS folds the renderer into
+# the browser process too; it saves the most but a renderer crash then takes
+# the whole browser down, so it stays opt-in.
+LOW_MEMORY = os.environ.get("BROWSER_LOW_MEMORY", "1") == "1"
+SINGLE_PROCESS = os.environ.get("BROWSER_SINGLE_PROCESS", "0") == "1"
+LAUNCH_ARGS = ['--no-sandbox', '--disable-setuid-sandbox']
+if LOW_MEMORY:
+    LAUNCH_ARGS += [
+        '--disable-gpu',
+        '--disable-extensions',
+        '--disable-dev-shm-usage',
+        '--disable-background-networking',
+        '--disable-background-timer-throttling',
+        '--disable-component-update',
+        '--disable-default-apps',
+        '--disable-sync',
+        '--disable-features=Translate,BackForwardCache,MediaRouter,OptimizationHints',
+        '--mute-audio',
+        '--no-first-run',
+        '--renderer-process-limit=1',
+        '--disk-cache-size=1048576',
+        '--media-cache-size=1048576',
+        '--js-flags=--max-old-space-size=128',
+    ]
+    if SINGLE_PROCESS:
+        LAUNCH_ARGS += ['--single-process', '--no-zygote']
+# Fixed, small viewport for every context (less raster memory than the default)
+CONTEXT_DEFAULTS = {"viewport": {"width": 1024, "height": 768}, "device_scale_factor": 1}
+
+
+# Marker Playwright writes into a browser's directory once its download is complete
+INSTALL_MARKER = "INSTALLATION_COMPLETE"
+
+
+def browsers_path():
+    """Where `playwright install` puts browsers on this machine."""
+    configured = os.environ.get("PLAYWRIGHT_BROWSERS_PATH")
+    if configured and configured != "0":
+        return configured
+    if sys.platform.startswith("win"):
+        return os.path.join(os.environ.get("LOCALAPPDATA", ""), "ms-playwright")
+    if sys.platform == "darwin":
+        return os.path.expanduser("~/Library/Caches/ms-playwright")
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "ms-playwright")
+
+
+def required_chromium():
+    """Install directories (`<name>-<revision>`) of the Chromium builds this
+    Playwright version launches, from its bundled browsers.json; one list of
+    candidates (platform revision overrides included) per build."""
+    import playwright
+    path = os.path.join(os.path.dirname(playwright.__file__), "driver", "package", "browsers.json")
+    with open(path) as f:
+        browsers = json.load(f)["browsers"]
+    return [[f"{b['name'].replace('-', '_')}-{revision}"
+             for revision in {b["revision"], *(b.get("revisionOverrides") or {}).values()}]
+            for b in browsers if b["name"].startswith("chromium")]
+
+
+def chromium_installed():
+    """True if the exact Chromium revisions this Playwright expects are fully
+    installed (a few stat calls, no subprocess). An older build left on disk
+    by a previous Playwright version doesn't count."""
+    try:
+        required = required_chromium()
+    except (ImportError, OSError, ValueError, KeyError):
+        return False
+    root = browsers_path()
+    return bool(required) and all(
+        any(os.path.exists(os.path.join(root, d, INSTALL_MARKER)) for d in candidates)
+        for candidates in required)
+
+
+class _Job:
+    def __init__(self, fn, context_options):
+        self.fn = fn
+        self.context_options = context_options
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Slot(threading.Thread):
+    """One Playwright driver + Chromium, living on its own thread.
+
+    The sync Playwright API is bound to the thread that started it, so each
+    browser gets a dedicated thread and callers hand work over through the
+    pool's job queue.
+    """
+
+    def __init__(self, pool, index):
+        super().__init__(name=f"browser-pool-{index}", daemon=True)
+        self.pool = pool
+        self.playwright = None
+        self.browser = None
+        self.uses = 0
+        self.launches = 0
+
+    def run(self):
+        try:
+            # Imported here so importing the pool (and engine) stays cheap
+            from playwright.sync_api import sync_playwright
+            self.playwright = sync_playwright().start()
+        except Exception as e:
+            # Driver could not start: fail jobs instead of leaving callers hanging
+            self._drain(e)
+            return
+
+        while True:
+            job = self.pool._jobs.get()
+            if job is None:
+                break
+            self._execute(job)
+
+        self._close_browser()
+        try:
+            self.playwright.stop()
+        except:
+            pass
+
+    def _drain(self, error):
+        while True:
+            job = self.pool._jobs.get()
+            if job is None:
+                return
+            job.error = error
+            job.done.set()
+
+    def healthy(self):
+        try:
+            return self.browser is not None and self.browser.is_connected()
+        except Exception:
+            return False
+
+    def _ensure_browser(self):
+        # Recycle after N uses or when Chromium has crashed / disconnected
+        if self.browser is not None and (not self.healthy() or self.uses >= self.pool.max_uses):
+            self._close_browser()
+        if self.browser is None:
+            started = time.perf_counter()
+            self.browser = self.playwright.chromium.launch(headless=True, args=self.pool.launch_args)
+            metrics.observe_phase("browser_launch", time.perf_counter() - started)
+            self.launches += 1
+            self.uses = 0
+
+    def _close_browser(self):
+        if self.browser:
+            try:
+                self.browser.close()
+            except:
+                pass
+        self.browser = None
+
+    def _execute(self, job):
+        context = None
+        # Over the memory budget: let the other slots finish first, then
+        # start on a fresh browser if that wasn't enough
+        self.pool.governor.admit(lambda: self.pool._busy)
+        if self.browser is not None and self.pool.governor.recycle_before():
+            self._close_browser()
+        with self.pool._lock:
+            self.pool._busy += 1
+        try:
+            self._ensure_browser()
+            context = self.browser.new_context(**dict(CONTEXT_DEFAULTS, **job.context_options))
+            job.result = job.fn(context)
+        except Exception as e:
+            job.error = e
+        finally:
+            if context:
+                try:
+                    context.close()
+                except:
+                    pass
+            self.uses += 1
+            with self.pool._lock:
+                self.pool._busy -= 1
+            if not self.healthy() or self.pool.governor.should_recycle(self.pool.browser_mb()):
+                # Crashed, or Chromium has grown past the recycle limit
+                self._close_browser()
+            job.done.set()
+
+
+class BrowserPool:
+    """Warm Chromium instances handing out a fresh BrowserContext per job."""
+
+    def __init__(self, size=POOL_SIZE, max_uses=MAX_USES, launch_args=None):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.launch_args = launch_args or LAUNCH_ARGS
+        self._jobs = queue.Queue()
+        self._slots = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._busy = 0
+        self.governor = Governor()
+
+    def browser_mb(self):
+        """Chromium memory per slot (the slots' browsers can't be told apart in /proc)."""
+        mb = browser_mb()
+        return None if mb is None else mb / self.size
+
+    def _start(self):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Browser pool has been shut down")
+            if not self._slots:
+                for i in range(self.size):
+                    slot = _Slot(self, i)
+                    slot.start()
+                    self._slots.append(slot)
+
+    def run(self, fn, **context_options):
+        """Run `fn(context)` on a pooled browser and return its result.
+
+        The context is created just for this call (with `context_options`,
+        e.g. a stored `storage_state`) and closed afterwards, so cookies and
+        storage never leak between logins.
+        """
+        self._start()
+        job = _Job(fn, context_options)
+        self._jobs.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def warm(self):
+        """Start the slots and launch a browser ahead of the first real job."""
+        self.run(lambda context: None)
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "queued": self._jobs.qsize(),
+            "memory": self.governor.stats(),
+            "browsers": [
+                {"healthy": s.healthy(), "uses": s.uses, "launches": s.launches}
+                for s in self._slots
+            ],
+        }
+
+    def shutdown(self, timeout=10):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            slots = list(self._slots)
+        for _ in slots:
+            self._jobs.put(None)
+        for slot in slots:
+            slot.join(timeout)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide pool, created lazily so each gunicorn worker gets its own."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = BrowserPool()
+            _pool_pid = os.getpid()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None and _pool_pid == os.getpid():
+        pool.shutdown()
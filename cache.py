@@ -0,0 +1,137 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Fresh for CACHE_TTL seconds, then served stale (while refreshing in the
+# background) for another CACHE_STALE_TTL seconds before it's a plain miss.
+CACHE_TTL = int(os.environ.get("CACHE_TTL", "600"))
+CACHE_STALE_TTL = int(os.environ.get("CACHE_STALE_TTL", "3600"))
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "500"))
+
+# Keys are HMACs so credentials never sit in memory in a reversible form
+_KEY_SECRET = os.environ.get("CACHE_KEY_SECRET", "").encode() or os.urandom(32)
+
+
+def cache_key(username, password):
+    msg = f"{username.strip().upper()}\0{password}".encode()
+    return hmac.new(_KEY_SECRET, msg, hashlib.sha256).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("payload", "stored")
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.stored = time.time()
+
+
+class _Flight:
+    """One in-flight scrape that identical requests wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class ResultCache:
+    """TTL + LRU cache of successful attendance payloads with request coalescing."""
+
+    def __init__(self, ttl=CACHE_TTL, stale_ttl=CACHE_STALE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def get_or_fetch(self, key, fetch, force=False):
+        """Return `(payload, status_code, info)`.
+
+        `fetch()` must return `(payload, status_code)`; only 200 responses are
+        stored. `info` has `status` (hit / stale / miss / coalesced) and
+        `age_s` of the data served.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.time() - entry.stored
+                if age > self.ttl + self.stale_ttl:
+                    del self._entries[key]
+                    entry = None
+                elif not force:
+                    self._entries.move_to_end(key)
+                    if age <= self.ttl:
+                        return entry.payload, 200, {"status": "hit", "age_s": round(age, 1)}
+                    # Stale: answer now, refresh behind the caller's back
+                    if key not in self._flights:
+                        self._flights[key] = _Flight()
+                        threading.Thread(target=self._refresh, args=(key, fetch), daemon=True).start()
+                    return entry.payload, 200, {"status": "stale", "age_s": round(age, 1)}
+
+            flight = self._flights.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._flights[key] = _Flight()
+
+        if not owner:
+            flight.done.wait()
+            payload, status = flight.result
+            return payload, status, {"status": "coalesced", "age_s": 0}
+
+        self._run(key, fetch, flight)
+        payload, status = flight.result
+        return payload, status, {"status": "miss", "age_s": 0}
+
+    def _refresh(self, key, fetch):
+        with self._lock:
+            flight = self._flights.get(key)
+        if flight is not None:
+            self._run(key, fetch, flight)
+
+    def _run(self, key, fetch, flight):
+        try:
+            flight.result = fetch()
+        except Exception as e:
+            print(f"Cached fetch failed: {e}")
+            flight.result = ({"error": "Something went wrong. Please try after some time."}, 500)
+        finally:
+            with self._lock:
+                payload, status = flight.result
+                # Degraded answers (last known data while the portal is down) aren't stored
+                if status == 200 and not payload.get("degraded"):
+                    self._entries[key] = _Entry(payload)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def fresh(self, key):
+        """`(payload, info)` if `key` holds an answer still within its TTL, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            age = time.time() - entry.stored
+            if age > self.ttl:
+                return None
+            self._entries.move_to_end(key)
+            return entry.payload, {"status": "hit", "age_s": round(age, 1)}
+
+    def peek(self, key):
+        """Last stored payload for `key` regardless of age, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.payload if entry is not None else None
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "in_flight": len(self._flights),
+                    "max_entries": self.max_entries, "ttl": self.ttl, "stale_ttl": self.stale_ttl}
@@ -0,0 +1,64 @@
+import gzip
+import os
+
+try:  # optional: `pip install brotli` adds br next to gzip
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this aren't worth the CPU (and may grow when compressed)
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "512"))
+COMPRESSIBLE = ("application/json", "text/html", "text/plain", "text/css", "application/javascript")
+
+
+def _accepted(accept_encoding):
+    """{coding: q} from an Accept-Encoding header."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(accept_encoding):
+    """Pick "br", "gzip" or None for a request's Accept-Encoding."""
+    accepted = _accepted(accept_encoding)
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", accepted.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=5)
+
+
+def should_compress(mimetype, size):
+    return size >= COMPRESS_MIN_BYTES and (mimetype or "").split(";")[0].strip() in COMPRESSIBLE
+
+
+def compress_response(response, accept_encoding):
+    """Compress a buffered Flask response in place (streams and files are left alone)."""
+    if (response.direct_passthrough or response.is_streamed or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(accept_encoding)
+    body = response.get_data()
+    if encoding is None or not should_compress(response.mimetype, len(body)):
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
@@ -0,0 +1,341 @@
+"""One scrape per student across workers and instances.
+
+Before scraping, a worker takes a lease on the student (keyed by an HMAC
+of the credentials) in a shared backend. Other workers asking for the same
+student meanwhile wait for the result the lease holder publishes instead
+of starting their own Chromium login. The holder renews its lease while
+it scrapes; if it dies the lease expires after COORD_LEASE_TTL seconds and
+the next waiter takes over.
+
+Published results are Fernet-encrypted with a key derived from the
+student's credentials, so the shared store never holds a readable name or
+attendance: only a worker asked for the same login can open its slot.
+
+Backends: "sqlite" (a file shared by the workers of one host, the
+default), "redis" (any Redis-protocol server at REDIS_URL, for several
+instances; needs `pip install redis`) or "off".
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from cryptography.fernet import Fernet, InvalidToken
+
+COORD_BACKEND = os.environ.get("COORD_BACKEND", "sqlite")
+COORD_DB = os.environ.get("COORD_DB", "coordination.db")
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+COORD_PREFIX = os.environ.get("COORD_PREFIX", "mits-ims:")
+# A crashed holder blocks its student for at most this long
+COORD_LEASE_TTL = float(os.environ.get("COORD_LEASE_TTL", "30"))
+# Published results stay readable this long for waiters polling for them
+COORD_RESULT_TTL = float(os.environ.get("COORD_RESULT_TTL", "30"))
+# A result published this recently also answers a request that arrives just after it
+COORD_REUSE_S = float(os.environ.get("COORD_REUSE_S", "3"))
+# Give up waiting on another worker and scrape anyway after this long
+COORD_WAIT_S = float(os.environ.get("COORD_WAIT_S", "90"))
+COORD_POLL_MS = int(os.environ.get("COORD_POLL_MS", "250"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    slot TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SqliteBackend:
+    """Leases and result slots in a SQLite (WAL) file; one connection per thread."""
+
+    def __init__(self, path=COORD_DB):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def shared_secret(self):
+        conn = self._conn()
+        conn.execute("INSERT OR IGNORE INTO settings (name, value) VALUES ('secret', ?)", (os.urandom(32).hex(),))
+        return conn.execute("SELECT value FROM settings WHERE name = 'secret'").fetchone()[0]
+
+    def acquire(self, key, owner, ttl):
+        now = time.time()
+        conn = self._conn()
+        # Expired result slots go now rather than at the next publish
+        conn.execute("DELETE FROM results WHERE expires < ?", (now,))
+        # Insert, or take over a lease whose holder stopped renewing it
+        cur = conn.execute(
+            "INSERT INTO leases (key, owner, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+            "WHERE leases.expires < ?", (key, owner, now + ttl, now))
+        return cur.rowcount == 1
+
+    def renew(self, key, owner, ttl):
+        cur = self._conn().execute("UPDATE leases SET expires = ? WHERE key = ? AND owner = ?",
+                                   (time.time() + ttl, key, owner))
+        return cur.rowcount == 1
+
+    def release(self, key, owner):
+        self._conn().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def publish(self, key, owner, slot, ttl):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR REPLACE INTO results (key, slot, expires) VALUES (?, ?, ?)",
+                         (key, slot, now + ttl))
+            conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+            conn.execute("DELETE FROM results WHERE expires < ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def result(self, key):
+        row = self._conn().execute("SELECT slot FROM results WHERE key = ? AND expires > ?",
+                                   (key, time.time())).fetchone()
+        return row[0] if row else None
+
+
+# Only the holder may extend or drop its lease
+_RENEW_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('del', KEYS[1])
+end
+return 1
+"""
+_PUBLISH_LUA = """
+redis.call('set', KEYS[2], ARGV[2], 'PX', ARGV[3])
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('del', KEYS[1])
+end
+return 1
+"""
+
+
+class RedisBackend:
+    """Leases (SET NX PX) and result slots in a Redis-protocol server."""
+
+    def __init__(self, url=REDIS_URL, prefix=COORD_PREFIX, client=None):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url, socket_timeout=5, socket_connect_timeout=5)
+        self.client = client
+        self.prefix = prefix
+        self._renew = self.client.register_script(_RENEW_LUA)
+        self._release = self.client.register_script(_RELEASE_LUA)
+        self._publish = self.client.register_script(_PUBLISH_LUA)
+
+    def _lease(self, key):
+        return f"{self.prefix}lease:{key}"
+
+    def _result(self, key):
+        return f"{self.prefix}result:{key}"
+
+    def shared_secret(self):
+        name = f"{self.prefix}secret"
+        self.client.set(name, os.urandom(32).hex(), nx=True)
+        return self.client.get(name).decode()
+
+    def acquire(self, key, owner, ttl):
+        return bool(self.client.set(self._lease(key), owner, nx=True, px=int(ttl * 1000)))
+
+    def renew(self, key, owner, ttl):
+        return bool(self._renew(keys=[self._lease(key)], args=[owner, int(ttl * 1000)]))
+
+    def release(self, key, owner):
+        self._release(keys=[self._lease(key)], args=[owner])
+
+    def publish(self, key, owner, slot, ttl):
+        self._publish(keys=[self._lease(key), self._result(key)], args=[owner, slot, int(ttl * 1000)])
+
+    def result(self, key):
+        slot = self.client.get(self._result(key))
+        return slot.decode() if slot is not None else None
+
+
+class Coordinator:
+    """Runs `fetch()` for a student in at most one worker at a time."""
+
+    def __init__(self, backend, lease_ttl=COORD_LEASE_TTL, result_ttl=COORD_RESULT_TTL,
+                 reuse_s=COORD_REUSE_S, wait_s=COORD_WAIT_S, poll_ms=COORD_POLL_MS):
+        self.backend = backend
+        self.lease_ttl = lease_ttl
+        self.result_ttl = result_ttl
+        self.reuse_s = reuse_s
+        self.wait_s = wait_s
+        self.poll_s = poll_ms / 1000
+        self._secret = None
+        self._lock = threading.Lock()
+        self.counts = {"led": 0, "shared": 0, "took_over": 0, "timed_out": 0, "backend_errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _derive(self, label, username, password):
+        if self._secret is None:
+            self._secret = self.backend.shared_secret().encode()
+        msg = f"{label}{username.strip().upper()}\0{password}".encode()
+        return hmac.new(self._secret, msg, hashlib.sha256).digest()
+
+    def key(self, username, password):
+        """Same for every worker sharing the backend, not reversible to the credentials."""
+        return self._derive("", username, password).hex()
+
+    def _fernet(self, username, password):
+        """Encrypts this student's result slot; needs the credentials, not just the store."""
+        return Fernet(base64.urlsafe_b64encode(self._derive("result\0", username, password)))
+
+    def run(self, username, password, fetch, fresh=False):
+        """Return `fetch()`'s `(payload, status)`, or the one another worker
+        got for the same credentials while this call waited.
+
+        With `fresh` only results published after the call started count.
+        """
+        try:
+            key = self._call(self.key, username, password)
+            return self._run(key, self._fernet(username, password), fetch, fresh)
+        except _BackendDown:
+            return fetch()
+
+    def _run(self, key, fernet, fetch, fresh):
+        started = time.time()
+        oldest = started if fresh else started - self.reuse_s
+        deadline = time.monotonic() + self.wait_s
+        waited = False
+        while True:
+            slot = self._open(fernet, self._call(self.backend.result, key))
+            if slot:
+                if slot["published"] >= oldest:
+                    self._count("shared")
+                    return slot["payload"], slot["status"]
+
+            owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+            if self._call(self.backend.acquire, key, owner, self.lease_ttl):
+                # Waited and got the lease without a result: the holder died or failed
+                self._count("took_over" if waited else "led")
+                return self._lead(key, owner, fernet, fetch)
+
+            if time.monotonic() >= deadline:
+                self._count("timed_out")
+                return fetch()
+            waited = True
+            time.sleep(self.poll_s)
+
+    @staticmethod
+    def _open(fernet, token):
+        if not token:
+            return None
+        try:
+            return json.loads(fernet.decrypt(token.encode()))
+        except InvalidToken:
+            # Written under another shared secret
+            return None
+
+    def _lead(self, key, owner, fernet, fetch):
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(self.lease_ttl / 3):
+                try:
+                    if not self.backend.renew(key, owner, self.lease_ttl):
+                        return
+                except Exception as e:
+                    print(f"Lease renewal failed: {e}")
+
+        threading.Thread(target=renew, name="lease-renew", daemon=True).start()
+        try:
+            payload, status = fetch()
+        except BaseException:
+            stop.set()
+            self._quiet(self.backend.release, key, owner)
+            raise
+        stop.set()
+        slot = fernet.encrypt(json.dumps({"payload": payload, "status": status,
+                                          "published": time.time()}).encode()).decode()
+        self._quiet(self.backend.publish, key, owner, slot, self.result_ttl)
+        return payload, status
+
+    def _call(self, fn, *args):
+        try:
+            return fn(*args)
+        except Exception as e:
+            self._count("backend_errors")
+            print(f"Coordination backend unavailable, scraping without it: {e}")
+            raise _BackendDown() from e
+
+    def _quiet(self, fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:
+            self._count("backend_errors")
+            print(f"Coordination backend unavailable: {e}")
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+class _BackendDown(Exception):
+    pass
+
+
+class _Uncoordinated:
+    """COORD_BACKEND=off: every worker scrapes for itself."""
+
+    def run(self, username, password, fetch, fresh=False):
+        return fetch()
+
+    def stats(self):
+        return {}
+
+
+_coordinator = None
+_coordinator_lock = threading.Lock()
+
+
+def get_coordinator():
+    global _coordinator
+    with _coordinator_lock:
+        if _coordinator is None:
+            if COORD_BACKEND == "redis":
+                _coordinator = Coordinator(RedisBackend())
+            elif COORD_BACKEND == "sqlite":
+                _coordinator = Coordinator(SqliteBackend())
+            else:
+                _coordinator = _Uncoordinated()
+        return _coordinator
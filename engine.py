@@ -0,0 +1,166 @@
+import os
+import time
+
+import metrics
+
+from browser_pool import get_pool
+from cache import cache_key
+from health import upstream
+from portal import classify_error, read_dashboard, no_progress
+from history import record_fetch
+from sessions import SessionStore
+
+# Engines the web API lets a request pick; the others start a browser per
+# fetch outside the pool and are meant for the CLI
+API_ENGINES = ("playwright", "http")
+# Global default; a request can still ask for a specific engine
+DEFAULT_ENGINE = os.environ.get("SCRAPE_ENGINE", "playwright")
+# Reuse logged-in portal sessions between fetches of the same student
+SESSION_REUSE = os.environ.get("SESSION_REUSE", "1") == "1"
+
+sessions = SessionStore()
+
+
+def fetch_playwright(username, password, progress=no_progress):
+    """Run the browser flow on the pool, resuming a stored session if we have one."""
+    key = cache_key(username, password)
+    state = sessions.get(key) if SESSION_REUSE else None
+    captured = {}
+
+    def job(context):
+        report, meta = read_dashboard(context, username, password, progress, resume=state is not None)
+        # Worker + browsers while this page is still open, i.e. near the fetch's peak
+        meta["memory_mb"] = get_pool().governor.measure()
+        if SESSION_REUSE and meta["session"] != "reused":
+            captured["state"] = context.storage_state()
+        return report, meta
+
+    started = time.perf_counter()
+    try:
+        if state is not None:
+            report, meta = get_pool().run(job, storage_state=state)
+        else:
+            report, meta = get_pool().run(job)
+    except Exception:
+        if state is not None:
+            sessions.invalidate(key)
+        raise
+
+    # Pool queue wait, browser (re)launch and context setup/teardown
+    overhead = round((time.perf_counter() - started) * 1000 - meta["total_ms"], 1)
+    meta["timings_ms"] = {"browser": max(0, overhead), **meta["timings_ms"]}
+    meta["total_ms"] = round(meta["total_ms"] + max(0, overhead), 1)
+
+    if meta["session"] == "expired":
+        sessions.invalidate(key, expired=True)
+    if "state" in captured:
+        sessions.save(key, captured["state"])
+    return report, meta
+
+
+def _result(report, meta):
+    return {"student_name": report.student_name, "records": report.records, "meta": meta}
+
+
+def _fetch_pooled(username, password, progress, **options):
+    report, meta = fetch_playwright(username, password, progress)
+    meta["engine"] = "playwright"
+    return _result(report, meta)
+
+
+def _fetch_http(username, password, progress, **options):
+    import http_engine
+    return http_engine.fetch(username, password, progress=progress)
+
+
+def _fetch_selenium(username, password, progress, headless=True, **options):
+    import selenium_engine
+    return selenium_engine.fetch(username, password, progress, headless=headless)
+
+
+def _fetch_async(username, password, progress, **options):
+    # One-shot event loop for callers outside asgi.py (e.g. the CLI)
+    import asyncio
+    import async_engine
+
+    async def run():
+        scraper = async_engine.AsyncEngine(concurrency=1)
+        try:
+            return await scraper.fetch(username, password, progress)
+        finally:
+            await scraper.close()
+
+    report, meta, _ = asyncio.run(run())
+    meta["engine"] = "playwright-async"
+    return _result(report, meta)
+
+
+# Every engine runs the same stages (navigate, login, readiness, extraction,
+# parsing) and returns the same result shape; see fetch().
+ENGINES = {
+    "playwright": _fetch_pooled,
+    "playwright-async": _fetch_async,
+    "http": _fetch_http,
+    "selenium": _fetch_selenium,
+}
+if DEFAULT_ENGINE not in ENGINES:
+    raise ValueError(f"SCRAPE_ENGINE={DEFAULT_ENGINE!r} is not one of: {', '.join(ENGINES)}")
+
+
+def fetch(username, password, engine=None, progress=no_progress, record=False, **options):
+    """Fetch attendance with the chosen engine.
+
+    Returns `{"student_name", "records", "meta"}` with `records` a list of
+    attendance_parser.Record, whichever engine produced them. The HTTP
+    engine falls back to Playwright when the portal's responses no longer
+    look the way it expects. `progress` receives phase names; `options` go
+    to the engine (e.g. `headless` for Selenium). With `record` the result
+    is also written to the history store (the web app does; the CLI only
+    with --history).
+    """
+    engine = engine if engine in ENGINES else DEFAULT_ENGINE
+
+    if engine == "http":
+        import http_engine
+        try:
+            result = _fetch_http(username, password, progress)
+        except http_engine.ShapeChanged as e:
+            print(f"HTTP engine fell back to Playwright: {e}")
+            result = _fetch_pooled(username, password, progress)
+            result["meta"]["fallback"] = str(e)
+    else:
+        result = ENGINES[engine](username, password, progress, **options)
+
+    if record:
+        record_fetch(username, password, result["student_name"], result["records"])
+    return result
+
+
+def fetch_payload(username, password, engine=None, progress=no_progress, record=False, **options):
+    """Run one fetch and return `(payload, status_code)` in the API's JSON shape."""
+    print(f"Starting attendance fetch for: {username}")
+    # Portal known to be down: fail fast instead of waiting out the timeouts
+    if not upstream.allow():
+        return upstream.unavailable()
+    started = time.perf_counter()
+
+    try:
+        result = fetch(username, password, engine, progress, record, **options)
+    except Exception as e:
+        err = classify_error(e)
+        metrics.record_fetch(engine if engine in ENGINES else DEFAULT_ENGINE, err.status,
+                             time.perf_counter() - started)
+        upstream.record(err.status)
+        return {"error": err.message}, err.status
+
+    meta = result["meta"]
+    metrics.record_fetch(meta.get("engine", "playwright"), 200, time.perf_counter() - started,
+                         meta.get("timings_ms"), meta.get("memory_mb"))
+    upstream.record(200, meta.get("timings_ms"), meta.get("engine", "playwright"))
+
+    return {
+        "message": "Success",
+        "student_name": result["student_name"],
+        "data": [r.to_dict() for r in result["records"]],
+        "meta": meta
+    }, 200
@@ -0,0 +1,53 @@
+from attendance_parser import Report, parse_objects, parse_rows
+
+# Runs inside the page in a single evaluate() call and returns compact JSON:
+# the ExtJS store records behind any grid if the framework exposes them,
+# otherwise the rendered grid/table rows as arrays of cell text.
+GRID_JS = """() => {
+    const out = {name: null, objects: [], rows: []};
+    const nameEl = document.querySelector('#studentName');
+    if (nameEl) out.name = nameEl.innerText;
+
+    const grids = [];
+    if (window.Ext && Ext.ComponentQuery) {
+        grids.push(...Ext.ComponentQuery.query('grid, gridpanel'));
+    } else if (window.Ext && Ext.ComponentMgr && Ext.ComponentMgr.all) {
+        Ext.ComponentMgr.all.each(c => { if (c.getStore) grids.push(c); });
+    }
+    for (const grid of grids) {
+        const store = grid.getStore && grid.getStore();
+        if (!store || !store.getCount || !store.getCount()) continue;
+        store.each(r => { out.objects.push(Object.assign({}, r.data)); });
+    }
+    if (out.objects.length) return out;
+
+    for (const row of document.querySelectorAll('.x-grid-row, .x-grid3-row, table tr')) {
+        const cells = row.querySelectorAll('.x-grid-cell, .x-grid3-cell, td');
+        if (cells.length < 4) continue;
+        out.rows.push(Array.from(cells, c => c.innerText.trim()));
+    }
+    return out;
+}"""
+
+
+def clean_name(text):
+    # "#studentName" may carry the "| Change Password" link text
+    name = (text or "").split("|")[0].strip()
+    return name or "Student"
+
+
+def extract_grid(page):
+    """Read the attendance grid with one page.evaluate; None if nothing usable."""
+    try:
+        data = page.evaluate(GRID_JS)
+    except Exception:
+        return None
+    return report_from_grid(data)
+
+
+def report_from_grid(data):
+    """Turn GRID_JS output into a Report; None if it holds no records."""
+    records = parse_objects(data.get("objects") or []) or parse_rows(data.get("rows") or [])
+    if not records:
+        return None
+    return Report(clean_name(data.get("name")), records)
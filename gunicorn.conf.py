@@ -0,0 +1,15 @@
+# Picked up automatically by `gunicorn app:app` (see render.yaml)
+import os
+
+# Job state and the browser pool live in-process, so scale with threads:
+# polling/SSE requests need to reach the worker that owns the job.
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+timeout = 120
+
+
+def worker_exit(server, worker):
+    # Close the worker's warm Chromium pool so no browser processes are orphaned
+    from browser_pool import shutdown_pool
+    shutdown_pool()
@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+from collections import deque
+
+# Timeouts follow the portal's recent latency: p95 * ADAPTIVE_TIMEOUT_FACTOR,
+# kept between ADAPTIVE_TIMEOUT_MIN_MS and the static default for each wait.
+# Latencies are kept per engine: the HTTP engine's "navigate" is one GET,
+# a browser's is a full ExtJS page load.
+ADAPTIVE_TIMEOUTS = os.environ.get("ADAPTIVE_TIMEOUTS", "1") == "1"
+ADAPTIVE_TIMEOUT_FACTOR = float(os.environ.get("ADAPTIVE_TIMEOUT_FACTOR", "3"))
+ADAPTIVE_TIMEOUT_MIN_MS = int(os.environ.get("ADAPTIVE_TIMEOUT_MIN_MS", "5000"))
+LATENCY_WINDOW = 50
+MIN_SAMPLES = 10
+
+# Consecutive upstream failures that open the breaker, and how long it stays
+# open before a single half-open probe is let through
+BREAKER_FAILURES = int(os.environ.get("BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = int(os.environ.get("BREAKER_COOLDOWN", "30"))
+
+PORTAL_DOWN_MSG = "The MITS server is not responding right now. Please try after some time."
+
+# Statuses that say the portal itself is unhealthy (timeouts, unreachable);
+# a 401 means it answered fine.
+UPSTREAM_FAILURES = (504,)
+
+
+class UpstreamHealth:
+    """Shared view of mitsims.in: recent latencies and a circuit breaker.
+
+    closed -> open after BREAKER_FAILURES consecutive failures; open ->
+    half_open after BREAKER_COOLDOWN, when exactly one request probes the
+    portal. A good probe closes the breaker, a bad one reopens it.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failure_threshold = max(1, failures)
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0
+        self.probe_started = None
+        self.rejected = 0
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    # --- latency ---
+
+    def observe(self, kind, ms, engine="playwright"):
+        with self._lock:
+            self._samples.setdefault((engine, kind), deque(maxlen=LATENCY_WINDOW)).append(ms)
+
+    def percentile(self, kind, q, engine="playwright"):
+        with self._lock:
+            samples = sorted(self._samples.get((engine, kind)) or ())
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+    def timeout_ms(self, kind, default, engine="playwright"):
+        """Timeout for `engine`'s wait of `kind`; `default` until enough samples exist."""
+        if not ADAPTIVE_TIMEOUTS:
+            return default
+        with self._lock:
+            enough = len(self._samples.get((engine, kind)) or ()) >= MIN_SAMPLES
+        if not enough:
+            return default
+        learned = self.percentile(kind, 0.95, engine) * ADAPTIVE_TIMEOUT_FACTOR
+        return int(min(default, max(ADAPTIVE_TIMEOUT_MIN_MS, learned)))
+
+    # --- breaker ---
+
+    def allow(self):
+        """True if a scrape may hit the portal now."""
+        with self._lock:
+            now = time.time()
+            if self.state == "open" and now - self.opened_at >= self.cooldown:
+                self.state = "half_open"
+                self.probe_started = None
+            if self.state == "half_open":
+                # One probe at a time; a probe that never reported back is replaced
+                if self.probe_started is None or now - self.probe_started >= self.cooldown:
+                    self.probe_started = now
+                    return True
+            if self.state == "closed":
+                return True
+            self.rejected += 1
+            return False
+
+    def rejecting(self):
+        """True while allow() would turn a scrape away; unlike allow() it never takes the probe."""
+        with self._lock:
+            now = time.time()
+            if self.state == "open":
+                return now - self.opened_at < self.cooldown
+            if self.state == "half_open":
+                return self.probe_started is not None and now - self.probe_started < self.cooldown
+            return False
+
+    def unavailable(self):
+        """The API's `(payload, status)` for a scrape the breaker turned away."""
+        return {"error": PORTAL_DOWN_MSG, "retry_after": self.retry_after()}, 503
+
+    def record(self, status, timings_ms=None, engine="playwright"):
+        """Feed back the outcome of a scrape that allow() let through, and `engine`'s timings."""
+        with self._lock:
+            if status in UPSTREAM_FAILURES:
+                self.failures += 1
+                if self.state == "half_open" or self.failures >= self.failure_threshold:
+                    if self.state != "open":
+                        print(f"Circuit breaker opened after {self.failures} upstream failures")
+                    self.state = "open"
+                    self.opened_at = time.time()
+            else:
+                if self.state != "closed":
+                    print("Circuit breaker closed: portal is responding again")
+                self.state = "closed"
+                self.failures = 0
+            self.probe_started = None
+        if timings_ms:
+            if "navigate" in timings_ms:
+                self.observe("navigate", timings_ms["navigate"], engine)
+            if "open_login" in timings_ms:
+                self.observe("selector", timings_ms["open_login"], engine)
+
+    def retry_after(self):
+        """Seconds until the next probe may run (0 when closed)."""
+        with self._lock:
+            if self.state == "closed":
+                return 0
+            return max(1, int(self.cooldown - (time.time() - self.opened_at)))
+
+    def stats(self):
+        with self._lock:
+            state, failures, rejected = self.state, self.failures, self.rejected
+            engines = {engine for engine, _ in self._samples} - {"playwright"}
+        stats = {
+            "state": state,
+            "consecutive_failures": failures,
+            "rejected": rejected,
+            "navigate_p95_ms": self.percentile("navigate", 0.95),
+            "navigate_timeout_ms": self.timeout_ms("navigate", 45000),
+            "selector_timeout_ms": self.timeout_ms("selector", 15000),
+        }
+        # Other engines' windows, e.g. http_navigate_p95_ms
+        for engine in sorted(engines):
+            prefix = engine.replace("-", "_")
+            stats[f"{prefix}_navigate_p95_ms"] = self.percentile("navigate", 0.95, engine)
+            stats[f"{prefix}_navigate_timeout_ms"] = self.timeout_ms("navigate", 45000, engine)
+        return stats
+
+
+upstream = UpstreamHealth()
@@ -0,0 +1,249 @@
+import hashlib
+import hmac
+import os
+import sqlite3
+import threading
+import time
+
+# Embedded attendance history: one snapshot row per successful fetch, and a
+# delta row per subject only when its attended/total actually changed.
+HISTORY_DB = os.environ.get("HISTORY_DB", "attendance_history.db")
+HISTORY_ENABLED = os.environ.get("HISTORY_ENABLED", "1") == "1"
+PW_ITERATIONS = 20000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    student TEXT PRIMARY KEY,
+    name TEXT,
+    pw_salt BLOB,
+    pw_hash BLOB,
+    last_fetch REAL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    student TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    subjects INTEGER NOT NULL,
+    changed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_student_time ON snapshots (student, fetched_at);
+CREATE TABLE IF NOT EXISTS subject_deltas (
+    student TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    attended INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    percentage REAL NOT NULL,
+    snapshot_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS subject_deltas_student_subject_time ON subject_deltas (student, subject, fetched_at);
+CREATE TABLE IF NOT EXISTS subject_latest (
+    student TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    attended INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    percentage REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    position INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (student, subject)
+);
+"""
+
+
+def student_id(username):
+    return username.strip().upper()
+
+
+def _hash_password(password, salt):
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PW_ITERATIONS)
+
+
+class HistoryStore:
+    """SQLite (WAL) store of attendance snapshots; one connection per thread."""
+
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+            columns = {r["name"] for r in conn.execute("PRAGMA table_info(subject_latest)")}
+            if "position" not in columns:
+                # Stores created before subjects kept the portal's order
+                conn.execute("ALTER TABLE subject_latest ADD COLUMN position INTEGER NOT NULL DEFAULT 0")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, username, password, student_name, records, fetched_at=None):
+        """Store one fetch; returns the number of subjects that changed.
+
+        `subject_latest` ends up holding exactly this fetch's subjects, in
+        the portal's order: subjects it no longer lists (e.g. after a
+        semester change) are dropped.
+        """
+        student = student_id(username)
+        fetched_at = fetched_at or time.time()
+        conn = self._conn()
+        with conn:
+            row = conn.execute("SELECT pw_salt, pw_hash FROM students WHERE student = ?", (student,)).fetchone()
+            if row and row["pw_salt"] and hmac.compare_digest(_hash_password(password, row["pw_salt"]), row["pw_hash"]):
+                conn.execute("UPDATE students SET name = ?, last_fetch = ? WHERE student = ?",
+                             (student_name, fetched_at, student))
+            else:
+                salt = os.urandom(16)
+                conn.execute(
+                    "INSERT INTO students (student, name, pw_salt, pw_hash, last_fetch) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (student) DO UPDATE SET name = excluded.name, pw_salt = excluded.pw_salt, "
+                    "pw_hash = excluded.pw_hash, last_fetch = excluded.last_fetch",
+                    (student, student_name, salt, _hash_password(password, salt), fetched_at))
+
+            latest = {r["subject"]: (r["attended"], r["total"])
+                      for r in conn.execute("SELECT subject, attended, total FROM subject_latest WHERE student = ?",
+                                            (student,))}
+            changed = [r for r in records if latest.get(r.code) != (r.attended, r.total)]
+
+            cur = conn.execute("INSERT INTO snapshots (student, fetched_at, subjects, changed) VALUES (?, ?, ?, ?)",
+                               (student, fetched_at, len(records), len(changed)))
+            snapshot_id = cur.lastrowid
+            conn.executemany(
+                "INSERT INTO subject_deltas (student, subject, fetched_at, attended, total, percentage, snapshot_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(student, r.code, fetched_at, r.attended, r.total, r.percentage, snapshot_id) for r in changed])
+            # Every subject for its position; updated_at only moves when it changed
+            conn.executemany(
+                "INSERT INTO subject_latest (student, subject, attended, total, percentage, updated_at, position) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (student, subject) DO UPDATE SET "
+                "updated_at = CASE WHEN attended = excluded.attended AND total = excluded.total "
+                "THEN updated_at ELSE excluded.updated_at END, "
+                "attended = excluded.attended, total = excluded.total, percentage = excluded.percentage, "
+                "position = excluded.position",
+                [(student, r.code, r.attended, r.total, r.percentage, fetched_at, i) for i, r in enumerate(records)])
+            codes = [r.code for r in records]
+            conn.execute(
+                f"DELETE FROM subject_latest WHERE student = ? AND subject NOT IN ({','.join('?' * len(codes))})",
+                [student] + codes)
+        return len(changed)
+
+    def verify(self, username, password):
+        """True if `password` matches the one last used for a successful fetch."""
+        row = self._conn().execute("SELECT pw_salt, pw_hash FROM students WHERE student = ?",
+                                   (student_id(username),)).fetchone()
+        return bool(row and row["pw_salt"]) and hmac.compare_digest(
+            _hash_password(password, row["pw_salt"]), row["pw_hash"])
+
+    def latest(self, username):
+        student = student_id(username)
+        conn = self._conn()
+        info = conn.execute("SELECT name, last_fetch FROM students WHERE student = ?", (student,)).fetchone()
+        if not info:
+            return None
+        rows = conn.execute("SELECT subject, attended, total, percentage FROM subject_latest "
+                            "WHERE student = ? ORDER BY position", (student,)).fetchall()
+        return {
+            "student_name": info["name"],
+            "fetched_at": info["last_fetch"],
+            "data": [{"code": r["subject"], "attended": r["attended"], "total": r["total"],
+                      "percentage": r["percentage"]} for r in rows],
+        }
+
+    def trend(self, username, subject=None, since=None):
+        """Per-subject series of (time, attended, total, percentage) change points."""
+        sql = "SELECT subject, fetched_at, attended, total, percentage FROM subject_deltas WHERE student = ?"
+        args = [student_id(username)]
+        if subject:
+            sql += " AND subject = ?"
+            args.append(subject)
+        if since:
+            sql += " AND fetched_at >= ?"
+            args.append(since)
+        sql += " ORDER BY subject, fetched_at"
+        series = {}
+        for r in self._conn().execute(sql, args):
+            series.setdefault(r["subject"], []).append({
+                "t": r["fetched_at"], "attended": r["attended"], "total": r["total"], "percentage": r["percentage"]})
+        return series
+
+    def changes(self, username, since=None):
+        """Classes added per subject between `since` and the latest snapshot.
+
+        `since` defaults to the snapshot before the latest one, i.e. "since
+        the last check".
+        """
+        student = student_id(username)
+        conn = self._conn()
+        if since is None:
+            prev = conn.execute("SELECT fetched_at FROM snapshots WHERE student = ? "
+                                "ORDER BY fetched_at DESC LIMIT 1 OFFSET 1", (student,)).fetchone()
+            since = prev["fetched_at"] if prev else 0
+
+        before = {r["subject"]: r for r in conn.execute(
+            "SELECT d.subject, d.attended, d.total FROM subject_deltas d "
+            "WHERE d.student = ? AND d.fetched_at = (SELECT MAX(fetched_at) FROM subject_deltas "
+            "WHERE student = d.student AND subject = d.subject AND fetched_at <= ?)", (student, since))}
+
+        changes = []
+        for r in conn.execute("SELECT subject, attended, total, updated_at FROM subject_latest "
+                              "WHERE student = ? AND updated_at > ? ORDER BY position", (student, since)):
+            old = before.get(r["subject"])
+            changes.append({
+                "code": r["subject"],
+                "attended_added": r["attended"] - (old["attended"] if old else 0),
+                "conducted_added": r["total"] - (old["total"] if old else 0),
+                "attended": r["attended"],
+                "total": r["total"],
+                "updated_at": r["updated_at"],
+            })
+        return {"since": since, "changes": changes}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore()
+        return _store
+
+
+def stored_payload(username, password, max_age=None):
+    """The last stored attendance in the API's payload shape, or None.
+
+    Only answers for the password that produced it, and only if it is at
+    most `max_age` seconds old (any age when None).
+    """
+    if not HISTORY_ENABLED:
+        return None
+    store = get_store()
+    latest = store.latest(username)
+    if not latest or not latest["data"]:
+        return None
+    if max_age is not None and time.time() - (latest["fetched_at"] or 0) > max_age:
+        return None
+    if not store.verify(username, password):
+        return None
+    return {
+        "message": "Success",
+        "student_name": latest["student_name"],
+        "data": latest["data"],
+        "meta": {"engine": "history", "fetched_at": latest["fetched_at"]},
+    }
+
+
+def record_fetch(username, password, student_name, records):
+    """Best-effort write used by the engines; never fails a fetch."""
+    if not HISTORY_ENABLED:
+        return
+    try:
+        get_store().record(username, password, student_name, records)
+    except Exception as e:
+        print(f"History write failed: {e}")
@@ -0,0 +1,189 @@
+import json
+import os
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from attendance_parser import parse_objects, parse_rows
+from grid_extract import clean_name
+from health import upstream
+from portal import (PORTAL_URL, no_progress, NAV_TIMEOUT_MSG, CONN_TIMEOUT_MSG, INVALID_CREDS_MSG,
+                    PortalError, login_error)
+from readiness import PhaseTimer
+
+# Extra attendance XHR endpoints (comma separated, relative to the portal).
+# Anything found in the dashboard's ExtJS store definitions is tried as well.
+ATTENDANCE_PATHS = [p.strip() for p in os.environ.get("PORTAL_ATTENDANCE_PATHS", "").split(",") if p.strip()]
+HTTP_TIMEOUT = float(os.environ.get("HTTP_ENGINE_TIMEOUT", "20"))
+
+# One connection pool per process; every login gets its own Session (and so
+# its own cookie jar) mounted on the shared adapter.
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=int(os.environ.get("HTTP_POOL_SIZE", "16")))
+
+STORE_URL_RE = re.compile(r"""url\s*:\s*['"]([^'"]*attend[^'"]*)['"]""", re.IGNORECASE)
+NAME_RE = re.compile(r"""id=["']studentName["'][^>]*>\s*([^<]+)<""", re.IGNORECASE)
+ERROR_RE = re.compile(r"""id=["']studentErrorDiv["'][^>]*>\s*([^<]+)<""", re.IGNORECASE)
+
+
+class ShapeChanged(Exception):
+    """The portal answered with something this engine doesn't understand."""
+
+
+def new_session():
+    # Don't call session.close(): it would close the shared adapter too
+    session = requests.Session()
+    session.mount("http://", _adapter)
+    session.mount("https://", _adapter)
+    session.headers["User-Agent"] = "Mozilla/5.0 (X11; Linux x86_64) mits-ims"
+    return session
+
+
+class _FormParser(HTMLParser):
+    """Picks the action and hidden inputs of `#studentForm`."""
+
+    def __init__(self):
+        super().__init__()
+        self.action = None
+        self.fields = {}
+        self._inside = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "form" and attrs.get("id") == "studentForm":
+            self._inside = True
+            self.action = attrs.get("action") or ""
+        elif self._inside and tag == "input" and attrs.get("name") and attrs.get("type") == "hidden":
+            self.fields[attrs["name"]] = attrs.get("value") or ""
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self._inside = False
+
+
+class _TableParser(HTMLParser):
+    """Flattens every <tr> into a list of cell strings."""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self._row = []
+        elif tag in ("td", "th") and self._row is not None:
+            self._cell = []
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th") and self._row is not None and self._cell is not None:
+            self._row.append("".join(self._cell).strip())
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+
+def _records_from_html(html):
+    parser = _TableParser()
+    parser.feed(html)
+    return parse_rows(parser.rows)
+
+
+def parse_attendance_response(response):
+    """Turn one attendance XHR response into records; [] if unrecognised."""
+    ctype = response.headers.get("Content-Type", "")
+    text = response.text
+    if "json" in ctype or text.lstrip().startswith(("{", "[")):
+        try:
+            return parse_objects(json.loads(text))
+        except ValueError:
+            return []
+    return _records_from_html(text)
+
+
+def fetch(username, password, session=None, progress=no_progress):
+    """Log in and read attendance over plain HTTP.
+
+    Returns `{"student_name", "records", "meta"}` like engine.fetch. Raises PortalError for user-facing failures and
+    ShapeChanged when the portal's markup/JSON is not what we expect.
+    """
+    timer = PhaseTimer()
+    session = session or new_session()
+
+    # 1. Landing page (gives us the session cookie and the login form)
+    progress("navigating")
+    try:
+        landing = session.get(PORTAL_URL, timeout=upstream.timeout_ms("navigate", HTTP_TIMEOUT * 1000, "http") / 1000)
+        landing.raise_for_status()
+    except requests.RequestException:
+        raise PortalError(NAV_TIMEOUT_MSG, 504)
+    timer.mark("navigate")
+
+    form = _FormParser()
+    form.feed(landing.text)
+    if form.action is None:
+        raise ShapeChanged("login form #studentForm not found")
+
+    # 2. Replay the login post
+    progress("logging_in")
+    fields = dict(form.fields)
+    fields.update({"inputStuId": username, "inputPassword": password, "studentSubmitButton": ""})
+    try:
+        login = session.post(urljoin(landing.url, form.action), data=fields, timeout=HTTP_TIMEOUT)
+    except requests.RequestException:
+        raise PortalError(CONN_TIMEOUT_MSG, 504)
+    timer.mark("login")
+
+    body = login.text
+    if body.lstrip().startswith("{"):
+        # ExtJS form submit answering with {success: ..., msg: ...}
+        try:
+            result = json.loads(body)
+        except ValueError:
+            raise ShapeChanged("unparseable login response")
+        if not result.get("success"):
+            msg = result.get("msg")
+            raise login_error(msg) if isinstance(msg, str) and msg.strip() else PortalError(INVALID_CREDS_MSG, 401)
+    else:
+        err = ERROR_RE.search(body)
+        if err and err.group(1).strip():
+            # Same mapping as the browser engines: maintenance/lockout text is shown as is
+            raise login_error(err.group(1).strip())
+        if "studentName" not in body:
+            raise ShapeChanged("dashboard marker #studentName missing after login")
+
+    name_match = NAME_RE.search(body)
+    student_name = clean_name(name_match.group(1) if name_match else "")
+
+    # 3. Attendance XHRs
+    progress("extracting")
+    paths = ATTENDANCE_PATHS + [u for u in STORE_URL_RE.findall(body) if u not in ATTENDANCE_PATHS]
+    if not paths:
+        raise ShapeChanged("no attendance store URL found")
+
+    records = []
+    for path in paths:
+        try:
+            resp = session.post(urljoin(login.url, path), timeout=HTTP_TIMEOUT,
+                                headers={"X-Requested-With": "XMLHttpRequest"})
+        except requests.RequestException:
+            raise PortalError(CONN_TIMEOUT_MSG, 504)
+        if resp.ok:
+            records = parse_attendance_response(resp)
+            if records:
+                break
+    timer.mark("extract")
+
+    if not records:
+        raise ShapeChanged("attendance response did not contain any records")
+
+    meta = {"engine": "http", "timings_ms": timer.timings, "total_ms": timer.total()}
+    return {"student_name": student_name, "records": records, "meta": meta}
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Scrapes running at once, and how many may wait behind them
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX = int(os.environ.get("JOB_QUEUE_MAX", "20"))
+# Finished jobs are kept this long for late pollers
+JOB_TTL = int(os.environ.get("JOB_TTL", "300"))
+
+PHASES = ("queued", "navigating", "logging_in", "extracting", "done", "failed")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.phase = "queued"
+        self.result = None
+        self.status_code = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.version = 0
+        self.cond = threading.Condition()
+
+    @property
+    def done(self):
+        return self.phase in ("done", "failed")
+
+    def set_phase(self, phase):
+        with self.cond:
+            if self.done:
+                # Late updates (e.g. a background cache refresh) don't reopen a job
+                return
+            self.phase = phase
+            self.version += 1
+            self.cond.notify_all()
+
+    def finish(self, payload, status_code):
+        with self.cond:
+            self.result = payload
+            self.status_code = status_code
+            self.finished = time.time()
+            self.phase = "done" if status_code < 400 else "failed"
+            self.version += 1
+            self.cond.notify_all()
+
+    def wait_for_change(self, version, timeout):
+        """Block until the job moves past `version` (or timeout); returns the new version."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def to_dict(self):
+        d = {"job_id": self.id, "phase": self.phase}
+        if self.done:
+            d["status_code"] = self.status_code
+            d["result"] = self.result
+        return d
+
+
+class JobManager:
+    """Bounded executor with an admission queue for attendance scrapes."""
+
+    def __init__(self, workers=JOB_WORKERS, queue_max=JOB_QUEUE_MAX, ttl=JOB_TTL):
+        self.workers = workers
+        self.queue_max = queue_max
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scrape-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_ms = deque(maxlen=200)
+
+    def submit(self, fn):
+        """Queue `fn(job)` -> (payload, status_code). Raises QueueFull when saturated."""
+        with self._lock:
+            self._prune()
+            if self._waiting >= self.queue_max:
+                self._rejected += 1
+                raise QueueFull()
+            job = Job()
+            self._jobs[job.id] = job
+            self._waiting += 1
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job, fn):
+        job.started = time.time()
+        with self._lock:
+            self._waiting -= 1
+            self._running += 1
+            self._wait_ms.append((job.started - job.created) * 1000)
+        try:
+            payload, status_code = fn(job)
+        except Exception as e:
+            print(f"Job {job.id} crashed: {e}")
+            payload, status_code = {"error": "Something went wrong. Please try after some time."}, 500
+        job.finish(payload, status_code)
+        with self._lock:
+            self._running -= 1
+            self._completed += 1
+
+    def get(self, job_id):
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def metrics(self):
+        with self._lock:
+            waits = sorted(self._wait_ms)
+        p95 = waits[int(len(waits) * 0.95) - 1] if waits else 0
+        return {
+            "workers": self.workers,
+            "queue_depth": self._waiting,
+            "queue_max": self.queue_max,
+            "running": self._running,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "wait_ms_avg": round(sum(waits) / len(waits), 1) if waits else 0,
+            "wait_ms_p95": round(p95, 1),
+        }
@@ -0,0 +1,194 @@
+import asyncio
+import os
+import threading
+import time
+
+# Render's small instances have 512 MB for gunicorn + Chromium together.
+# Above MEMORY_HIGH_MB (the worker's whole process tree) new scrapes wait
+# (up to MEMORY_WAIT_S) for running ones to finish, and if nothing else is
+# running (always the case with one browser) start on a fresh browser.
+# A browser is also recycled after a scrape once Chromium's own processes
+# (without the worker or the Playwright driver) pass BROWSER_RECYCLE_MB.
+MEMORY_HIGH_MB = int(os.environ.get("MEMORY_HIGH_MB", "380"))
+BROWSER_RECYCLE_MB = int(os.environ.get("BROWSER_RECYCLE_MB", "320"))
+MEMORY_WAIT_S = float(os.environ.get("MEMORY_WAIT_S", "30"))
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+# /proc/<pid>/comm of Chromium's processes (truncated to 15 characters)
+BROWSER_COMMS = ("chrome", "headless_shell", "chromium")
+
+
+def _parent_map():
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # comm may contain spaces/parens; ppid is the 2nd field after it
+                parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            pass
+    return parents
+
+
+def host_memory_mb():
+    """Memory this host (or container, per its cgroup limit) has, in MB; None if unknown."""
+    limits = []
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:  # "max" / huge: no limit
+            limits.append(int(value) // (1024 * 1024))
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    limits.append(int(line.split()[1]) // 1024)
+                    break
+    except (OSError, ValueError):
+        pass
+    return min(limits) if limits else None
+
+
+def children(pid):
+    """Direct children of `pid` (e.g. the workers of a gunicorn master)."""
+    return sorted(child for child, parent in _parent_map().items() if parent == pid)
+
+
+def process_tree(pid=None):
+    """`pid` (default: this process) and all of its descendants."""
+    root = pid or os.getpid()
+    children = {}
+    for child, parent in _parent_map().items():
+        children.setdefault(parent, []).append(child)
+    tree, stack = [], [root]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, ()))
+    return tree
+
+
+def _comm(pid):
+    try:
+        with open(f"/proc/{pid}/comm") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def _process_kb(pid):
+    # PSS splits shared pages between Chromium's processes instead of
+    # counting them once per process like RSS does
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE // 1024
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def tree_mb(pid=None):
+    """Memory of this worker plus its Playwright driver and browsers, in MB.
+
+    None where /proc is not available (e.g. macOS during development).
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    return round(sum(_process_kb(p) for p in process_tree(pid)) / 1024, 1)
+
+
+def browser_mb(pid=None):
+    """Memory of the Chromium processes under this worker, in MB (None without /proc)."""
+    if not os.path.isdir("/proc"):
+        return None
+    browsers = [p for p in process_tree(pid)[1:] if _comm(p).lower().startswith(BROWSER_COMMS)]
+    return round(sum(_process_kb(p) for p in browsers) / 1024, 1)
+
+
+class Governor:
+    """Holds new scrapes while the worker is over its memory budget."""
+
+    def __init__(self, high_mb=MEMORY_HIGH_MB, recycle_mb=BROWSER_RECYCLE_MB, wait_s=MEMORY_WAIT_S):
+        self.high_mb = high_mb
+        self.recycle_mb = recycle_mb
+        self.wait_s = wait_s
+        self.held = 0
+        self.recycled = 0
+        self.last_mb = None
+        self.peak_mb = 0
+        self._lock = threading.Lock()
+
+    def measure(self):
+        mb = tree_mb()
+        if mb is not None:
+            with self._lock:
+                self.last_mb = mb
+                self.peak_mb = max(self.peak_mb, mb)
+        return mb
+
+    def over_high(self):
+        mb = self.measure()
+        return mb is not None and mb >= self.high_mb
+
+    def _hold(self, busy, started):
+        return busy() > 0 and time.monotonic() - started < self.wait_s and self.over_high()
+
+    def _count_held(self):
+        with self._lock:
+            self.held += 1
+
+    def admit(self, busy):
+        """Wait while memory is high and `busy()` other scrapes are running.
+
+        Gives up after wait_s so a leak can't stall the worker forever;
+        returns the seconds spent waiting.
+        """
+        started = time.monotonic()
+        if self._hold(busy, started):
+            self._count_held()
+            while self._hold(busy, started):
+                time.sleep(0.25)
+        return round(time.monotonic() - started, 2)
+
+    async def admit_async(self, busy):
+        """admit() for code on an event loop."""
+        started = time.monotonic()
+        if self._hold(busy, started):
+            self._count_held()
+            while self._hold(busy, started):
+                await asyncio.sleep(0.25)
+        return round(time.monotonic() - started, 2)
+
+    def recycle_before(self):
+        """True if a browser should be replaced before the next scrape: still
+        over the high-water mark after admit() (nothing left to wait for)."""
+        if self.over_high():
+            with self._lock:
+                self.recycled += 1
+            return True
+        return False
+
+    def should_recycle(self, mb=None):
+        """True if a browser should be replaced after a scrape; `mb` defaults to browser_mb()."""
+        mb = browser_mb() if mb is None else mb
+        if mb is not None and mb >= self.recycle_mb:
+            with self._lock:
+                self.recycled += 1
+            return True
+        return False
+
+    def stats(self):
+        with self._lock:
+            return {"high_mb": self.high_mb, "recycle_mb": self.recycle_mb, "last_mb": self.last_mb,
+                    "peak_mb": self.peak_mb, "held": self.held, "recycled": self.recycled}
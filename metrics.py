@@ -0,0 +1,119 @@
+import os
+import threading
+from bisect import bisect_left
+
+# Add a Server-Timing header with the per-phase breakdown to API responses
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "1") == "1"
+
+# Seconds; the portal routinely takes 5-30s, timeouts sit at 45s+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90)
+PHASE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30, 45)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, count in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, values)} {count}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series):
+                    cumulative += count
+                    le = _labels(self.labels + ("le",), values + (bound,))
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, values)} {round(series[-1], 4)}")
+                lines.append(f"{self.name}_count{_labels(self.labels, values)} {cumulative}")
+        return lines
+
+
+fetches = Counter("attendance_fetches_total", "Scrapes by engine and HTTP status (504 timeout, 401 login, 500 other).",
+                  ("engine", "status"))
+fetch_seconds = Histogram("attendance_fetch_seconds", "End-to-end scrape latency.", ("engine",))
+phase_seconds = Histogram("attendance_phase_seconds", "Time spent in each scrape phase.", ("phase",),
+                          PHASE_BUCKETS)
+fetch_memory = Histogram("attendance_fetch_memory_mb", "Worker + browser memory (PSS) measured at the end of a fetch.",
+                         ("engine",), (64, 128, 192, 256, 320, 384, 448, 512, 768, 1024))
+cache_lookups = Counter("attendance_cache_lookups_total", "Result cache lookups by outcome.", ("status",))
+
+
+def record_fetch(engine, status, seconds, timings_ms=None, memory_mb=None):
+    """Count one scrape and its per-phase timings."""
+    fetches.inc(engine, status)
+    fetch_seconds.observe(seconds, engine)
+    if memory_mb is not None:
+        fetch_memory.observe(memory_mb, engine)
+    for phase, ms in (timings_ms or {}).items():
+        phase_seconds.observe(ms / 1000, phase)
+
+
+def observe_phase(phase, seconds):
+    phase_seconds.observe(seconds, phase)
+
+
+def render(gauges=None):
+    """Prometheus text exposition of everything above, plus `gauges` ({name: value})."""
+    lines = []
+    for metric in (fetches, fetch_seconds, phase_seconds, fetch_memory, cache_lookups):
+        lines.extend(metric.render())
+    for name, value in (gauges or {}).items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def server_timing(meta, cache_status=None):
+    """Server-Timing header value for a payload's meta, e.g. `navigate;dur=812.4, ...`.
+
+    Cached answers only name the cache outcome; their timings belong to the
+    earlier scrape.
+    """
+    if cache_status in ("hit", "stale"):
+        return f'cache;desc="{cache_status}"'
+    timings = dict((meta or {}).get("timings_ms") or {})
+    if "total_ms" in (meta or {}):
+        timings["total"] = meta["total_ms"]
+    return ", ".join(f"{phase};dur={ms}" for phase, ms in timings.items())
@@ -0,0 +1,416 @@
+"""Local stand-in for mitsims.in, for benchmarks and offline development.
+
+    python mock_portal.py --port 8765 --latency-ms 200
+    PORTAL_URL=http://127.0.0.1:8765/ gunicorn app:app
+
+Mimics the parts of the portal the scrapers touch: the landing page with
+#studentLink / #studentForm, the login post, the dashboard with
+#studentName (or #studentErrorDiv on bad credentials) and the attendance
+XHR the dashboard's store loads. Any password except "wrong" logs in.
+
+The built-in pages are a sketch of the portal. To replay the real thing,
+record it once and serve the recording:
+
+    MITS_USERNAME=... MITS_PASSWORD=... python mock_portal.py --record recordings/portal
+    python mock_portal.py --replay recordings/portal --latency-ms 300 --failure-rate 0.05
+
+Recording drives Chromium through one failed and one successful login
+(HAR capture) and keeps every response the portal sent, with the register
+number, password and student name scrubbed. Replay answers each request
+with the recorded response for its method and path; login requests
+carrying the password "wrong" get the recorded error page.
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+LANDING = """<!DOCTYPE html>
+<html><head><title>MITS IMS</title></head>
+<body>
+<a id="studentLink" href="#" onclick="document.getElementById('studentForm').style.display='block'; return false;">Student</a>
+<form id="studentForm" action="/login" method="post" style="display:none">
+    <input type="hidden" name="loginType" value="student">
+    <input id="inputStuId" name="inputStuId" type="text">
+    <input id="inputPassword" name="inputPassword" type="password">
+    <button id="studentSubmitButton" name="studentSubmitButton" type="submit">Login</button>
+</form>
+{error}
+</body></html>"""
+
+# What an overloaded portal answers with
+UNAVAILABLE = """<!DOCTYPE html>
+<html><head><title>503 Service Unavailable</title></head>
+<body><h1>Service Unavailable</h1>
+<p>The server is temporarily unable to service your request due to maintenance downtime or capacity problems.</p>
+</body></html>"""
+
+ERROR_DIV = '<div id="studentErrorDiv">{}</div>'
+INVALID_LOGIN = "Invalid Username or Password"
+
+DASHBOARD = """<!DOCTYPE html>
+<html><head><title>MITS IMS</title></head>
+<body>
+<div id="studentName">{name} | Change Password</div>
+<table id="attendanceGrid">
+    <tr><th>Subject</th><th>Attended</th><th>Total Conducted</th><th>Attendance %</th></tr>
+</table>
+<script>
+var attendanceStore = {{url: '/student/attendance'}};
+fetch(attendanceStore.url, {{method: 'POST', headers: {{'X-Requested-With': 'XMLHttpRequest'}}}})
+    .then(r => r.json())
+    .then(d => {{
+        const grid = document.getElementById('attendanceGrid');
+        for (const s of d.data) {{
+            const tr = document.createElement('tr');
+            tr.className = 'x-grid-row';
+            for (const v of [s.subjectCode, s.attended, s.conducted, s.percentage]) {{
+                const td = document.createElement('td');
+                td.textContent = v;
+                tr.appendChild(td);
+            }}
+            grid.appendChild(tr);
+        }}
+    }});
+</script>
+</body></html>"""
+
+
+# Stand-ins for the scrubbed values in a recording
+REPLAY_USERNAME = "21REPLAY01"
+REPLAY_NAME = "STUDENT REPLAY"
+USERNAME_MARK = b"@@USERNAME@@"
+NAME_MARK = b"@@NAME@@"
+WRONG_PASSWORD = "wrong"
+
+# Response headers worth replaying (the rest describe the original transfer)
+REPLAY_HEADERS = ("content-type", "location", "set-cookie", "cache-control")
+
+
+class Replay:
+    """Recorded portal responses, looked up by (method, path)."""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        self.entries = {}  # (method, path) -> {variant: entry}
+        for entry in manifest["entries"]:
+            with open(os.path.join(directory, entry["file"]), "rb") as f:
+                body = f.read()
+            if entry.get("text"):
+                body = body.replace(USERNAME_MARK, REPLAY_USERNAME.encode()).replace(NAME_MARK, REPLAY_NAME.encode())
+            entry = dict(entry, body=body)
+            self.entries.setdefault((entry["method"], entry["path"]), {})[entry["variant"]] = entry
+
+    def lookup(self, method, path, body=""):
+        """The recorded entry for a request, or None.
+
+        Requests recorded in both logins (the login post and whatever it
+        leads to) replay the failed variant when the body carries the
+        password "wrong".
+        """
+        variants = self.entries.get((method, urlsplit(path).path))
+        if not variants:
+            return None
+        if "error" in variants and _has_wrong_password(body):
+            return variants["error"]
+        return variants.get("ok") or variants.get("error")
+
+
+def _has_wrong_password(body):
+    values = [v for vs in parse_qs(body).values() for v in vs]
+    if body.lstrip().startswith("{"):
+        try:
+            values += [v for v in json.loads(body).values() if isinstance(v, str)]
+        except (ValueError, AttributeError):
+            pass
+    return WRONG_PASSWORD in values
+
+
+class MockPortal:
+    def __init__(self, latency_ms=0, jitter_ms=0, failure_rate=0.0, hang_rate=0.0, hang_ms=60000,
+                 subjects=8, seed=None, replay=None, login_error=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        # Accept the request, then stall like a portal that stopped answering
+        self.hang_rate = hang_rate
+        self.hang_ms = hang_ms
+        self.subjects = subjects
+        # Shown on every login instead of the dashboard (e.g. a maintenance or lockout notice)
+        self.login_error = login_error
+        self.random = random.Random(seed)
+        self.replay = Replay(replay) if replay else None
+        self.sessions = {}  # sid -> username
+        self.lock = threading.Lock()
+        self.hits = {"landing": 0, "login": 0, "attendance": 0, "replayed": 0, "failures": 0, "hangs": 0}
+
+    def delay(self):
+        ms = self.latency_ms + (self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if ms:
+            time.sleep(ms / 1000)
+
+    def should_fail(self):
+        return self.failure_rate and self.random.random() < self.failure_rate
+
+    def should_hang(self):
+        return self.hang_rate and self.random.random() < self.hang_rate
+
+    def attendance(self, username):
+        # Deterministic per student so repeated fetches agree
+        rng = random.Random(username)
+        rows = []
+        for i in range(self.subjects):
+            total = rng.randint(20, 60)
+            attended = rng.randint(total // 2, total)
+            rows.append({
+                "subjectCode": f"20CS{501 + i}",
+                "attended": attended,
+                "conducted": total,
+                "percentage": round(attended / total * 100, 2),
+            })
+        return rows
+
+    def count(self, key):
+        with self.lock:
+            self.hits[key] += 1
+
+
+def make_handler(portal):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body, ctype="text/html; charset=utf-8", cookie=None):
+            data = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            if cookie:
+                self.send_header("Set-Cookie", cookie)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _replay(self, body=""):
+            entry = portal.replay.lookup(self.command, self.path, body)
+            if entry is None:
+                return self._send(404, "Not Found (not in the recording)", "text/plain")
+            portal.count("replayed")
+            self.send_response(entry["status"])
+            for name, value in entry["headers"]:
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(entry["body"])))
+            self.end_headers()
+            self.wfile.write(entry["body"])
+
+        def _session_user(self):
+            for part in self.headers.get("Cookie", "").split(";"):
+                name, _, value = part.strip().partition("=")
+                if name == "SID":
+                    with portal.lock:
+                        return portal.sessions.get(value)
+            return None
+
+        def _maybe_fail(self):
+            if portal.should_hang():
+                portal.count("hangs")
+                time.sleep(portal.hang_ms / 1000)
+            if portal.should_fail():
+                portal.count("failures")
+                self._send(503, UNAVAILABLE)
+                return True
+            return False
+
+        def do_GET(self):
+            portal.delay()
+            if self._maybe_fail():
+                return
+            if portal.replay:
+                return self._replay()
+            if self.path.startswith("/student/attendance"):
+                return self._attendance()
+            portal.count("landing")
+            user = self._session_user()
+            if user:
+                return self._send(200, DASHBOARD.format(name=user_name(user)))
+            self._send(200, LANDING.format(error=""))
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length).decode() if length else ""
+            portal.delay()
+            if self._maybe_fail():
+                return
+            if portal.replay:
+                return self._replay(body)
+            if self.path.startswith("/login"):
+                portal.count("login")
+                form = {k: v[0] for k, v in parse_qs(body).items()}
+                username = form.get("inputStuId", "")
+                if portal.login_error:
+                    return self._send(200, LANDING.format(error=ERROR_DIV.format(portal.login_error)))
+                if not username or form.get("inputPassword") in (None, "", "wrong"):
+                    return self._send(200, LANDING.format(error=ERROR_DIV.format(INVALID_LOGIN)))
+                sid = secrets.token_hex(16)
+                with portal.lock:
+                    portal.sessions[sid] = username
+                return self._send(200, DASHBOARD.format(name=user_name(username)),
+                                  cookie=f"SID={sid}; Path=/; HttpOnly")
+            if self.path.startswith("/student/attendance"):
+                return self._attendance()
+            self._send(404, "Not Found", "text/plain")
+
+        def _attendance(self):
+            portal.count("attendance")
+            user = self._session_user()
+            if not user:
+                return self._send(401, json.dumps({"success": False}), "application/json")
+            self._send(200, json.dumps({"success": True, "data": portal.attendance(user)}), "application/json")
+
+    return Handler
+
+
+def user_name(username):
+    return f"STUDENT {username.upper()}"
+
+
+def _har_entries(har_path, variant, scrub):
+    """(entry, body) pairs from a HAR file, with the `scrub` values masked."""
+    with open(har_path) as f:
+        har = json.load(f)
+    for item in har["log"]["entries"]:
+        response = item["response"]
+        if response["status"] <= 0:  # aborted (see blocking.py) or failed
+            continue
+        content = response.get("content", {})
+        text = content.get("text") or ""
+        body = base64.b64decode(text) if content.get("encoding") == "base64" else text.encode()
+        ctype = content.get("mimeType") or ""
+        is_text = any(t in ctype for t in ("text", "json", "javascript", "xml"))
+        if is_text:
+            for value, mark in scrub:
+                body = body.replace(value.encode(), mark)
+        headers = []
+        for h in response["headers"]:
+            name = h["name"].lower()
+            if name not in REPLAY_HEADERS:
+                continue
+            value = h["value"]
+            if name == "set-cookie":
+                # Served from 127.0.0.1 over plain HTTP
+                value = "; ".join(p for p in value.split("; ")
+                                  if not p.lower().startswith(("domain=", "secure", "samesite")))
+            elif name == "location":
+                parts = urlsplit(value)
+                value = parts.path + (f"?{parts.query}" if parts.query else "") if parts.netloc else value
+            headers.append([h["name"], value])
+        url = urlsplit(item["request"]["url"])
+        yield {"variant": variant, "method": item["request"]["method"], "path": url.path or "/",
+               "status": response["status"], "headers": headers, "text": is_text}, body
+
+
+def record(directory, username, password, url=None):
+    """Log in to the real portal twice (wrong password, then `password`)
+    and save what it sent as a replayable recording in `directory`."""
+    from playwright.sync_api import sync_playwright
+    import portal
+
+    url = url or portal.PORTAL_URL
+    os.makedirs(os.path.join(directory, "bodies"), exist_ok=True)
+    student_name = None
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        try:
+            for variant, pwd in (("error", f"{WRONG_PASSWORD}-{secrets.token_hex(4)}"), ("ok", password)):
+                context = browser.new_context(record_har_path=os.path.join(directory, f"{variant}.har"),
+                                              record_har_content="embed")
+                try:
+                    if variant == "error":
+                        page = context.new_page()
+                        page.goto(url, timeout=45000)
+                        try:
+                            portal.login(page, username, pwd)
+                        except portal.PortalError:
+                            pass
+                    else:
+                        report, _ = portal.read_dashboard(context, username, pwd)
+                        student_name = report.student_name
+                finally:
+                    context.close()  # writes the HAR
+        finally:
+            browser.close()
+    return save_recording(directory, url, username, password, student_name)
+
+
+def save_recording(directory, url, username, password, student_name=None):
+    """Turn the error.har / ok.har captured by record() into manifest.json + bodies/."""
+    scrub = [(password, b"@@PASSWORD@@"), (username, USERNAME_MARK), (username.upper(), USERNAME_MARK)]
+    if student_name:
+        scrub.insert(0, (student_name, NAME_MARK))
+    entries, seen = [], set()
+    for variant in ("error", "ok"):
+        har_path = os.path.join(directory, f"{variant}.har")
+        for entry, body in _har_entries(har_path, variant, scrub):
+            key = (variant, entry["method"], entry["path"])
+            if key in seen:  # keep the first of repeated polls
+                continue
+            seen.add(key)
+            entry["file"] = os.path.join("bodies", f"{len(entries):03d}")
+            with open(os.path.join(directory, entry["file"]), "wb") as f:
+                f.write(body)
+            entries.append(entry)
+        # The HAR holds the credentials in the login post
+        os.remove(har_path)
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump({"portal": url, "recorded_at": int(time.time()), "entries": entries}, f, indent=1)
+    return len(entries)
+
+
+def serve(port=8765, host="127.0.0.1", **options):
+    """Start the mock portal on a background thread; returns (server, portal)."""
+    portal = MockPortal(**options)
+    server = ThreadingHTTPServer((host, port), make_handler(portal))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-portal", daemon=True).start()
+    return server, portal
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for mitsims.in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0, help="added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="random extra latency, 0..N ms")
+    parser.add_argument("--failure-rate", type=float, default=0, help="fraction of requests answered 503")
+    parser.add_argument("--hang-rate", type=float, default=0, help="fraction of requests that stall first")
+    parser.add_argument("--hang-ms", type=float, default=60000, help="how long a stalled request waits")
+    parser.add_argument("--subjects", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=None, help="makes injected latency/failures repeatable")
+    parser.add_argument("--replay", metavar="DIR", help="serve a recording instead of the built-in pages")
+    parser.add_argument("--record", metavar="DIR", help="record the real portal (PORTAL_URL) into DIR and exit")
+    args = parser.parse_args()
+
+    if args.record:
+        username, password = os.environ.get("MITS_USERNAME"), os.environ.get("MITS_PASSWORD")
+        if not username or not password:
+            parser.error("--record needs MITS_USERNAME and MITS_PASSWORD")
+        print(f"Recorded {record(args.record, username, password)} responses into {args.record}")
+        raise SystemExit(0)
+
+    server, _ = serve(args.port, args.host, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                      failure_rate=args.failure_rate, hang_rate=args.hang_rate, hang_ms=args.hang_ms,
+                      subjects=args.subjects, seed=args.seed, replay=args.replay)
+    mode = f"replaying {args.replay}" if args.replay else "built-in pages"
+    print(f"Mock portal on http://{args.host}:{args.port}/ ({mode})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
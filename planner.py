@@ -0,0 +1,196 @@
+"""What-if attendance planner.
+
+Everything is computed on arrays over all subjects (and, for batches, all
+students) at once: how many classes can be skipped or must be attended to
+reach a target percentage, projections over the sessions still left on the
+timetable, and Monte Carlo runs of "attend each class with probability p".
+"""
+import os
+
+import numpy as np
+
+DEFAULT_TARGET = 75.0
+MAX_RUNS = 100000
+# Sessions per subject (attended, total, remaining); keeps int32 sums exact
+MAX_SESSIONS = 10000
+# Cap on runs x students x subjects per simulation: the draws and the arrays
+# derived from them take ~25 bytes per element, ~50 MB at the default
+MAX_ELEMENTS = int(os.environ.get("PLAN_MAX_ELEMENTS", "2000000"))
+
+
+def _count(value, name):
+    """`value` as a session count in [0, MAX_SESSIONS]; ValueError otherwise."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+        raise ValueError(f"{name} must be a number")
+    if not 0 <= value <= MAX_SESSIONS:
+        raise ValueError(f"{name} must be between 0 and {MAX_SESSIONS}")
+    return int(value)
+
+
+def check_records(records):
+    """Raise ValueError unless every record has numeric attended <= total."""
+    for r in records:
+        attended = _count(r["attended"], f"{r['code']}: attended")
+        if attended > _count(r["total"], f"{r['code']}: total"):
+            raise ValueError(f"{r['code']}: attended is more than total")
+    return records
+
+
+def check_remaining(remaining):
+    """Validate `remaining` (an int, or {code: n}) and return it as ints."""
+    if isinstance(remaining, dict):
+        return {str(code): _count(n, f"remaining[{code}]") for code, n in remaining.items()}
+    return _count(remaining or 0, "remaining")
+
+
+def check_seed(seed):
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int) or seed < 0):
+        raise ValueError("seed must be a non-negative integer")
+    return seed
+
+
+def _arrays(records):
+    attended = np.array([r["attended"] for r in records], dtype=np.int64)
+    total = np.array([r["total"] for r in records], dtype=np.int64)
+    return attended, total
+
+
+def _remaining(records, remaining):
+    """Remaining sessions per subject from an int (same for all) or {code: n}."""
+    if isinstance(remaining, dict):
+        return np.array([int(remaining.get(r["code"], 0)) for r in records], dtype=np.int64)
+    return np.full(len(records), int(remaining or 0), dtype=np.int64)
+
+
+def _percent(attended, total):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total > 0, attended / np.maximum(total, 1) * 100, 0.0)
+
+
+def skippable(attended, total, target):
+    """Classes that can be missed in a row while staying at or above target."""
+    p = target / 100
+    if p <= 0:
+        return np.full(attended.shape, -1, dtype=np.int64)  # unlimited
+    # attended / (total + k) >= p  ->  k <= attended / p - total
+    return np.maximum(0, np.floor(attended / p - total + 1e-9)).astype(np.int64)
+
+
+def needed(attended, total, target):
+    """Classes that must be attended in a row to reach the target (-1: never)."""
+    p = target / 100
+    if p >= 1:
+        return np.where(attended >= total, 0, -1).astype(np.int64)
+    # (attended + k) / (total + k) >= p  ->  k >= (p * total - attended) / (1 - p)
+    return np.maximum(0, np.ceil((p * total - attended) / (1 - p) - 1e-9)).astype(np.int64)
+
+
+def plan(records, target=DEFAULT_TARGET, remaining=0):
+    """Per-subject and overall plan for one student's records (API dicts)."""
+    if not records:
+        return {"target": target, "subjects": [], "overall": None}
+    attended, total = _arrays(records)
+    left = _remaining(records, remaining)
+    p = target / 100
+
+    # Out of the remaining sessions: the minimum to attend to finish at target
+    must = np.ceil(p * (total + left) - attended - 1e-9).astype(np.int64)
+    feasible = must <= left
+    must = np.clip(must, 0, left)
+
+    columns = {
+        "percentage": np.round(_percent(attended, total), 2),
+        "can_skip": skippable(attended, total, target),
+        "must_attend": needed(attended, total, target),
+        "remaining": left,
+        "remaining_must_attend": must,
+        "remaining_can_skip": left - must,
+        "reachable": feasible,
+        "best_case": np.round(_percent(attended + left, total + left), 2),
+        "worst_case": np.round(_percent(attended, total + left), 2),
+    }
+    subjects = [
+        dict({"code": r["code"]}, **{k: v[i].item() for k, v in columns.items()})
+        for i, r in enumerate(records)
+    ]
+
+    a, t, l = attended.sum(), total.sum(), left.sum()
+    overall_must = int(np.ceil(p * (t + l) - a - 1e-9))
+    overall = {
+        "attended": int(a),
+        "total": int(t),
+        "percentage": round(float(_percent(a, t)), 2),
+        "can_skip": int(skippable(np.array([a]), np.array([t]), target)[0]),
+        "must_attend": int(needed(np.array([a]), np.array([t]), target)[0]),
+        "remaining": int(l),
+        "remaining_must_attend": min(max(overall_must, 0), int(l)),
+        "reachable": bool(overall_must <= l),
+        "best_case": round(float(_percent(a + l, t + l)), 2),
+        "worst_case": round(float(_percent(a, t + l)), 2),
+    }
+    return {"target": target, "subjects": subjects, "overall": overall}
+
+
+def simulate_batch(students, remaining, attend_prob=0.8, target=DEFAULT_TARGET, runs=2000, seed=None):
+    """Monte Carlo over many students at once.
+
+    `students` is a list of record lists. Subject lists are padded into one
+    (students, subjects) matrix; every run draws attended-of-remaining per
+    subject from Binomial(remaining, attend_prob). Returns, per student, the
+    probability of finishing at/above target overall and per subject, plus
+    the 5th/50th/95th percentile of the final overall percentage.
+    """
+    width = max((len(s) for s in students), default=0)
+    shape = (len(students), width)
+    per_run = max(1, shape[0] * shape[1])
+    if per_run > MAX_ELEMENTS:
+        raise ValueError(f"too many students x subjects (at most {MAX_ELEMENTS})")
+    # Fewer runs rather than more memory than the host has
+    runs = max(1, min(int(runs), MAX_RUNS, MAX_ELEMENTS // per_run))
+    attended = np.zeros(shape, dtype=np.int64)
+    total = np.zeros(shape, dtype=np.int64)
+    left = np.zeros(shape, dtype=np.int64)
+    mask = np.zeros(shape, dtype=bool)
+    for i, records in enumerate(students):
+        n = len(records)
+        if not n:
+            continue
+        attended[i, :n], total[i, :n] = _arrays(records)
+        left[i, :n] = _remaining(records, remaining)
+        mask[i, :n] = True
+
+    rng = np.random.default_rng(seed)
+    # (runs, students, subjects)
+    draws = rng.binomial(left.astype(np.int32), np.clip(attend_prob, 0, 1), size=(runs,) + shape).astype(np.int32)
+    final_att = attended.astype(np.int32) + draws
+    final_tot = total + left
+
+    # Compare without dividing: attended * 100 >= target * total
+    subject_ok = (final_att * 100 >= target * final_tot) & mask
+    overall_pct = _percent(final_att.sum(axis=2), final_tot.sum(axis=1))
+
+    p_subject = subject_ok.mean(axis=0)
+    p_overall = (overall_pct >= target).mean(axis=0)
+    quantiles = np.percentile(overall_pct, [5, 50, 95], axis=0)
+
+    results = []
+    for i, records in enumerate(students):
+        results.append({
+            "p_overall_at_target": round(float(p_overall[i]), 4),
+            "overall_percentile": {
+                "p5": round(float(quantiles[0, i]), 2),
+                "p50": round(float(quantiles[1, i]), 2),
+                "p95": round(float(quantiles[2, i]), 2),
+            },
+            "subjects": [
+                {"code": r["code"], "p_at_target": round(float(p_subject[i, j]), 4)}
+                for j, r in enumerate(records)
+            ],
+        })
+    return {"target": target, "attend_prob": attend_prob, "runs": runs, "students": results}
+
+
+def simulate(records, remaining, attend_prob=0.8, target=DEFAULT_TARGET, runs=2000, seed=None):
+    """simulate_batch() for a single student."""
+    result = simulate_batch([records], remaining, attend_prob, target, runs, seed)
+    return dict(result["students"][0], target=target, attend_prob=attend_prob, runs=result["runs"])
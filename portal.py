@@ -0,0 +1,189 @@
+import os
+
+from attendance_parser import parse_text
+from blocking import install_blocking
+from grid_extract import extract_grid
+from health import upstream
+from readiness import PhaseTimer, XhrTracker, wait_for_attendance
+
+PORTAL_URL = os.environ.get("PORTAL_URL", "http://mitsims.in/")
+
+NAV_TIMEOUT_MSG = "The MITS server is taking too long to respond. Please try after some time."
+CONN_TIMEOUT_MSG = "Connection timed out. Please try after some time."
+LOGIN_TIMEOUT_MSG = "Login failed or timed out. Please check your credentials and try after some time."
+INVALID_CREDS_MSG = "Invalid Registration Number or Password"
+GENERIC_MSG = "Something went wrong. Please try after some time."
+NOT_LOADED_MSG = "The attendance list did not load. Please try after some time."
+
+FORCE_SUBMIT_JS = "if(document.querySelector('#studentForm')) document.querySelector('#studentForm').submit();"
+
+# Login-flow selectors, shared by every browser engine
+STUDENT_LINK = "#studentLink"
+USERNAME_INPUT = "#studentForm #inputStuId"
+PASSWORD_INPUT = "#studentForm #inputPassword"
+SUBMIT_BUTTON = "#studentSubmitButton"
+DASHBOARD = "#studentName"
+ERROR_DIV = "#studentErrorDiv"
+DASHBOARD_OR_ERROR = f"{DASHBOARD}, {ERROR_DIV}"
+DASHBOARD_OR_LOGIN = f"{DASHBOARD}, {STUDENT_LINK}"
+
+
+class PortalError(Exception):
+    """A user-facing scrape failure with the HTTP status the API should return."""
+
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def classify_error(e):
+    """Map an unexpected Playwright exception onto a PortalError."""
+    if isinstance(e, PortalError):
+        return e
+    err_msg = str(e)
+    if "Target page, context or browser has been closed" in err_msg or "Timeout" in err_msg:
+        return PortalError(CONN_TIMEOUT_MSG, 504)
+    return PortalError(GENERIC_MSG, 500)
+
+
+def login_error(err_text):
+    """PortalError for the text shown in #studentErrorDiv."""
+    # Mask technical errors with user-friendly message
+    if any(kw in err_text.lower() for kw in ["invalid", "wrong", "mismatch", "incorrect"]):
+        return PortalError(INVALID_CREDS_MSG, 401)
+    return PortalError(err_text, 401)
+
+
+def require_records(report):
+    """`report`, or a PortalError when the grid never filled.
+
+    An empty dashboard means the attendance store didn't load in time; it
+    must not reach the cache or the history store as a success.
+    """
+    if not report.records:
+        raise PortalError(NOT_LOADED_MSG, 504)
+    return report
+
+
+def no_progress(phase):
+    pass
+
+
+def login(page, username, password, progress=no_progress, timer=None):
+    """Steps 2-5 of the flow: open the login form, submit and check the result."""
+    # 2. Open Login Form
+    progress("logging_in")
+    try:
+        page.wait_for_selector(STUDENT_LINK, state="visible", timeout=upstream.timeout_ms("selector", 15000))
+        page.click(STUDENT_LINK, force=True)
+        page.wait_for_selector(USERNAME_INPUT, state="visible",
+                               timeout=upstream.timeout_ms("selector", 15000))
+    except Exception:
+        raise PortalError(CONN_TIMEOUT_MSG, 504)
+    if timer:
+        timer.mark("open_login")
+
+    # 3. Submit Credentials
+    page.fill(USERNAME_INPUT, username)
+    page.fill(PASSWORD_INPUT, password)
+    page.click(SUBMIT_BUTTON, force=True)
+
+    # 4. Wait for Dashboard or Error
+    try:
+        page.wait_for_selector(DASHBOARD_OR_ERROR, timeout=10000)
+    except:
+        if timer:
+            timer.mark("login")
+        # Fallback: force submit if click didn't trigger
+        try:
+            page.evaluate(FORCE_SUBMIT_JS)
+            page.wait_for_selector(DASHBOARD_OR_ERROR, timeout=12000)
+        except Exception:
+            raise PortalError(LOGIN_TIMEOUT_MSG, 401)
+        if timer:
+            timer.mark("force_submit")
+    else:
+        if timer:
+            timer.mark("login")
+
+    # 5. Check for specific error message
+    error_div = page.query_selector(ERROR_DIV)
+    if error_div:
+        err_text = ""
+        try:
+            err_text = error_div.inner_text().strip()
+        except:
+            pass
+        if err_text:
+            raise login_error(err_text)
+
+    # Verify if dashboard actually loaded
+    if not page.query_selector(DASHBOARD):
+        raise PortalError(INVALID_CREDS_MSG, 401)
+
+
+def session_alive(page):
+    """After navigating with restored storage state: True if the portal went
+    straight to the dashboard, False if it bounced us to the login form."""
+    try:
+        page.wait_for_selector(DASHBOARD_OR_LOGIN, state="visible",
+                               timeout=upstream.timeout_ms("selector", 15000))
+    except Exception:
+        return False
+    return page.query_selector(DASHBOARD) is not None
+
+
+def read_dashboard(context, username, password, progress=no_progress, resume=False):
+    """Log in with the given BrowserContext and read the dashboard.
+
+    Returns `(report, meta)`: an attendance_parser.Report and meta holding
+    per-phase timings in ms, how the grid was judged ready and whether the
+    records came from the structured grid or the body-text fallback. `progress` is called with
+    "navigating", "logging_in" and "extracting" as the flow advances.
+
+    With `resume=True` the context carries a stored portal session; the
+    login steps are skipped unless the portal shows the login form again.
+    meta["session"] is then "reused" or "expired" ("new" otherwise).
+    """
+    timer = PhaseTimer()
+    blocked = install_blocking(context)
+    page = context.new_page()
+    tracker = XhrTracker(page)
+
+    # 1. Navigation
+    progress("navigating")
+    try:
+        page.goto(PORTAL_URL, timeout=upstream.timeout_ms("navigate", 45000))
+    except Exception:
+        raise PortalError(NAV_TIMEOUT_MSG, 504)
+    timer.mark("navigate")
+
+    session = "new"
+    if resume:
+        session = "reused" if session_alive(page) else "expired"
+        timer.mark("resume")
+
+    if session != "reused":
+        login(page, username, password, progress, timer)
+
+    # 6. Wait for the attendance store to load, then extract
+    progress("extracting")
+    ready = wait_for_attendance(page, tracker)
+    timer.mark("ready_wait")
+    report = extract_grid(page)
+    extraction = "grid"
+    if report is None:
+        report = parse_text(page.inner_text("body"))
+        extraction = "text"
+    require_records(report)
+    timer.mark("extract")
+
+    return report, {
+        "ready": ready,
+        "extraction": extraction,
+        "session": session,
+        "blocking": blocked.to_dict(),
+        "timings_ms": timer.timings,
+        "total_ms": timer.total()
+    }
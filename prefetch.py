@@ -0,0 +1,287 @@
+"""Background prefetcher for students who opted in.
+
+Runs inside the web process (PREFETCH_ENABLED=1) or on its own next to it:
+
+    python prefetch.py
+
+Due subscriptions are refreshed with jitter under a global requests-per-
+minute budget, and the whole scheduler backs off while the portal times
+out (the 504 paths) or the circuit breaker is open. Results land in the history store, and in the result
+cache too when running in-process, so interactive requests find fresh data.
+
+Any number of prefetchers (one per web worker, plus `python prefetch.py`)
+can share a HISTORY_DB: each due subscription is claimed by exactly one of
+them, and the rate budget is kept in the database rather than per process.
+They must all use the same PREFETCH_KEY.
+"""
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from cryptography.fernet import Fernet, InvalidToken
+
+import history
+
+PREFETCH_ENABLED = os.environ.get("PREFETCH_ENABLED", "0") == "1"
+PREFETCH_INTERVAL = int(os.environ.get("PREFETCH_INTERVAL", "3600"))
+# Refresh intervals a subscriber may ask for (others are clamped to these)
+MIN_INTERVAL = 300
+MAX_INTERVAL = 30 * 86400
+PREFETCH_JITTER = float(os.environ.get("PREFETCH_JITTER", "0.2"))
+PREFETCH_RATE_PER_MIN = float(os.environ.get("PREFETCH_RATE_PER_MIN", "6"))
+PREFETCH_BACKOFF_MAX = int(os.environ.get("PREFETCH_BACKOFF_MAX", "1800"))
+# Data prefetched within this many seconds is served instead of scraping
+PREFETCH_FRESH = int(os.environ.get("PREFETCH_FRESH", "900"))
+# A claimed subscription whose prefetcher died is picked up again after this long
+PREFETCH_CLAIM_S = int(os.environ.get("PREFETCH_CLAIM_S", "600"))
+# Fernet key for stored passwords, shared by every process using the same
+# HISTORY_DB; required to subscribe or run the prefetcher
+PREFETCH_KEY = os.environ.get("PREFETCH_KEY", "")
+
+NOT_CONFIGURED_MSG = "Background refresh is not available on this server."
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscriptions (
+    student TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    secret BLOB NOT NULL,
+    interval INTEGER NOT NULL,
+    next_run REAL NOT NULL,
+    failures INTEGER NOT NULL DEFAULT 0,
+    last_status INTEGER,
+    last_success REAL
+);
+CREATE INDEX IF NOT EXISTS subscriptions_next_run ON subscriptions (next_run);
+CREATE TABLE IF NOT EXISTS prefetch_budget (
+    name TEXT PRIMARY KEY,
+    next_slot REAL NOT NULL
+);
+"""
+
+
+def check_interval(interval):
+    """A subscriber's `interval` as whole seconds (None for the default); raises ValueError if not a number."""
+    if interval is None:
+        return None
+    if isinstance(interval, bool) or not isinstance(interval, (int, float, str)):
+        raise ValueError("interval must be a number of seconds")
+    try:
+        seconds = float(interval)
+    except ValueError:
+        raise ValueError("interval must be a number of seconds")
+    if not math.isfinite(seconds):
+        raise ValueError("interval must be a number of seconds")
+    return int(seconds)
+
+
+def jittered(seconds):
+    return seconds * random.uniform(1 - PREFETCH_JITTER, 1 + PREFETCH_JITTER)
+
+
+class Prefetcher:
+    def __init__(self, fetch, path=None, key=PREFETCH_KEY, rate_per_min=PREFETCH_RATE_PER_MIN):
+        """`fetch(username, password)` -> (payload, status_code)."""
+        self.fetch = fetch
+        self.path = path or history.HISTORY_DB
+        # Without a shared key, processes would store passwords the others can't read
+        self.configured = bool(key)
+        self._fernet = Fernet(key.encode()) if key else None
+        self.rate_per_min = rate_per_min
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._thread = None
+        self.backoff = 0
+        self.paused_until = 0
+        self.stats = {"runs": 0, "ok": 0, "timeouts": 0, "throttled": 0, "errors": 0}
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+            columns = {r["name"] for r in conn.execute("PRAGMA table_info(subscriptions)")}
+            if "last_success" not in columns:
+                conn.execute("ALTER TABLE subscriptions ADD COLUMN last_success REAL")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    # --- subscriptions ---
+
+    def subscribe(self, username, password, interval=None):
+        if not self.configured:
+            raise RuntimeError("PREFETCH_KEY is not set")
+        interval = min(MAX_INTERVAL, max(MIN_INTERVAL, check_interval(interval) or PREFETCH_INTERVAL))
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO subscriptions (student, username, secret, interval, next_run) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (student) DO UPDATE SET username = excluded.username, secret = excluded.secret, "
+                "interval = excluded.interval, next_run = excluded.next_run, failures = 0",
+                (history.student_id(username), username, self._fernet.encrypt(password.encode()),
+                 interval, time.time() + jittered(interval)))
+        return interval
+
+    def unsubscribe(self, username, password):
+        if not self.configured:
+            return False
+        row = self._conn().execute("SELECT secret FROM subscriptions WHERE student = ?",
+                                   (history.student_id(username),)).fetchone()
+        if not row or self._password(row) != password:
+            return False
+        with self._conn() as conn:
+            conn.execute("DELETE FROM subscriptions WHERE student = ?", (history.student_id(username),))
+        return True
+
+    def _password(self, row):
+        try:
+            return self._fernet.decrypt(row["secret"]).decode()
+        except InvalidToken:
+            return None
+
+    def prefetched_payload(self, username, password, max_age=PREFETCH_FRESH):
+        """Stored attendance of a subscribed student whose last prefetch is recent, or None."""
+        if max_age <= 0 or not self.configured:
+            return None
+        row = self._conn().execute("SELECT last_success FROM subscriptions WHERE student = ?",
+                                   (history.student_id(username),)).fetchone()
+        if not row or not row["last_success"] or time.time() - row["last_success"] > max_age:
+            return None
+        payload = history.stored_payload(username, password, max_age)
+        if payload:
+            payload["meta"]["prefetched_at"] = row["last_success"]
+        return payload
+
+    # --- scheduling ---
+
+    def run_due(self, now=None):
+        """Refresh every due subscription this process can claim; returns how many ran."""
+        now = now or time.time()
+        if now < self.paused_until:
+            return 0
+        due = self._conn().execute("SELECT * FROM subscriptions WHERE next_run <= ? ORDER BY next_run",
+                                   (now,)).fetchall()
+        ran = 0
+        for row in due:
+            if self._stop.is_set() or time.time() < self.paused_until:
+                break
+            if not self._claim(row):
+                continue
+            self._run_one(row)
+            ran += 1
+        return ran
+
+    def _claim(self, row):
+        """Move the row's next_run forward unless another prefetcher already did."""
+        with self._conn() as conn:
+            cur = conn.execute("UPDATE subscriptions SET next_run = ? WHERE student = ? AND next_run = ?",
+                               (time.time() + PREFETCH_CLAIM_S, row["student"], row["next_run"]))
+        return cur.rowcount == 1
+
+    def _wait_for_budget(self):
+        """Take the next slot of the requests-per-minute budget shared through the database."""
+        if self.rate_per_min <= 0:
+            return
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT next_slot FROM prefetch_budget WHERE name = 'portal'").fetchone()
+            slot = max(now, row["next_slot"] if row else 0)
+            conn.execute("INSERT OR REPLACE INTO prefetch_budget (name, next_slot) VALUES ('portal', ?)",
+                         (slot + 60.0 / self.rate_per_min,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        self._stop.wait(slot - now)
+
+    def _run_one(self, row):
+        password = self._password(row)
+        if password is None:
+            # Stored under another PREFETCH_KEY: leave it for a process that has
+            # the right key (or a fixed configuration) instead of deleting it
+            print(f"Prefetch: cannot decrypt the subscription for {row['username']}; is PREFETCH_KEY shared?")
+            return
+
+        self._wait_for_budget()
+        self.stats["runs"] += 1
+        try:
+            payload, status = self.fetch(row["username"], password)
+            if status == 200 and payload.get("degraded"):
+                # Last known data served while the breaker is open
+                status = 503
+        except Exception as e:
+            print(f"Prefetch crashed for {row['username']}: {e}")
+            status = 500
+
+        failures = 0
+        last_success = row["last_success"]
+        next_run = time.time() + jittered(row["interval"])
+        if status == 200:
+            self.stats["ok"] += 1
+            self.backoff = 0
+            last_success = time.time()
+        elif status == 429:
+            # Interactive traffic has the slots (or the student was just
+            # refreshed): not a failure, come back when admission says so
+            self.stats["throttled"] += 1
+            next_run = time.time() + payload.get("retry_after", 60)
+        elif status in (503, 504):
+            # Portal is struggling: pause everything, exponentially
+            self.stats["timeouts"] += 1
+            self.backoff = min(PREFETCH_BACKOFF_MAX, max(60, self.backoff * 2))
+            self.paused_until = time.time() + jittered(self.backoff)
+            failures = row["failures"] + 1
+            next_run = self.paused_until
+        else:
+            self.stats["errors"] += 1
+            failures = row["failures"] + 1
+
+        with self._conn() as conn:
+            if status == 401:
+                # Password changed or wrong: stop using it
+                conn.execute("DELETE FROM subscriptions WHERE student = ?", (row["student"],))
+            else:
+                conn.execute("UPDATE subscriptions SET next_run = ?, failures = ?, last_status = ?, last_success = ? "
+                             "WHERE student = ?", (next_run, failures, status, last_success, row["student"]))
+
+    def loop(self, tick=5):
+        if not self.configured:
+            raise RuntimeError("PREFETCH_KEY must be set to run the prefetcher")
+        while not self._stop.is_set():
+            try:
+                self.run_due()
+            except Exception as e:
+                print(f"Prefetch loop error: {e}")
+            self._stop.wait(tick)
+
+    def start(self):
+        if not self.configured:
+            raise RuntimeError("PREFETCH_KEY must be set when PREFETCH_ENABLED=1")
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.loop, name="prefetcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        pending = self._conn().execute("SELECT COUNT(*) FROM subscriptions").fetchone()[0]
+        return dict(self.stats, subscriptions=pending, backoff_s=self.backoff,
+                    paused_for_s=max(0, round(self.paused_until - time.time())))
+
+
+if __name__ == "__main__":
+    import sys
+
+    import engine
+
+    if not PREFETCH_KEY:
+        sys.exit("PREFETCH_KEY must be set (the same Fernet key as the web service).")
+    print("Starting attendance prefetcher...")
+    Prefetcher(lambda u, p: engine.fetch_payload(u, p, record=True)).loop()
@@ -0,0 +1,129 @@
+import os
+import time
+
+# Upper bound for waiting on the attendance grid once the dashboard is up
+READY_TIMEOUT_MS = int(os.environ.get("READY_TIMEOUT_MS", "10000"))
+# Rows must stay unchanged (with no XHR in flight) this long to count as loaded
+STABLE_MS = int(os.environ.get("READY_STABLE_MS", "400"))
+POLL_MS = 100
+
+# Counts attendance data rows: ExtJS grid rows, else table rows with numeric
+# cells (never the header row, which is on the page before the store has
+# loaded), else numeric lines in the body text for layouts without a grid.
+COUNT_ROWS_JS = """() => {
+    const grid = document.querySelectorAll('.x-grid-row, .x-grid3-row, .x-grid-item');
+    if (grid.length) return grid.length;
+    const rows = Array.from(document.querySelectorAll('table tr')).filter(tr =>
+        !tr.querySelector('th') && Array.from(tr.querySelectorAll('td')).some(td => /\\d/.test(td.textContent)));
+    if (rows.length) return rows.length;
+    const m = document.body.innerText.match(/^\\s*[\\d.]+%?\\s*$/gm);
+    return m ? m.length : 0;
+}"""
+
+
+class XhrTracker:
+    """Keeps count of the data XHRs (ExtJS store loads) a page has in flight.
+
+    Must be attached before login is submitted so the dashboard's store
+    requests are seen from the start.
+    """
+
+    def __init__(self, page):
+        self.inflight = 0
+        page.on("request", self._started)
+        page.on("requestfinished", self._done)
+        page.on("requestfailed", self._done)
+
+    @staticmethod
+    def _is_data(request):
+        return request.resource_type in ("xhr", "fetch")
+
+    def _started(self, request):
+        if self._is_data(request):
+            self.inflight += 1
+
+    def _done(self, request):
+        if self._is_data(request):
+            self.inflight = max(0, self.inflight - 1)
+
+
+class _Stability:
+    """The readiness rule, fed one poll at a time by the sync and async loops."""
+
+    def __init__(self, timeout_ms=None):
+        timeout_ms = READY_TIMEOUT_MS if timeout_ms is None else timeout_ms
+        self.deadline = time.monotonic() + timeout_ms / 1000
+        self.last_count = -1
+        self.stable_since = None
+
+    def running(self):
+        return time.monotonic() < self.deadline
+
+    def settled(self, count, pending):
+        """True once rows are present, nothing is pending and the count held for STABLE_MS."""
+        now = time.monotonic()
+        if count != self.last_count or pending:
+            self.last_count = count
+            self.stable_since = now
+            return False
+        return count > 0 and (now - self.stable_since) * 1000 >= STABLE_MS
+
+
+def wait_until_stable(count_rows, pause, pending=lambda: 0, timeout_ms=None):
+    """Poll `count_rows()` until the attendance rows are populated and stable.
+
+    Driver-agnostic core of the readiness stage: `pause(ms)` sleeps between
+    polls and `pending()` reports data requests still in flight. Returns
+    "stable" when nothing is pending and the row count has not changed for
+    STABLE_MS, or "timeout" when the upper bound was hit (the caller still
+    reads whatever is on the page).
+    """
+    check = _Stability(timeout_ms)
+    while check.running():
+        try:
+            count = count_rows()
+        except Exception:
+            count = 0
+        if check.settled(count, pending()):
+            return "stable"
+        pause(POLL_MS)
+    return "timeout"
+
+
+def wait_for_attendance(page, tracker, timeout_ms=None):
+    """wait_until_stable() for a Playwright page, counting the tracker's XHRs."""
+    # wait_for_timeout keeps Playwright's event loop pumping so the
+    # tracker sees request/response events between polls
+    return wait_until_stable(lambda: page.evaluate(COUNT_ROWS_JS), page.wait_for_timeout,
+                             lambda: tracker.inflight, timeout_ms)
+
+
+async def wait_for_attendance_async(page, tracker, timeout_ms=None):
+    """wait_for_attendance() for a playwright.async_api Page."""
+    check = _Stability(timeout_ms)
+    while check.running():
+        try:
+            count = await page.evaluate(COUNT_ROWS_JS)
+        except Exception:
+            count = 0
+        if check.settled(count, tracker.inflight):
+            return "stable"
+        await page.wait_for_timeout(POLL_MS)
+    return "timeout"
+
+
+class PhaseTimer:
+    """Collects per-phase wall-clock durations in milliseconds."""
+
+    def __init__(self):
+        self.timings = {}
+        self._start = time.perf_counter()
+        self._last = self._start
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.timings[phase] = round((now - self._last) * 1000, 1)
+        self._last = now
+
+    def total(self):
+        return round((time.perf_counter() - self._start) * 1000, 1)
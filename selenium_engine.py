@@ -0,0 +1,196 @@
+"""Selenium engine: the same login / readiness / extraction / parsing stages
+as the Playwright engines, driven through WebDriver.
+
+Used by the CLI (attendance_script.py) where a local Chrome + chromedriver is
+easier to come by than Playwright's Chromium. The chromedriver path is
+resolved once and cached on disk instead of running ChromeDriverManager on
+every start.
+"""
+import json
+import os
+import shutil
+import time
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from attendance_parser import parse_text
+from browser_pool import LAUNCH_ARGS
+from grid_extract import GRID_JS, report_from_grid
+from health import upstream
+from portal import (PORTAL_URL, NAV_TIMEOUT_MSG, CONN_TIMEOUT_MSG, LOGIN_TIMEOUT_MSG, INVALID_CREDS_MSG,
+                    FORCE_SUBMIT_JS, STUDENT_LINK, USERNAME_INPUT, PASSWORD_INPUT, SUBMIT_BUTTON,
+                    DASHBOARD, ERROR_DIV, DASHBOARD_OR_ERROR, DASHBOARD_OR_LOGIN, PortalError,
+                    login_error, no_progress, require_records)
+from readiness import COUNT_ROWS_JS, PhaseTimer, wait_until_stable
+
+DRIVER_CACHE = os.environ.get(
+    "CHROMEDRIVER_CACHE",
+    os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "mits-ims", "chromedriver.json"))
+
+
+def chromedriver_path():
+    """CHROMEDRIVER, else the cached path, else chromedriver on PATH, else
+    ChromeDriverManager (once; the result is cached for the next run)."""
+    configured = os.environ.get("CHROMEDRIVER")
+    if configured:
+        return configured
+    try:
+        with open(DRIVER_CACHE) as f:
+            cached = json.load(f).get("path")
+        if cached and os.access(cached, os.X_OK):
+            return cached
+    except (OSError, ValueError):
+        pass
+
+    path = shutil.which("chromedriver")
+    if path is None:
+        from webdriver_manager.chrome import ChromeDriverManager
+        path = ChromeDriverManager().install()
+    try:
+        os.makedirs(os.path.dirname(DRIVER_CACHE), exist_ok=True)
+        with open(DRIVER_CACHE, "w") as f:
+            json.dump({"path": path}, f)
+    except OSError:
+        pass
+    return path
+
+
+def open_driver(headless=True):
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+    for arg in LAUNCH_ARGS:
+        options.add_argument(arg)
+    options.add_argument("--window-size=1024,768")
+    # Don't wait for images/fonts before get() returns
+    options.page_load_strategy = "eager"
+    return webdriver.Chrome(service=Service(chromedriver_path()), options=options)
+
+
+def _run_js(driver, fn_source):
+    # GRID_JS / COUNT_ROWS_JS are "() => {...}" expressions (Playwright style)
+    return driver.execute_script(f"return ({fn_source})();")
+
+
+def _click(driver, element):
+    # Like Playwright's force=True: fall back to a DOM click when the element
+    # is covered or not considered interactable
+    try:
+        element.click()
+    except WebDriverException:
+        driver.execute_script("arguments[0].click();", element)
+
+
+def login(driver, username, password, progress=no_progress, timer=None):
+    """portal.login() through WebDriver."""
+    progress("logging_in")
+    wait = WebDriverWait(driver, upstream.timeout_ms("selector", 15000, "selenium") / 1000)
+    try:
+        _click(driver, wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, STUDENT_LINK))))
+        user_field = wait.until(EC.visibility_of_element_located((By.CSS_SELECTOR, USERNAME_INPUT)))
+    except TimeoutException:
+        raise PortalError(CONN_TIMEOUT_MSG, 504)
+    if timer:
+        timer.mark("open_login")
+
+    user_field.clear()
+    user_field.send_keys(username)
+    pass_field = driver.find_element(By.CSS_SELECTOR, PASSWORD_INPUT)
+    pass_field.clear()
+    pass_field.send_keys(password)
+    _click(driver, driver.find_element(By.CSS_SELECTOR, SUBMIT_BUTTON))
+
+    landed = EC.presence_of_element_located((By.CSS_SELECTOR, DASHBOARD_OR_ERROR))
+    try:
+        WebDriverWait(driver, 10).until(landed)
+    except TimeoutException:
+        if timer:
+            timer.mark("login")
+        try:
+            driver.execute_script(FORCE_SUBMIT_JS)
+            WebDriverWait(driver, 12).until(landed)
+        except (TimeoutException, WebDriverException):
+            raise PortalError(LOGIN_TIMEOUT_MSG, 401)
+        if timer:
+            timer.mark("force_submit")
+    else:
+        if timer:
+            timer.mark("login")
+
+    errors = driver.find_elements(By.CSS_SELECTOR, ERROR_DIV)
+    if errors:
+        err_text = (errors[0].text or "").strip()
+        if err_text:
+            raise login_error(err_text)
+
+    if not driver.find_elements(By.CSS_SELECTOR, DASHBOARD):
+        raise PortalError(INVALID_CREDS_MSG, 401)
+
+
+def session_alive(driver):
+    """True if the current page is the dashboard, False if it shows the login link."""
+    try:
+        WebDriverWait(driver, upstream.timeout_ms("selector", 15000, "selenium") / 1000).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, DASHBOARD_OR_LOGIN)))
+    except TimeoutException:
+        return False
+    return bool(driver.find_elements(By.CSS_SELECTOR, DASHBOARD))
+
+
+def read_attendance(driver, progress=no_progress, timer=None):
+    """Readiness + extraction + parsing on an open dashboard; returns (report, ready, extraction)."""
+    progress("extracting")
+    ready = wait_until_stable(lambda: _run_js(driver, COUNT_ROWS_JS), lambda ms: time.sleep(ms / 1000))
+    if timer:
+        timer.mark("ready_wait")
+    report = None
+    try:
+        report = report_from_grid(_run_js(driver, GRID_JS))
+    except WebDriverException:
+        pass
+    extraction = "grid"
+    if report is None:
+        report = parse_text(driver.find_element(By.TAG_NAME, "body").text)
+        extraction = "text"
+    require_records(report)
+    if timer:
+        timer.mark("extract")
+    return report, ready, extraction
+
+
+def navigate(driver, progress=no_progress):
+    progress("navigating")
+    driver.set_page_load_timeout(upstream.timeout_ms("navigate", 45000, "selenium") / 1000)
+    try:
+        driver.get(PORTAL_URL)
+    except (TimeoutException, WebDriverException):
+        raise PortalError(NAV_TIMEOUT_MSG, 504)
+
+
+def fetch(username, password, progress=no_progress, headless=True):
+    """One-shot fetch in a fresh Chrome; same result shape as engine.fetch."""
+    timer = PhaseTimer()
+    try:
+        driver = open_driver(headless)
+    except WebDriverException as e:
+        raise PortalError(f"Could not start Chrome: {e.msg}", 500)
+    timer.mark("browser")
+    try:
+        navigate(driver, progress)
+        timer.mark("navigate")
+        login(driver, username, password, progress, timer)
+        report, ready, extraction = read_attendance(driver, progress, timer)
+    finally:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    meta = {"engine": "selenium", "ready": ready, "extraction": extraction, "session": "new",
+            "timings_ms": timer.timings, "total_ms": timer.total()}
+    return {"student_name": report.student_name, "records": report.records, "meta": meta}
@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from cryptography.fernet import Fernet, InvalidToken
+
+# Logged-in portal sessions (Playwright storage_state) kept per student
+SESSION_TTL = int(os.environ.get("SESSION_TTL", "1800"))
+SESSION_MAX_ENTRIES = int(os.environ.get("SESSION_MAX_ENTRIES", "200"))
+SESSION_MAX_BYTES = int(os.environ.get("SESSION_MAX_BYTES", str(8 * 1024 * 1024)))
+# Optional directory to persist the (encrypted) sessions across restarts.
+# Needs a fixed SESSION_KEY (Fernet key) and CACHE_KEY_SECRET, otherwise
+# files from a previous run can't be read or matched to a student.
+SESSION_DIR = os.environ.get("SESSION_DIR", "")
+SESSION_KEY = os.environ.get("SESSION_KEY", "")
+
+
+class SessionStore:
+    """Encrypted, size-bounded LRU of portal sessions keyed by cache_key()."""
+
+    def __init__(self, ttl=SESSION_TTL, max_entries=SESSION_MAX_ENTRIES,
+                 max_bytes=SESSION_MAX_BYTES, directory=SESSION_DIR, key=SESSION_KEY):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._fernet = Fernet(key.encode() if key else Fernet.generate_key())
+        self._entries = OrderedDict()  # key -> (stored_at, token)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load_dir()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.session")
+
+    def _load_dir(self):
+        files = [f for f in os.listdir(self.directory) if f.endswith(".session")]
+        files.sort(key=lambda f: os.path.getmtime(os.path.join(self.directory, f)))
+        for name in files:
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, "rb") as fh:
+                    token = fh.read()
+                self._fernet.decrypt(token)
+            except (OSError, InvalidToken):
+                self._remove_file(path)
+                continue
+            self._put(name[:-len(".session")], token, os.path.getmtime(path), persist=False)
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _put(self, key, token, stored_at, persist=True):
+        old = self._entries.pop(key, None)
+        if old:
+            self._bytes -= len(old[1])
+        self._entries[key] = (stored_at, token)
+        self._bytes += len(token)
+        if persist and self.directory:
+            tmp = self._path(key) + ".tmp"
+            with open(tmp, "wb") as fh:
+                fh.write(token)
+            os.replace(tmp, self._path(key))
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._bytes -= len(entry[1])
+        if self.directory:
+            self._remove_file(self._path(key))
+
+    def get(self, key):
+        """Return the stored storage_state dict, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[0] > self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            token = entry[1]
+        try:
+            return json.loads(self._fernet.decrypt(token))
+        except (InvalidToken, ValueError):
+            self.invalidate(key)
+            return None
+
+    def save(self, key, state):
+        token = self._fernet.encrypt(json.dumps(state).encode())
+        with self._lock:
+            self._put(key, token, time.time())
+
+    def invalidate(self, key, expired=False):
+        with self._lock:
+            self._drop(key)
+            if expired:
+                self.expired += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                # A stored session the portal had already expired is not a hit
+                "hit_rate": round((self.hits - self.expired) / lookups, 3) if lookups else 0,
+            }
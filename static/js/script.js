@@ -14,18 +14,28 @@ document.addEventListener('DOMContentLoaded', () => {
     const totalConductedEl = document.getElementById('total-conducted');
     const courseList = document.getElementById('course-list');
     const logoutBtn = document.getElementById('logout-btn');
+    const timingInfo = document.getElementById('timing-info');
 
     // Progress Elements
     const progressFill = document.getElementById('progress-fill');
     const progressText = document.getElementById('progress-text');
 
+    // Last payload we rendered, so a revisit can paint it at once
+    const CACHE_KEY = 'mits_payload';
+
     // Auto-Login Check
     const storedUser = localStorage.getItem('mits_user');
     const storedPass = localStorage.getItem('mits_pass');
     
     if (storedUser && storedPass) {
-        // Auto-login
-        fetchAttendance(storedUser, storedPass);
+        // Auto-login: show the saved report right away and check for changes behind it
+        const cached = loadCached(storedUser);
+        if (cached) {
+            showDashboard(storedUser, cached);
+            revalidate(storedUser, storedPass, false);
+        } else {
+            fetchAttendance(storedUser, storedPass);
+        }
     }
 
     loginForm.addEventListener('submit', async (e) => {
@@ -35,7 +45,7 @@ document.addEventListener('DOMContentLoaded', () => {
         fetchAttendance(username, password);
     });
 
-    async function fetchAttendance(username, password) {
+    async function fetchAttendance(username, password, refresh = false) {
         // UI Transition
         loginSection.classList.add('hidden');
         loadingSection.classList.remove('hidden');
@@ -47,47 +57,19 @@ document.addEventListener('DOMContentLoaded', () => {
         errorMsg.classList.remove('error-visible');
         errorMsg.textContent = '';
         
-        // Progress Animation
-        progressFill.style.width = '10%';
-        progressText.textContent = "Connecting to MITS Portal...";
-        
-        // Simulated progress updates
-        setTimeout(() => {
-            progressFill.style.width = '45%';
-            progressText.textContent = "Logging securely...";
-        }, 2000);
-        
-        setTimeout(() => {
-            progressFill.style.width = '85%';
-            progressText.textContent = "Analyzing attendance records...";
-        }, 6000);
+        // Progress follows the server-side job phases
+        setProgress('queued');
 
         try {
-            const response = await fetch('/api/attendance', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ username, password }),
-            });
-
-            const result = await response.json();
-
-            if (!response.ok) {
-                throw new Error(result.error || 'Failed to fetch attendance');
-            }
+            const result = await runAttendanceJob(username, password, refresh);
 
             // Save Credentials
             localStorage.setItem('mits_user', username);
             localStorage.setItem('mits_pass', password);
+            saveCached(username, result);
 
-            // Update User Profile
-            displayName.textContent = result.student_name || "";
-            displayId.textContent = username;
-
-            renderDashboard(result.data);
-            
-            // Switch Views
-            loginWrapper.style.display = 'none'; // Hide entire login wrapper
-            dashboardSection.classList.remove('hidden');
+            showDashboard(username, result);
+            showTimings(result.serverTiming || timingsFromResult(result));
 
         } catch (error) {
             loadingSection.classList.add('hidden');
@@ -101,7 +83,204 @@ document.addEventListener('DOMContentLoaded', () => {
             if (error.message.includes('Login failed') || error.message.includes('401')) {
                 localStorage.removeItem('mits_user');
                 localStorage.removeItem('mits_pass');
+                localStorage.removeItem(CACHE_KEY);
+            }
+        }
+    }
+
+    function showDashboard(username, result) {
+        // Update User Profile
+        displayName.textContent = result.student_name || "";
+        displayId.textContent = username;
+
+        renderDashboard(result.data);
+
+        // Switch Views
+        loginWrapper.style.display = 'none'; // Hide entire login wrapper
+        loadingSection.classList.add('hidden');
+        dashboardSection.classList.remove('hidden');
+    }
+
+    function loadCached(username) {
+        try {
+            const cached = JSON.parse(localStorage.getItem(CACHE_KEY));
+            return cached && cached.username === username ? cached : null;
+        } catch (e) {
+            return null;
+        }
+    }
+
+    function saveCached(username, result) {
+        if (!result.version) return;
+        localStorage.setItem(CACHE_KEY, JSON.stringify({
+            username,
+            version: result.version,
+            student_name: result.student_name,
+            data: result.data,
+        }));
+    }
+
+    // Rows changed since the cached version replace theirs; new ones go last
+    function applyDelta(cached, delta) {
+        const changed = new Map(delta.changed.map(row => [row.code, row]));
+        const data = cached.data
+            .filter(row => !delta.removed.includes(row.code))
+            .map(row => changed.get(row.code) || row);
+        const known = new Set(data.map(row => row.code));
+        delta.changed.forEach(row => { if (!known.has(row.code)) data.push(row); });
+        return data;
+    }
+
+    // Asks the API whether the cached report is still current while it stays
+    // on screen: 304 keeps it, a delta patches it, a full payload replaces it.
+    async function revalidate(username, password, refresh) {
+        const cached = loadCached(username);
+        if (!cached) return fetchAttendance(username, password, refresh);
+
+        showTimings([['checking for updates', null, '…']]);
+        try {
+            const response = await fetch('/api/attendance', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json', 'If-None-Match': `W/"${cached.version}"` },
+                body: JSON.stringify({ username, password, refresh, since: cached.version }),
+            });
+            const serverTiming = parseServerTiming(response.headers.get('Server-Timing'));
+            if (response.status === 304) {
+                showTimings(serverTiming || [['up to date', null, 'no changes']]);
+                return;
+            }
+            const result = await response.json();
+            if (!response.ok) {
+                if (response.status === 401) return forgetLogin(result.error || 'Login failed');
+                showTimings([['showing saved data', null, result.error || 'refresh failed']]);
+                return;
+            }
+            if (result.delta) {
+                result.data = applyDelta(cached, result.delta);
+            }
+            saveCached(username, result);
+            showDashboard(username, result);
+            showTimings(serverTiming || timingsFromResult(result));
+        } catch (error) {
+            showTimings([['showing saved data', null, 'offline']]);
+        }
+    }
+
+    function forgetLogin(message) {
+        localStorage.removeItem('mits_user');
+        localStorage.removeItem('mits_pass');
+        localStorage.removeItem(CACHE_KEY);
+
+        dashboardSection.classList.add('hidden');
+        loadingSection.classList.add('hidden');
+        loginWrapper.style.display = 'flex';
+        loginSection.classList.remove('hidden');
+        if (message) {
+            errorMsg.textContent = message;
+            errorMsg.classList.add('error-visible');
+            errorMsg.classList.remove('error-hidden');
+        }
+    }
+
+    const PHASE_PROGRESS = {
+        queued: ['10%', 'Waiting for a free slot...'],
+        navigating: ['25%', 'Connecting to MITS Portal...'],
+        logging_in: ['50%', 'Logging securely...'],
+        extracting: ['85%', 'Analyzing attendance records...'],
+    };
+
+    function setProgress(phase) {
+        const step = PHASE_PROGRESS[phase];
+        if (!step) return;
+        progressFill.style.width = step[0];
+        progressText.textContent = step[1];
+    }
+
+    // Starts a scrape job and resolves with its result payload.
+    // Uses Server-Sent Events when available and falls back to polling.
+    async function runAttendanceJob(username, password, refresh) {
+        const response = await fetch('/api/attendance/jobs', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ username, password, refresh }),
+        });
+        const job = await response.json();
+        if (!response.ok) {
+            throw new Error(job.error || 'Failed to fetch attendance');
+        }
+
+        const final = window.EventSource
+            ? await waitWithEvents(job.events_url).catch(() => waitWithPolling(job.status_url))
+            : await waitWithPolling(job.status_url);
+
+        if (final.status_code >= 400) {
+            throw new Error((final.result && final.result.error) || 'Failed to fetch attendance');
+        }
+        return Object.assign({}, final.result, { serverTiming: final.serverTiming });
+    }
+
+    // "navigate;dur=812.4, login;dur=2301" -> [['navigate', 812.4], ...]
+    function parseServerTiming(header) {
+        if (!header) return null;
+        return header.split(',').map(entry => {
+            const [name, ...params] = entry.trim().split(';');
+            const dur = params.find(p => p.trim().startsWith('dur='));
+            const desc = params.find(p => p.trim().startsWith('desc='));
+            return [name, dur ? parseFloat(dur.split('=')[1]) : null, desc ? desc.split('=')[1].replace(/"/g, '') : null];
+        });
+    }
+
+    // EventSource can't read headers; the result's meta carries the same numbers
+    function timingsFromResult(result) {
+        const cache = result.cache && result.cache.status;
+        if (cache === 'hit' || cache === 'stale') return [['cache', null, cache]];
+        const meta = result.meta;
+        if (!meta || !meta.timings_ms) return null;
+        const entries = Object.entries(meta.timings_ms).map(([name, ms]) => [name, ms, null]);
+        if (meta.total_ms != null) entries.push(['total', meta.total_ms, null]);
+        return entries;
+    }
+
+    function showTimings(entries) {
+        if (!timingInfo) return;
+        if (!entries || !entries.length) {
+            timingInfo.classList.add('hidden');
+            return;
+        }
+        timingInfo.textContent = entries
+            .map(([name, ms, desc]) => ms != null ? `${name} ${(ms / 1000).toFixed(2)}s` : `${name}: ${desc}`)
+            .join(' · ');
+        timingInfo.classList.remove('hidden');
+    }
+
+    function waitWithEvents(url) {
+        return new Promise((resolve, reject) => {
+            const source = new EventSource(url);
+            source.addEventListener('phase', (e) => setProgress(JSON.parse(e.data).phase));
+            source.addEventListener('result', (e) => {
+                source.close();
+                resolve(JSON.parse(e.data));
+            });
+            source.onerror = () => {
+                source.close();
+                reject(new Error('Event stream interrupted'));
+            };
+        });
+    }
+
+    async function waitWithPolling(url) {
+        while (true) {
+            const response = await fetch(url);
+            const status = await response.json();
+            if (!response.ok) {
+                throw new Error(status.error || 'Failed to fetch attendance');
+            }
+            setProgress(status.phase);
+            if (status.phase === 'done' || status.phase === 'failed') {
+                status.serverTiming = parseServerTiming(response.headers.get('Server-Timing'));
+                return status;
             }
+            await new Promise(r => setTimeout(r, 1000));
         }
     }
 
@@ -109,6 +288,7 @@ document.addEventListener('DOMContentLoaded', () => {
         // Clear Storage
         localStorage.removeItem('mits_user');
         localStorage.removeItem('mits_pass');
+        localStorage.removeItem(CACHE_KEY);
         
         dashboardSection.classList.add('hidden');
         loginWrapper.style.display = 'flex'; // Restore wrapper
@@ -125,7 +305,7 @@ document.addEventListener('DOMContentLoaded', () => {
         refreshBtn.addEventListener('click', () => {
              const u = localStorage.getItem('mits_user');
              const p = localStorage.getItem('mits_pass');
-             if(u && p) fetchAttendance(u, p);
+             if(u && p) revalidate(u, p, true);
         });
     }
 
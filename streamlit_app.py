@@ -1,9 +1,19 @@
-import streamlit as st
-from playwright.sync_api import sync_playwright
+import html
+import json
+import os
+import threading
 import time
-import re
-import subprocess
-import sys
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+# Heavy modules (engine -> Playwright, cryptography, ...) are imported on the
+# first fetch, not at startup. STREAMLIT_PREWARM launches the browser in the
+# background while the login form is on screen.
+PREWARM = os.environ.get("STREAMLIT_PREWARM", "1") == "1"
+# Log how long each rerun of this script takes
+PROFILE = os.environ.get("STREAMLIT_PROFILE", "0") == "1"
+_rerun_started = time.perf_counter()
 
 # Page Configuration
 st.set_page_config(
@@ -14,20 +24,20 @@ st.set_page_config(
 )
 
 # --- SEO & Meta Tags ---
-st.markdown(r"""
-    <head>
+SEO_HTML = r"""
         <meta name="description" content="MITS IMS Attendance Tracker - Securely check and track your attendance from the MITSIMS portal with a modern glassmorphism UI.">
         <meta name="keywords" content="MITS IMS, MITSIMS, Attendance Tracker, MITS Portal, Student Attendance, MITS Attendance Calculator, MITS IMS Login">
         <meta name="author" content="Deva Raj Bhojanapu">
         <link rel="canonical" href="https://mits-ims.streamlit.app/">
-    </head>
-""", unsafe_allow_html=True)
+"""
 
 # --- Consolidated Premium Styling (Glassmorphism + Tailwind) ---
-st.markdown(r"""
+# Preflight stays off so Tailwind's reset doesn't restyle Streamlit's widgets.
+STYLE_HTML = r"""
 <link href="https://fonts.googleapis.com/css2?family=Outfit:wght@300;400;600;800&display=swap" rel="stylesheet">
 <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
 <script src="https://cdn.tailwindcss.com"></script>
+<script>tailwind.config = { corePlugins: { preflight: false } };</script>
 <style>
     /* GLOBAL OVERRIDES */
     * { font-family: 'Outfit', sans-serif !important; box-sizing: border-box; }
@@ -146,124 +156,200 @@ st.markdown(r"""
     /* Hide scrollbar but keep functionality */
     ::-webkit-scrollbar { width: 0px; background: transparent; }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Moves the assets into the top-level document's <head>. They stay there across
+# reruns, so each browser session downloads and parses them once instead of
+# receiving ~150 lines of CSS with every rerun. Scripts are recreated because
+# scripts parsed via innerHTML don't execute.
+INJECT_JS = """
+<script>
+(function () {
+    const doc = window.parent.document;
+    if (doc.getElementById('mits-ims-assets')) return;
+    const tpl = doc.createElement('template');
+    tpl.innerHTML = %s;
+    // Scripts run in order: inline config waits for the CDN script before it
+    let chain = Promise.resolve();
+    for (const node of Array.from(tpl.content.childNodes)) {
+        if (node.nodeType !== 1) continue;
+        if (node.tagName !== 'SCRIPT') {
+            doc.head.appendChild(node);
+            continue;
+        }
+        chain = chain.then(() => new Promise(resolve => {
+            const script = doc.createElement('script');
+            if (node.src) {
+                script.onload = script.onerror = resolve;
+                script.src = node.src;
+                doc.head.appendChild(script);
+            } else {
+                script.textContent = node.textContent;
+                doc.head.appendChild(script);
+                resolve();
+            }
+        }));
+    }
+    const marker = doc.createElement('meta');
+    marker.id = 'mits-ims-assets';
+    doc.head.appendChild(marker);
+})();
+</script>
+"""
+
+def inject_static_assets():
+    if st.session_state.get("assets_injected"):
+        return
+    # "</" escaped so the embedded </script> tags don't close INJECT_JS's own
+    components.html(INJECT_JS % json.dumps(SEO_HTML + STYLE_HTML).replace("</", "<\\/"), height=0)
+    st.session_state.assets_injected = True
+
+inject_static_assets()
 
-# Install Playwright Dependencies (Cached)
-@st.cache_resource
 def install_browsers():
+    # Streamlit Cloud has no build step: install Chromium only if it isn't on disk yet
+    from browser_pool import chromium_installed
+    if chromium_installed():
+        return
+    import subprocess
+    import sys
     try:
         subprocess.run([sys.executable, "-m", "playwright", "install", "chromium"], check=True)
     except Exception as e:
-        st.error(f"Failed to install Playwright: {e}")
+        print(f"Failed to install Playwright: {e}")
+
+# Runs once per process: check/install Chromium and launch it off the script thread
+@st.cache_resource
+def start_browser_warmup():
+    def warm():
+        install_browsers()
+        import engine
+        if engine.DEFAULT_ENGINE == "playwright":
+            try:
+                engine.get_pool().warm()
+            except Exception as e:
+                print(f"Browser pre-warm failed: {e}")
 
-install_browsers()
+    thread = threading.Thread(target=warm, name="browser-warmup", daemon=True)
+    thread.start()
+    return thread
+
+warmup = start_browser_warmup() if PREWARM else None
 
 # Logic to fetch attendance
 def fetch_attendance(username, password):
-    with sync_playwright() as p:
-        browser = None
-        try:
-            # Launch browser with stability flags
-            browser = p.chromium.launch(headless=True, args=['--no-sandbox', '--disable-setuid-sandbox'])
-            page = browser.new_page()
-            
-            # 1. Page Navigation
-            try:
-                page.goto("http://mitsims.in/", timeout=45000)
-            except Exception:
-                return {"error": "The MITS server is taking too long to respond. Please try after some time."}
-            
-            # 2. Login Step 1: Open LoginForm
-            try:
-                page.wait_for_selector("#studentLink", state="visible", timeout=15000)
-                page.click("#studentLink", force=True)
-                page.wait_for_selector("#studentForm #inputStuId", state="visible", timeout=15000)
-            except Exception:
-                return {"error": "Connection timed out. Please try after some time."}
-            
-            # 3. Login Step 2: Fill and Submit
-            page.fill("#studentForm #inputStuId", username)
-            page.fill("#studentForm #inputPassword", password)
-            page.click("#studentSubmitButton", force=True)
-            
-            # 4. Wait for Result (Success or Error)
-            try:
-                # Wait for either the dashboard element or error div
-                page.wait_for_selector("#studentName, #studentErrorDiv", timeout=10000)
-            except:
-                # Fallback: force submit if click didn't trigger
-                try:
-                    page.evaluate("if(document.querySelector('#studentForm')) document.querySelector('#studentForm').submit();")
-                    page.wait_for_selector("#studentName, #studentErrorDiv", timeout=10000)
-                except Exception:
-                    # If we still haven't found a success or error marker
-                    return {"error": "Login failed or timed out. Please check your credentials and try after some time."}
-
-            # 5. Explicit Error Check
-            error_div = page.query_selector("#studentErrorDiv")
-            if error_div:
-                err_text = ""
-                try:
-                    err_text = error_div.inner_text().strip()
-                except:
-                    pass
-                if err_text:
-                    # Mask technical errors with user-friendly message
-                    if any(kw in err_text.lower() for kw in ["invalid", "wrong", "mismatch", "incorrect"]):
-                        return {"error": "Invalid Registration Number or Password"}
-                    return {"error": err_text}
-            
-            # Verify if dashboard actually loaded
-            if not page.query_selector("#studentName"):
-                return {"error": "Invalid Registration Number or Password"}
-
-            # 6. Data Extraction
-            time.sleep(4) # Wait for attendance values to populate
-            full_text = page.inner_text("body")
-            
-            # Name extraction
-            student_name = "Student"
-            name_match = re.search(r"([A-Z\s]+)\s+\|\s+Change Password", full_text)
-            if name_match: student_name = name_match.group(1).strip()
-            
-            attendance_data = []
-            lines = [l.strip() for l in full_text.split('\n') if l.strip()]
-            for i, line in enumerate(lines):
-                upper_line = line.upper()
-                if "TOTAL CONDUCTED" in upper_line or "ATTENDANCE %" in upper_line:
-                    continue
-                
-                is_subject = re.match(r'^\d*[A-Z]+\d+[A-Z0-9]*$', line) or (line.isupper() and 2 < len(line) < 30 and not re.search(r'\d', line))
-                
-                if is_subject:
-                    try:
-                        lookahead = lines[i+1:i+6]
-                        nums = []
-                        for sub in lookahead:
-                            if re.match(r'^[\d\.]+%?$', sub) or sub == '-':
-                                nums.append(float(sub.replace('%', '').replace('-', '0')))
-                        if len(nums) >= 3:
-                            attendance_data.append({
-                                "code": line,
-                                "attended": int(nums[0]),
-                                "total": int(nums[1]),
-                                "percentage": nums[2]
-                            })
-                    except: pass
-            
-            return {"success": True, "name": student_name, "data": attendance_data}
-
-        except Exception as e:
-            err_msg = str(e)
-            if "Target page, context or browser has been closed" in err_msg or "Timeout" in err_msg:
-                return {"error": "Connection timed out. Please try after some time."}
-            return {"error": "Something went wrong. Please try after some time."}
-        finally:
-            if browser:
-                try:
-                    browser.close()
-                except:
-                    pass
+    # Runs on the shared warm browser pool or the HTTP engine (see engine.py)
+    if warmup is not None:
+        # Chromium may still be installing on a cold container
+        warmup.join()
+    else:
+        install_browsers()
+    import engine
+    from portal import classify_error
+    try:
+        result = engine.fetch(username, password, record=True)
+    except Exception as e:
+        return {"error": classify_error(e).message}
+
+    return {
+        "success": True,
+        "name": result["student_name"],
+        "data": [r.to_dict() for r in result["records"]],
+        "meta": result["meta"]
+    }
+
+def color_class(percentage):
+    if percentage < 65: return 'text-red'
+    if percentage < 75: return 'text-yellow'
+    return 'text-green'
+
+# The whole dashboard (header, aggregate card, subject list) as one HTML
+# fragment: one delta per rerun instead of one per subject, and rebuilt
+# only when the data changes.
+@st.cache_data(max_entries=256, show_spinner=False)
+def report_html(user_name, data):
+    parts = [f"""
+        <div class="mb-8">
+            <span class="text-xs font-semibold text-blue-400 uppercase tracking-widest bg-blue-500/10 px-3 py-1 rounded-full border border-blue-500/20">Dashboard</span>
+            <h2 class="text-2xl font-bold mt-3 text-white">Hello, {html.escape(user_name or "")} 👋</h2>
+            <p class="text-slate-400 text-sm">Here's your attendance breakdown.</p>
+        </div>
+    """]
+
+    if not data:
+        parts.append('<div class="glass-card text-center text-slate-400 text-sm">No data fetched. Please re-login.</div>')
+        return "".join(parts)
+
+    # Aggregate Card
+    total_att = sum(d['attended'] for d in data)
+    total_con = sum(d['total'] for d in data)
+    overall = (total_att / total_con * 100) if total_con > 0 else 0
+
+    parts.append(f'''
+        <div class="glass-card text-center mb-8">
+            <p class="text-slate-500 text-xs font-bold uppercase tracking-wider mb-2">Aggregate Percentage</p>
+            <h1 class="text-5xl font-extrabold {color_class(overall)}">{overall:.2f}%</h1>
+            <div class="mt-4 text-slate-300 text-sm font-medium">
+                <span class="bg-slate-700/50 px-3 py-1 rounded-lg">{total_att}</span>
+                <span class="mx-2 opacity-30">/</span>
+                <span class="text-slate-500">{total_con}</span>
+                <span class="ml-1 text-slate-500">Classes</span>
+            </div>
+        </div>
+    ''')
+
+    parts.append('<h3 class="text-white font-bold text-sm uppercase tracking-tight mb-4">Detailed Report</h3>')
+
+    # Subject List
+    for d in data:
+        parts.append(f'''
+            <div class="subject-row">
+                <div class="flex-1">
+                    <div class="text-white font-bold text-sm leading-tight mb-1">{html.escape(str(d['code']))}</div>
+                    <div class="text-slate-500 text-[11px] font-medium">
+                        Attended: <span class="text-slate-300">{d['attended']}</span> |
+                        Total: <span class="text-slate-300">{d['total']}</span>
+                    </div>
+                </div>
+                <div class="text-lg font-extrabold {color_class(d['percentage'])}">
+                    {d['percentage']}%
+                </div>
+            </div>
+        ''')
+    return "".join(parts)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def planner_html(data, target, remaining, attend_prob):
+    import planner
+    result = planner.plan(data, target, remaining)
+    chances = {}
+    if remaining:
+        sim = planner.simulate(data, remaining, attend_prob, target, runs=2000, seed=0)
+        chances = {s['code']: s['p_at_target'] for s in sim['subjects']}
+        chances[None] = sim['p_overall_at_target']
+
+    def row(code, plan, label):
+        skip = plan['can_skip']
+        need = plan['must_attend']
+        status = f'<span class="text-green">skip {skip}</span>' if need == 0 else f'<span class="text-red">attend {need}</span>'
+        detail = ""
+        if remaining:
+            detail = (f'<div class="text-slate-500 text-[11px]">Of next {plan["remaining"]}: attend '
+                      f'{plan["remaining_must_attend"]} · finish {plan["worst_case"]}–{plan["best_case"]}%'
+                      f' · {chances.get(code, 0) * 100:.0f}% chance</div>')
+        return f'''
+            <div class="subject-row">
+                <div class="flex-1">
+                    <div class="text-white font-bold text-sm leading-tight mb-1">{html.escape(str(label))}</div>
+                    {detail}
+                </div>
+                <div class="text-sm font-bold">{status}</div>
+            </div>
+        '''
+
+    parts = [row(None, result['overall'], "Overall")]
+    parts.extend(row(s['code'], s, s['code']) for s in result['subjects'])
+    return "".join(parts)
 
 # --- SESSION STATE ---
 if 'logged_in' not in st.session_state: st.session_state.logged_in = False
@@ -316,68 +402,21 @@ else:
         st.rerun()
     st.markdown('</div>', unsafe_allow_html=True)
 
-    data = st.session_state.data
-    
-    # Welcome Header
-    st.markdown(f"""
-        <div class="mb-8">
-            <span class="text-xs font-semibold text-blue-400 uppercase tracking-widest bg-blue-500/10 px-3 py-1 rounded-full border border-blue-500/20">Dashboard</span>
-            <h2 class="text-2xl font-bold mt-3 text-white">Hello, {st.session_state.user_name} 👋</h2>
-            <p class="text-slate-400 text-sm">Here's your attendance breakdown.</p>
-        </div>
-    """, unsafe_allow_html=True)
+    st.markdown(report_html(st.session_state.user_name, st.session_state.data), unsafe_allow_html=True)
 
-    if not data:
-        st.info("No data fetched. Please re-login.")
-    else:
-        # Aggregate Card
-        total_att = sum(d['attended'] for d in data)
-        total_con = sum(d['total'] for d in data)
-        overall = (total_att / total_con * 100) if total_con > 0 else 0
-        
-        clr = 'text-green'
-        if overall < 75: clr = 'text-yellow'
-        if overall < 65: clr = 'text-red'
-            
-        st.markdown(f'''
-            <div class="glass-card text-center mb-8">
-                <p class="text-slate-500 text-xs font-bold uppercase tracking-wider mb-2">Aggregate Percentage</p>
-                <h1 class="text-5xl font-extrabold {clr}">{overall:.2f}%</h1>
-                <div class="mt-4 text-slate-300 text-sm font-medium">
-                    <span class="bg-slate-700/50 px-3 py-1 rounded-lg">{total_att}</span>
-                    <span class="mx-2 opacity-30">/</span>
-                    <span class="text-slate-500">{total_con}</span> 
-                    <span class="ml-1 text-slate-500">Classes</span>
-                </div>
-            </div>
-        ''', unsafe_allow_html=True)
-
-        st.markdown('<h3 class="text-white font-bold text-sm uppercase tracking-tight mb-4">Detailed Report</h3>', unsafe_allow_html=True)
-
-        # Subject List
-        for d in data:
-            p = d['percentage']
-            s_clr = 'text-green'
-            if p < 75: s_clr = 'text-yellow'
-            if p < 65: s_clr = 'text-red'
-            
-            st.markdown(f'''
-                <div class="subject-row">
-                    <div class="flex-1">
-                        <div class="text-white font-bold text-sm leading-tight mb-1">{d['code']}</div>
-                        <div class="text-slate-500 text-[11px] font-medium">
-                            Attended: <span class="text-slate-300">{d['attended']}</span> | 
-                            Total: <span class="text-slate-300">{d['total']}</span>
-                        </div>
-                    </div>
-                    <div class="text-lg font-extrabold {s_clr}">
-                        {p}%
-                    </div>
-                </div>
-            ''', unsafe_allow_html=True)
+    if st.session_state.data:
+        with st.expander("What-if planner"):
+            target = st.slider("Target attendance %", 50, 100, 75)
+            remaining = st.number_input("Classes left per subject", min_value=0, max_value=200, value=0)
+            attend_prob = st.slider("Chance you attend each class", 0.0, 1.0, 0.8, 0.05, disabled=not remaining)
+            st.markdown(planner_html(st.session_state.data, target, int(remaining), attend_prob),
+                        unsafe_allow_html=True)
 # Footer
 st.markdown("""
     <div class="text-center py-12 text-slate-600 font-medium text-[11px] uppercase tracking-widest">
         &copy; 2025 MITS IMS
     </div>
 """, unsafe_allow_html=True)
+
+if PROFILE:
+    print(f"Streamlit rerun: {(time.perf_counter() - _rerun_started) * 1000:.1f} ms")
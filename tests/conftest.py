@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import mock_portal  # noqa: E402
+
+
+@pytest.fixture
+def portal():
+    """The mock portal on a free local port; yields (url, MockPortal)."""
+    server, state = mock_portal.serve(port=0)
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/", state
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def http_engine(portal, monkeypatch):
+    """http_engine pointed at the mock portal, with history writes off."""
+    import history
+    import http_engine
+
+    monkeypatch.setattr(http_engine, "PORTAL_URL", portal[0])
+    monkeypatch.setattr(history, "HISTORY_ENABLED", False)
+    return http_engine
@@ -0,0 +1,28 @@
+import pytest
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from admission import client_ip
+
+
+def proxy_fix_ip(peer, forwarded_for, hops):
+    seen = {}
+
+    def app(environ, start_response):
+        seen["ip"] = environ["REMOTE_ADDR"]
+        return []
+    environ = {"REMOTE_ADDR": peer}
+    if forwarded_for is not None:
+        environ["HTTP_X_FORWARDED_FOR"] = forwarded_for
+    ProxyFix(app, x_for=hops)(environ, lambda *args: None)
+    return seen["ip"]
+
+
+@pytest.mark.parametrize("forwarded_for", [None, "", "203.0.113.7", "198.51.100.1, 203.0.113.7",
+                                           "spoofed, 198.51.100.1, 203.0.113.7"])
+@pytest.mark.parametrize("hops", [1, 2])
+def test_matches_flask_proxy_fix(forwarded_for, hops):
+    assert client_ip("10.0.0.1", forwarded_for, hops) == proxy_fix_ip("10.0.0.1", forwarded_for, hops)
+
+
+def test_without_proxies_uses_the_peer():
+    assert client_ip("10.0.0.1", "203.0.113.7", 0) == "10.0.0.1"
@@ -0,0 +1,94 @@
+"""Parity of attendance_parser with the parsers it replaced, on recorded dashboard text."""
+import os
+import random
+import re
+
+import pytest
+
+from attendance_parser import Record, parse_text
+
+SNAPSHOTS = os.path.join(os.path.dirname(__file__), "snapshots")
+SNAPSHOT_FILES = sorted(f for f in os.listdir(SNAPSHOTS) if f.endswith(".txt"))
+
+
+def load(name):
+    with open(os.path.join(SNAPSHOTS, name)) as f:
+        return f.read()
+
+
+def flask_subject(line):
+    return line.isupper() and len(line) > 3 and not re.search(r'\d', line)
+
+
+def streamlit_subject(line):
+    return line.isupper() and 2 < len(line) < 30 and not re.search(r'\d', line)
+
+
+def legacy_parse(full_text, text_subject):
+    """The old per-line lookahead parser from app.py / streamlit_app.py."""
+    records = []
+    lines = [l.strip() for l in full_text.split('\n') if l.strip()]
+    for i, line in enumerate(lines):
+        upper_line = line.upper()
+        if "TOTAL CONDUCTED" in upper_line or "ATTENDANCE %" in upper_line:
+            continue
+        if re.match(r'^\d*[A-Z]+\d+[A-Z0-9]*$', line) or text_subject(line):
+            nums = []
+            for sub in lines[i + 1:i + 6]:
+                if re.match(r'^[\d\.]+%?$', sub) or sub == '-':
+                    nums.append(float(sub.replace('%', '').replace('-', '0')))
+            if len(nums) >= 3:
+                records.append(Record(line, int(nums[0]), int(nums[1]), nums[2]))
+    return records
+
+
+def union_subject(line):
+    """The rule the new parser implements: a text subject under either old rule."""
+    return flask_subject(line) or streamlit_subject(line)
+
+
+@pytest.mark.parametrize("name", SNAPSHOT_FILES)
+def test_matches_union_of_old_parsers(name):
+    text = load(name)
+    records = parse_text(text).records
+    union = legacy_parse(text, union_subject)
+
+    assert records == union
+    for old in (legacy_parse(text, flask_subject), legacy_parse(text, streamlit_subject)):
+        assert all(r in records for r in old)
+
+
+def test_keeps_long_text_subjects():
+    records = parse_text(load("dashboard_text_subjects.txt")).records
+    codes = [r.code for r in records]
+    assert "OBJECT ORIENTED ANALYSIS AND DESIGN" in codes
+    assert "COMPUTER NETWORKS AND SECURITY LABORATORY" in codes
+
+
+def test_reads_name_and_dashes():
+    report = parse_text(load("dashboard_codes.txt"))
+    assert report.student_name == "RAVI KUMAR REDDY"
+    assert Record("20CS503", 0, 12, 0.0) in report.records
+    assert len(report.records) == 8
+
+
+def random_dashboard(rng, rows):
+    lines = ["MITS IMS", "STUDENT NAME | Change Password", "Subject", "Attended", "Total Conducted", "Attendance %"]
+    words = ["DATA", "STRUCTURES", "OS", "LAB", "NETWORKS", "AND", "DESIGN", "OBJECT", "ORIENTED", "Total", "x"]
+    for _ in range(rows):
+        kind = rng.random()
+        if kind < 0.4:
+            lines.append(f"20{rng.choice('CSMAHE')}{rng.choice('SAC')}{rng.randint(100, 999)}")
+        elif kind < 0.7:
+            lines.append(" ".join(rng.choice(words) for _ in range(rng.randint(1, 6))))
+        for _ in range(rng.randint(0, 4)):
+            lines.append(rng.choice([str(rng.randint(0, 60)), f"{rng.uniform(0, 100):.2f}", "-", "75%", ""]))
+    return "\n".join(lines)
+
+
+def test_random_dashboards_match_union():
+    rng = random.Random(8)
+    for _ in range(300):
+        text = random_dashboard(rng, rng.randint(0, 40))
+        union = legacy_parse(text, lambda l: flask_subject(l) or streamlit_subject(l))
+        assert parse_text(text).records == union
@@ -0,0 +1,41 @@
+from batch import run_batch
+from cache import ResultCache
+
+PAYLOAD = {"message": "Success", "student_name": "STUDENT", "data": []}
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.tokens = 0
+
+    def acquire(self):
+        self.tokens += 1
+
+
+def test_cached_students_skip_the_rate_limiter():
+    cache = ResultCache()
+    cache.get_or_fetch("A1", lambda: (PAYLOAD, 200))
+    limiter = CountingLimiter()
+    fetched = []
+
+    def fetch(username, password):
+        fetched.append(username)
+        return PAYLOAD, 200
+
+    def cached(username, password):
+        hit = cache.fresh(username)
+        return (hit[0], 200) if hit else None
+
+    students = [{"username": u, "password": "x"} for u in ("A1", "B2", "C3")]
+    rows = list(run_batch(students, fetch, limiter=limiter, cached=cached))
+
+    assert sorted(fetched) == ["B2", "C3"]
+    assert limiter.tokens == 2
+    assert all(r["status"] == "ok" for r in rows)
+
+
+def test_stale_entries_are_not_fresh():
+    cache = ResultCache(ttl=0)
+    cache.get_or_fetch("A1", lambda: (PAYLOAD, 200))
+    assert cache.fresh("A1") is None
+    assert cache.peek("A1") == PAYLOAD
@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("playwright")
+
+from browser_pool import INSTALL_MARKER, chromium_installed, required_chromium  # noqa: E402
+
+
+@pytest.fixture
+def browsers(tmp_path, monkeypatch):
+    monkeypatch.setenv("PLAYWRIGHT_BROWSERS_PATH", str(tmp_path))
+    return tmp_path
+
+
+def install(root, directory, complete=True):
+    path = root / directory
+    path.mkdir()
+    if complete:
+        (path / INSTALL_MARKER).touch()
+
+
+def test_needs_the_exact_revisions(browsers):
+    for candidates in required_chromium():
+        install(browsers, candidates[0])
+    assert chromium_installed()
+
+
+def test_older_revision_does_not_count(browsers):
+    for candidates in required_chromium():
+        name = candidates[0].rsplit("-", 1)[0]
+        install(browsers, f"{name}-1")
+    assert not chromium_installed()
+
+
+def test_interrupted_download_does_not_count(browsers):
+    for candidates in required_chromium():
+        install(browsers, candidates[0], complete=False)
+    assert not chromium_installed()
@@ -0,0 +1,73 @@
+import pytest
+
+from coordination import Coordinator, RedisBackend, SqliteBackend
+
+PAYLOAD = {"message": "Success", "student_name": "STUDENT 21691A0501",
+           "data": [{"code": "20CS501", "attended": 48, "total": 53, "percentage": 90.57}]}
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SqliteBackend(str(tmp_path / "coordination.db"))
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return RedisBackend(client=fakeredis.FakeRedis(), prefix="test:")
+
+
+def coordinator(backend, **options):
+    return Coordinator(backend, **dict({"wait_s": 2, "poll_ms": 10}, **options))
+
+
+def counting_fetch(calls, result=(PAYLOAD, 200)):
+    def fetch():
+        calls.append(None)
+        return result
+    return fetch
+
+
+def test_result_is_shared_with_the_next_worker(backend):
+    calls = []
+    first, second = coordinator(backend), coordinator(backend)
+
+    assert first.run("21691a0501", "secret", counting_fetch(calls)) == (PAYLOAD, 200)
+    assert second.run("21691A0501", "secret", counting_fetch(calls)) == (PAYLOAD, 200)
+    assert len(calls) == 1
+    assert first.stats()["led"] == 1 and second.stats()["shared"] == 1
+
+
+def test_fresh_ignores_earlier_results(backend):
+    calls = []
+    coord = coordinator(backend)
+    coord.run("21691a0501", "secret", counting_fetch(calls))
+    coord.run("21691a0501", "secret", counting_fetch(calls), fresh=True)
+    assert len(calls) == 2
+
+
+def test_published_slot_is_encrypted(backend):
+    coord = coordinator(backend)
+    coord.run("21691a0501", "secret", counting_fetch([]))
+
+    slot = backend.result(coord.key("21691a0501", "secret"))
+    assert slot and "STUDENT" not in slot and "20CS501" not in slot
+    # Another password never gets this student's result
+    assert coord.run("21691a0501", "other", counting_fetch([], ({"error": "x"}, 401))) == ({"error": "x"}, 401)
+
+
+def test_leases_belong_to_their_owner(backend):
+    assert backend.acquire("k", "a", 5)
+    assert not backend.acquire("k", "b", 5)
+    assert not backend.renew("k", "b", 5)
+    assert backend.renew("k", "a", 5)
+    backend.release("k", "b")
+    assert not backend.acquire("k", "b", 5)
+    backend.release("k", "a")
+    assert backend.acquire("k", "b", 5)
+
+
+def test_waiter_takes_over_an_expired_lease(backend):
+    coord = coordinator(backend, lease_ttl=0.05)
+    backend.acquire(coord.key("21691a0501", "secret"), "crashed", 0.05)
+    calls = []
+    assert coord.run("21691a0501", "secret", counting_fetch(calls)) == (PAYLOAD, 200)
+    assert len(calls) == 1 and coord.stats()["took_over"] == 1
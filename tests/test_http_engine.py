@@ -0,0 +1,82 @@
+import pytest
+
+import engine
+from portal import INVALID_CREDS_MSG, PortalError
+
+
+def test_reads_attendance(http_engine, portal):
+    _, state = portal
+    result = http_engine.fetch("21691a0501", "secret")
+
+    assert result["student_name"] == "STUDENT 21691A0501"
+    expected = state.attendance("21691a0501")
+    assert [r.to_dict() for r in result["records"]] == [
+        {"code": row["subjectCode"], "attended": row["attended"], "total": row["conducted"],
+         "percentage": row["percentage"]}
+        for row in expected
+    ]
+    assert result["meta"]["engine"] == "http"
+    assert set(result["meta"]["timings_ms"]) >= {"navigate", "login", "extract"}
+    assert state.hits["login"] == 1
+
+
+def test_wrong_password_is_401(http_engine):
+    with pytest.raises(PortalError) as info:
+        http_engine.fetch("21691a0501", "wrong")
+    assert info.value.status == 401
+    assert info.value.message == INVALID_CREDS_MSG
+
+
+def test_other_login_errors_are_shown_as_is(http_engine, portal):
+    portal[1].login_error = "Your account is locked. Contact the administrator."
+    with pytest.raises(PortalError) as info:
+        http_engine.fetch("21691a0501", "secret")
+    assert info.value.status == 401
+    assert info.value.message == "Your account is locked. Contact the administrator."
+
+
+def test_parses_html_attendance_tables():
+    class Response:
+        headers = {"Content-Type": "text/html"}
+        text = ("<table><tr><th>S.No</th><th>Subject</th><th>Attended</th><th>Total</th><th>%</th></tr>"
+                "<tr><td>1</td><td>20CS501</td><td>30</td><td>40</td><td>75.00</td></tr></table>")
+
+    from http_engine import parse_attendance_response
+
+    records = parse_attendance_response(Response())
+    assert [r.to_dict() for r in records] == [{"code": "20CS501", "attended": 30, "total": 40, "percentage": 75.0}]
+
+
+@pytest.fixture
+def pooled(monkeypatch):
+    """Replace the Playwright path with a stub that records it was used."""
+    calls = []
+
+    def fake_pooled(username, password, progress, **options):
+        calls.append(username)
+        return {"student_name": "FROM PLAYWRIGHT", "records": [], "meta": {"engine": "playwright"}}
+
+    monkeypatch.setattr(engine, "_fetch_pooled", fake_pooled)
+    return calls
+
+
+def test_shape_change_falls_back_to_playwright(http_engine, portal, pooled):
+    # An empty attendance store looks like a portal change to the HTTP engine
+    portal[1].subjects = 0
+    result = engine.fetch("21691a0501", "secret", "http")
+
+    assert pooled == ["21691a0501"]
+    assert result["student_name"] == "FROM PLAYWRIGHT"
+    assert "did not contain any records" in result["meta"]["fallback"]
+
+
+def test_login_failure_does_not_fall_back(http_engine, pooled):
+    with pytest.raises(PortalError):
+        engine.fetch("21691a0501", "wrong", "http")
+    assert pooled == []
+
+
+def test_http_engine_result_skips_playwright(http_engine, pooled):
+    result = engine.fetch("21691a0501", "secret", "http")
+    assert pooled == []
+    assert result["meta"]["engine"] == "http"
@@ -0,0 +1,43 @@
+"""pytest-benchmark suite: new single-pass parser vs the old lookahead
+parser with the same (union) subject rule. Skipped unless asked for:
+
+    python -m pytest tests/test_parser_benchmark.py --benchmark-only
+"""
+import pytest
+
+from attendance_parser import parse_text
+from test_attendance_parser import SNAPSHOT_FILES, legacy_parse, load, union_subject
+
+pytest.importorskip("pytest_benchmark")
+
+# One real-sized dashboard, and one blown up to stress the per-line cost
+SIZES = {"x1": 1, "x50": 50}
+
+
+@pytest.fixture(autouse=True)
+def benchmark_only(request):
+    # Keep the unit suite fast; timings only mean something when asked for
+    if not request.config.getoption("benchmark_only"):
+        pytest.skip("benchmarks run with --benchmark-only")
+
+
+def dashboard(name, times):
+    return "\n".join([load(name)] * times)
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("name", SNAPSHOT_FILES)
+def test_parse_text(benchmark, name, size):
+    text = dashboard(name, SIZES[size])
+    benchmark.group = f"{name} {size}"
+    report = benchmark(parse_text, text)
+    assert report.records
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("name", SNAPSHOT_FILES)
+def test_legacy_parse(benchmark, name, size):
+    text = dashboard(name, SIZES[size])
+    benchmark.group = f"{name} {size}"
+    records = benchmark(legacy_parse, text, union_subject)
+    assert records
@@ -0,0 +1,34 @@
+import pytest
+
+from attendance_parser import Report
+from portal import NOT_LOADED_MSG, PortalError, require_records
+from readiness import wait_until_stable
+
+
+def rows_after(polls, count):
+    """count_rows() that reports `count` rows once it has been polled `polls` times."""
+    seen = []
+
+    def count_rows():
+        seen.append(None)
+        return count if len(seen) > polls else 0
+    return count_rows
+
+
+def test_waits_for_rows_to_arrive():
+    assert wait_until_stable(rows_after(3, 6), lambda ms: None, timeout_ms=2000) == "stable"
+
+
+def test_no_data_rows_is_a_timeout():
+    assert wait_until_stable(lambda: 0, lambda ms: None, timeout_ms=200) == "timeout"
+
+
+def test_inflight_requests_hold_off_stable():
+    assert wait_until_stable(lambda: 4, lambda ms: None, lambda: 1, timeout_ms=800) == "timeout"
+
+
+def test_empty_dashboard_is_an_error():
+    with pytest.raises(PortalError) as info:
+        require_records(Report("STUDENT", []))
+    assert info.value.status == 504
+    assert info.value.message == NOT_LOADED_MSG
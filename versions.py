@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Versions a worker remembers so clients holding one can get a delta;
+# older (or another worker's) versions get the full payload instead.
+VERSION_HISTORY = int(os.environ.get("VERSION_HISTORY", "2000"))
+
+
+def typed(data):
+    """Attendance rows with numbers as numbers, whatever the source produced."""
+    return [{
+        "code": str(row["code"]),
+        "attended": int(float(row["attended"])),
+        "total": int(float(row["total"])),
+        "percentage": round(float(row["percentage"]), 2),
+    } for row in data]
+
+
+def content_version(student_name, data):
+    """Hash of what the student sees; meta/cache info don't change it."""
+    blob = json.dumps([student_name, data], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode()).hexdigest()[:16]
+
+
+def stamp(payload):
+    """A 200 payload with typed `data` and its `version`."""
+    if "data" not in payload:
+        return payload
+    data = typed(payload["data"])
+    return dict(payload, data=data, version=content_version(payload.get("student_name"), data))
+
+
+def etag(version):
+    # Weak: the body also carries meta/cache details that vary per response
+    return f'W/"{version}"'
+
+
+def etag_matches(header, version):
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/").strip('"') == version:
+            return True
+    return False
+
+
+class VersionLog:
+    """LRU of recently served versions -> {code: row}."""
+
+    def __init__(self, max_entries=VERSION_HISTORY):
+        self.max_entries = max_entries
+        self._versions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def remember(self, version, data):
+        with self._lock:
+            if version in self._versions:
+                self._versions.move_to_end(version)
+                return
+            self._versions[version] = {row["code"]: row for row in data}
+            while len(self._versions) > self.max_entries:
+                self._versions.popitem(last=False)
+
+    def get(self, version):
+        with self._lock:
+            return self._versions.get(version)
+
+
+def diff(old, data):
+    """Rows that are new or changed since `old` ({code: row}), and codes that disappeared."""
+    codes = {row["code"] for row in data}
+    changed = [row for row in data if old.get(row["code"]) != row]
+    removed = [code for code in old if code not in codes]
+    return changed, removed
+
+
+def conditional(payload, status, log, if_none_match=None, since=None):
+    """Return `(payload or None, status, headers)` for an attendance response.
+
+    Successful payloads get a version and an ETag. A client that already
+    has the current version (If-None-Match, or `since`) gets a bodyless
+    304; one holding an older version this worker remembers gets only the
+    subjects that changed (`delta`) instead of `data`.
+    """
+    if status != 200 or "data" not in payload:
+        return payload, status, {}
+    if "version" not in payload:
+        payload = stamp(payload)
+    version = payload["version"]
+    log.remember(version, payload["data"])
+    headers = {"ETag": etag(version)}
+
+    if etag_matches(if_none_match, version) or since == version:
+        return None, 304, headers
+
+    old = log.get(since) if since else None
+    if old is not None:
+        changed, removed = diff(old, payload["data"])
+        payload = {k: v for k, v in payload.items() if k != "data"}
+        payload["delta"] = {"since": since, "changed": changed, "removed": removed}
+    return payload, 200, headers